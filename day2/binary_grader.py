@@ -0,0 +1,171 @@
+"""
+yes/no 평가기의 단일 토큰 logprob 경로
+
+평가기에 JSON 대신 'yes' 또는 'no' 한 토큰만 요청하고(max_tokens=1, logprobs), 상위 후보 토큰의
+확률에서 yes/no 확률을 정규화해 임계값으로 판정합니다. logprobs가 없거나 yes/no 토큰이 후보에 없으면
+기존 JSON 경로로 돌아갑니다. JSON 경로는 잘못된 응답에서도 KeyError 대신 기본값을 돌려줍니다.
+max_tokens=1은 단일 토큰 경로에만 적용하며, JSON 경로가 max_tokens에서 잘린 응답(finish_reason == "length")은
+잘못된 응답과 따로 집계하고 로그를 남깁니다.
+"""
+import json
+import math
+import threading
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import RunnableLambda
+
+SINGLE_TOKEN_INSTRUCTION = "Answer with a single word: 'yes' or 'no'."
+
+# 상위 후보로 받을 토큰 수
+TOP_LOGPROBS = 5
+
+def yes_no_logit_bias(model):
+    """yes/no 토큰만 나오도록 하는 logit_bias. 모델의 토크나이저를 모르면 None."""
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model)
+    except Exception:
+        return None
+    bias = {}
+    for word in ("yes", "no", "Yes", "No"):
+        tokens = encoding.encode(word)
+        if len(tokens) == 1:
+            bias[str(tokens[0])] = 100
+    return bias or None
+
+def single_token_settings(settings):
+    """ChatOpenAI 티어 설정을 단일 토큰 + logprobs 설정으로 바꿉니다."""
+    settings = {**settings, "max_tokens": 1, "logprobs": True, "top_logprobs": TOP_LOGPROBS}
+    logit_bias = yes_no_logit_bias(settings["model"])
+    if logit_bias:
+        settings["logit_bias"] = logit_bias
+    return settings
+
+def yes_probability(message):
+    """
+    응답 첫 토큰의 상위 후보에서 P(yes) / (P(yes) + P(no))를 계산합니다.
+    logprobs가 없거나 후보에 yes/no가 없으면 None.
+    """
+    logprobs = (getattr(message, "response_metadata", None) or {}).get("logprobs") or {}
+    content = logprobs.get("content") or []
+    if not content:
+        return None
+    candidates = content[0].get("top_logprobs") or [content[0]]
+    p_yes = p_no = 0.0
+    for candidate in candidates:
+        token = candidate.get("token", "").strip().strip("'\"").lower()
+        if token == "yes":
+            p_yes += math.exp(candidate["logprob"])
+        elif token == "no":
+            p_no += math.exp(candidate["logprob"])
+    if p_yes + p_no == 0:
+        return None
+    return p_yes / (p_yes + p_no)
+
+def is_truncated(message):
+    """응답이 max_tokens에서 잘렸는지 (finish_reason == "length")"""
+    return (getattr(message, "response_metadata", None) or {}).get("finish_reason") == "length"
+
+def warn_truncated(name, stats=None):
+    """응답이 max_tokens에서 잘렸으면 로그를 남기고 메시지를 그대로 넘기는 Runnable (JSON 파서 앞에 둡니다)"""
+    def check(message):
+        if is_truncated(message):
+            if stats is not None:
+                stats.add("truncated")
+            print(f"---{name.upper()}: TRUNCATED RESPONSE (finish_reason=length), CHECK max_tokens---")
+        return message
+
+    return RunnableLambda(check, name=f"warn_truncated_{name}")
+
+class GraderStats:
+    """
+    평가기 경로별 호출 수
+
+    Attributes:
+        fast: logprob 경로로 판정한 수
+        fallback: logprobs가 없어 JSON 경로로 돌아간 수
+        malformed: JSON 응답이 잘못돼 기본값으로 판정한 수
+        truncated: JSON 응답이 max_tokens에서 잘린 수 (malformed와 따로 셈)
+    """
+
+    def __init__(self):
+        self.fast = 0
+        self.fallback = 0
+        self.malformed = 0
+        self.truncated = 0
+        self._lock = threading.Lock()
+
+    def add(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def as_dict(self):
+        return {"fast": self.fast, "fallback": self.fallback, "malformed": self.malformed, "truncated": self.truncated}
+
+def _parse_json_grade(message, parser, key, default, stats):
+    truncated = is_truncated(message)
+    if truncated:
+        stats.add("truncated")
+        print("---GRADER: TRUNCATED RESPONSE (finish_reason=length), CHECK max_tokens---")
+    try:
+        result = parser.invoke(message)
+    except OutputParserException:
+        result = None
+    value = result.get(key) if isinstance(result, dict) else None
+    if not isinstance(value, str) or value.strip().lower() not in ("yes", "no"):
+        if truncated:
+            return {key: default, "truncated": True}
+        stats.add("malformed")
+        print(f"---GRADER: MALFORMED RESPONSE {json.dumps(result, ensure_ascii=False, default=str)[:80]}, USE '{default}'---")
+        return {key: default, "malformed": True}
+    return {**result, key: value.strip().lower()}
+
+def json_grader(chain, key="score", default="no", stats=None, parser=None):
+    """
+    JSON 평가기 체인을 감싸 결과가 항상 {key: "yes"|"no"}를 갖도록 합니다.
+    chain은 AIMessage를 반환하는 prompt | model 체인이고, 잘린 응답을 구분하도록 파싱은 여기서 합니다.
+    JSON이 깨졌거나 key가 없으면 default로 판정합니다.
+    """
+    stats = stats or GraderStats()
+    parser = parser or JsonOutputParser()
+
+    def invoke(input, config):
+        return _parse_json_grade(chain.invoke(input, config), parser, key, default, stats)
+
+    async def ainvoke(input, config):
+        return _parse_json_grade(await chain.ainvoke(input, config), parser, key, default, stats)
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"json_grader_{key}")
+
+def binary_grader(fast_chain, fallback, key="score", threshold=0.5, stats=None):
+    """
+    단일 토큰 logprob 평가기. fast_chain은 AIMessage를 반환하는 prompt | model 체인입니다.
+
+    Args:
+        fast_chain: 단일 토큰 프롬프트 | logprobs 모델
+        fallback: logprobs를 쓸 수 없을 때 호출할 평가기 (보통 json_grader)
+        key (str): 결과 dict의 판정 키
+        threshold (float): P(yes)가 이 값 이상이면 "yes"
+
+    Returns:
+        Runnable: {key: "yes"|"no", "probability": P(yes)} 를 반환
+    """
+    stats = stats or GraderStats()
+
+    def decide(message):
+        probability = yes_probability(message)
+        if probability is None:
+            stats.add("fallback")
+            return None
+        stats.add("fast")
+        return {key: "yes" if probability >= threshold else "no", "probability": probability}
+
+    def invoke(input, config):
+        result = decide(fast_chain.invoke(input, config))
+        return result if result is not None else fallback.invoke(input, config)
+
+    async def ainvoke(input, config):
+        result = decide(await fast_chain.ainvoke(input, config))
+        return result if result is not None else await fallback.ainvoke(input, config)
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"binary_grader_{key}")
@@ -0,0 +1,190 @@
+"""
+LLM, 임베딩, 검색 호출을 기록/재생하는 카세트
+
+record 모드는 실제 호출의 요청, 응답, 소요 시간을 JSONL 파일에 한 줄씩 추가하고,
+replay 모드는 네트워크 없이 같은 요청에 기록된 응답을 돌려줍니다.
+같은 요청이 여러 번 기록돼 있으면 기록된 순서대로 재생하고, 다 쓰면 마지막 응답을 반복합니다.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+def request_key(kind, request):
+    payload = json.dumps([kind, request], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class Cassette:
+    """
+    Args:
+        path (str): JSONL 카세트 파일 경로
+        mode (str): "record" 또는 "replay"
+        replay_latency (bool): replay 시 기록된 소요 시간만큼 기다릴지 여부
+    """
+
+    def __init__(self, path, mode, replay_latency=True):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"알 수 없는 카세트 모드입니다: {mode}")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._entries = defaultdict(list)
+        self._cursor = defaultdict(int)
+        if mode == "replay":
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _write(self, kind, key, request, response, elapsed):
+        line = json.dumps(
+            {"kind": kind, "key": key, "request": request, "response": response, "elapsed": elapsed},
+            ensure_ascii=False, default=str,
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def _next(self, kind, key):
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise KeyError(f"카세트에 기록되지 않은 {kind} 요청입니다: {key[:12]} ({self.path})")
+            index = min(self._cursor[key], len(entries) - 1)
+            self._cursor[key] += 1
+            return entries[index]
+
+    def call(self, kind, request, fn):
+        """fn()을 실행해 기록하거나, 기록된 응답을 재생합니다. 응답은 JSON으로 표현 가능해야 합니다."""
+        key = request_key(kind, request)
+        if self.mode == "replay":
+            entry = self._next(kind, key)
+            if self.replay_latency:
+                time.sleep(entry["elapsed"])
+            return entry["response"]
+        start = time.perf_counter()
+        response = fn()
+        self._write(kind, key, request, response, time.perf_counter() - start)
+        return response
+
+    async def acall(self, kind, request, fn):
+        """call의 비동기 버전. fn은 코루틴을 반환합니다."""
+        key = request_key(kind, request)
+        if self.mode == "replay":
+            entry = self._next(kind, key)
+            if self.replay_latency:
+                await asyncio.sleep(entry["elapsed"])
+            return entry["response"]
+        start = time.perf_counter()
+        response = await fn()
+        self._write(kind, key, request, response, time.perf_counter() - start)
+        return response
+
+class CassetteChatModel(BaseChatModel):
+    """채팅 모델 호출을 카세트로 기록/재생합니다. replay 모드에서는 inner가 없어도 됩니다."""
+
+    inner: Optional[BaseChatModel] = None
+    cassette: Any
+    model_name: str
+
+    @property
+    def _llm_type(self):
+        return "cassette"
+
+    def _request(self, messages, stop, kwargs):
+        return {"model": self.model_name, "messages": messages_to_dict(messages), "stop": stop, "kwargs": kwargs}
+
+    @staticmethod
+    def _result(response):
+        return ChatResult(generations=[ChatGeneration(message=messages_from_dict([response])[0])])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        response = self.cassette.call(
+            "chat", self._request(messages, stop, kwargs),
+            lambda: messages_to_dict([self.inner.invoke(messages, stop=stop, **kwargs)])[0],
+        )
+        return self._result(response)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        async def call():
+            return messages_to_dict([await self.inner.ainvoke(messages, stop=stop, **kwargs)])[0]
+        response = await self.cassette.acall("chat", self._request(messages, stop, kwargs), call)
+        return self._result(response)
+
+class CassetteEmbeddings(Embeddings):
+    """임베딩 호출을 카세트로 기록/재생합니다."""
+
+    def __init__(self, inner, cassette, model_name):
+        self.inner = inner
+        self.cassette = cassette
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cassette.call(
+            "embed_documents", {"model": self.model_name, "texts": list(texts)},
+            lambda: self.inner.embed_documents(texts),
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cassette.call(
+            "embed_query", {"model": self.model_name, "text": text},
+            lambda: self.inner.embed_query(text),
+        )
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.cassette.acall(
+            "embed_documents", {"model": self.model_name, "texts": list(texts)},
+            lambda: self.inner.aembed_documents(texts),
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.cassette.acall(
+            "embed_query", {"model": self.model_name, "text": text},
+            lambda: self.inner.aembed_query(text),
+        )
+
+class CassetteSearchClient:
+    """TavilyClient.search 호출을 카세트로 기록/재생합니다."""
+
+    def __init__(self, inner, cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    def search(self, **kwargs):
+        return self.cassette.call("search", kwargs, lambda: self.inner.search(**kwargs))
+
+class AsyncCassetteSearchClient(CassetteSearchClient):
+    """AsyncTavilyClient.search 호출을 카세트로 기록/재생합니다. 동기 클라이언트와 같은 기록을 공유합니다."""
+
+    async def search(self, **kwargs):
+        return await self.cassette.acall("search", kwargs, lambda: self.inner.search(**kwargs))
+
+def wrap_chat_model(factory, model_name, cassette):
+    """카세트가 있으면 감싸고, replay 모드면 실제 모델을 만들지 않습니다."""
+    if cassette is None:
+        return factory()
+    inner = None if cassette.mode == "replay" else factory()
+    return CassetteChatModel(inner=inner, cassette=cassette, model_name=model_name)
+
+def wrap_embeddings(factory, model_name, cassette):
+    if cassette is None:
+        return factory()
+    inner = None if cassette.mode == "replay" else factory()
+    return CassetteEmbeddings(inner, cassette, model_name)
+
+def wrap_search_client(factory, cassette, is_async=False):
+    if cassette is None:
+        return factory()
+    inner = None if cassette.mode == "replay" else factory()
+    return (AsyncCassetteSearchClient if is_async else CassetteSearchClient)(inner, cassette)
@@ -0,0 +1,146 @@
+"""
+MinHash/LSH 기반 중복에 가까운 청크 제거
+
+블로그 페이지의 내비게이션, 반복되는 상용구, 인용 문단처럼 거의 같은 청크를 하나로 묶고
+묶음마다 대표 청크(가장 먼저 나온 것) 하나만 남깁니다. 제거된 청크의 출처는 대표 청크의
+메타데이터에 기록합니다.
+"""
+import re
+import zlib
+import numpy as np
+
+# 2^31 - 1 (메르센 소수). 해시값과 계수가 모두 2^31 미만이라 곱이 uint64를 넘지 않는다
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+
+def shingles(text, size=5):
+    """소문자 단어 size-gram 집합. 단어가 size개보다 적으면 전체를 하나의 shingle로 봅니다."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class MinHasher:
+    """무작위 선형 해시 num_perm개로 shingle 집합의 MinHash 서명을 만듭니다."""
+
+    def __init__(self, num_perm=128, shingle_size=5, seed=0):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def signature(self, text):
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) % _PRIME for s in shingles(text, self.shingle_size)),
+            dtype=np.uint64,
+        )
+        return ((np.outer(hashes, self.a) + self.b) % _PRIME).min(axis=0)
+
+def estimate_jaccard(sig_a, sig_b):
+    """두 MinHash 서명이 일치하는 비율 (자카드 유사도의 추정치)"""
+    return float(np.mean(sig_a == sig_b))
+
+class DedupeStats:
+    """
+    중복 제거 지표
+
+    Attributes:
+        chunks: 입력 청크 수
+        kept: 남긴 청크 수 (묶음 대표 + 중복 없는 청크)
+        clusters: 두 개 이상으로 이루어진 중복 묶음 수
+    """
+
+    def __init__(self, chunks=0, kept=0, clusters=0):
+        self.chunks = chunks
+        self.kept = kept
+        self.clusters = clusters
+
+    @property
+    def removed(self):
+        return self.chunks - self.kept
+
+    @property
+    def reduction(self):
+        """인덱스 크기 감소 비율"""
+        return self.removed / self.chunks if self.chunks else 0.0
+
+    def as_dict(self):
+        return {
+            "chunks": self.chunks,
+            "kept": self.kept,
+            "removed": self.removed,
+            "clusters": self.clusters,
+            "reduction": self.reduction,
+        }
+
+def find_clusters(texts, threshold=0.8, num_perm=128, bands=16, shingle_size=5, seed=0):
+    """
+    중복에 가까운 텍스트 묶음을 찾습니다.
+
+    서명을 bands개 구간으로 나눠 한 구간이라도 같으면 후보로 보고(LSH),
+    후보 쌍 중 추정 자카드 유사도가 threshold 이상인 것만 같은 묶음으로 합칩니다.
+
+    Returns:
+        list: 입력 순서의 인덱스마다 속한 묶음의 대표 인덱스 (가장 앞선 인덱스)
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm({num_perm})은 bands({bands})로 나누어떨어져야 합니다.")
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm, shingle_size, seed)
+    signatures = [hasher.signature(text) for text in texts]
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            key = signature[band * rows:(band + 1) * rows].tobytes()
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root_a, root_b = find(first), find(other)
+                if root_a == root_b:
+                    continue
+                if estimate_jaccard(signatures[first], signatures[other]) >= threshold:
+                    # 대표는 항상 더 앞선 청크
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+    return [find(i) for i in range(len(texts))]
+
+def deduplicate(documents, threshold=0.8, num_perm=128, bands=16, shingle_size=5, seed=0):
+    """
+    중복에 가까운 청크를 묶어 대표 청크만 남깁니다.
+
+    대표 청크의 메타데이터에 duplicate_count(제거된 청크 수)와
+    duplicate_sources(제거된 청크의 출처, 줄바꿈으로 구분)를 기록합니다.
+    Chroma 메타데이터는 리스트를 저장할 수 없어 문자열로 기록합니다.
+
+    Returns:
+        tuple: (남긴 Document 목록, DedupeStats)
+    """
+    representatives = find_clusters(
+        [doc.page_content for doc in documents], threshold, num_perm, bands, shingle_size, seed
+    )
+
+    duplicates = {}
+    for i, rep in enumerate(representatives):
+        if i != rep:
+            duplicates.setdefault(rep, []).append(documents[i])
+
+    kept = []
+    for i, doc in enumerate(documents):
+        if representatives[i] != i:
+            continue
+        if i in duplicates:
+            sources = dict.fromkeys(d.metadata.get("source", "") for d in duplicates[i])
+            doc.metadata["duplicate_count"] = len(duplicates[i])
+            doc.metadata["duplicate_sources"] = "\n".join(source for source in sources if source)
+        kept.append(doc)
+
+    return kept, DedupeStats(len(documents), len(kept), len(duplicates))
@@ -0,0 +1,145 @@
+"""
+조기 종료 문서 평가
+
+검색된 청크를 순위대로(sequential) 또는 동시에(concurrent) 평가하다가,
+관련 청크가 충분히 모이거나 채택한 문맥이 토큰 예산을 채우면 남은 평가 호출을 취소합니다.
+"""
+import asyncio
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def count_tokens(text):
+    """tiktoken(cl100k_base) 토큰 수"""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+    return len(_encoder.encode(text))
+
+class EnoughContext:
+    """
+    채택한 청크가 충분한지 판단합니다.
+
+    Args:
+        min_relevant (int): 이만큼 관련 청크를 채택하면 종료 (None이면 개수 기준 없음)
+        max_tokens (int): 채택한 청크의 토큰 합이 이 값 이상이면 종료 (None이면 토큰 기준 없음)
+    """
+
+    def __init__(self, min_relevant=None, max_tokens=None, tokenizer=count_tokens):
+        self.min_relevant = min_relevant
+        self.max_tokens = max_tokens
+        self.tokenizer = tokenizer
+        self.accepted = 0
+        self.tokens = 0
+
+    def add(self, text):
+        """채택한 청크를 더하고 충분해졌으면 True를 반환합니다."""
+        self.accepted += 1
+        if self.max_tokens is not None:
+            self.tokens += self.tokenizer(text)
+        return self.enough
+
+    @property
+    def enough(self):
+        if self.min_relevant is not None and self.accepted >= self.min_relevant:
+            return True
+        return self.max_tokens is not None and self.tokens >= self.max_tokens
+
+def grade_until_enough(texts, grade, is_relevant, enough, mode="sequential", max_workers=4):
+    """
+    청크를 평가하다가 충분한 문맥이 모이면 멈춥니다.
+
+    Args:
+        texts (list): 순위순 청크 본문
+        grade (callable): 본문 → 평가 결과 (LLM 호출)
+        is_relevant (callable): 평가 결과 → 관련 여부
+        enough (EnoughContext): 종료 조건
+        mode (str): "sequential"(순위순 하나씩) 또는 "concurrent"(max_workers개씩 동시에)
+        max_workers (int): concurrent 모드의 동시 평가 수
+
+    Returns:
+        tuple: (관련 청크 인덱스 목록(순위순), 평가를 마친 청크 수)
+
+    concurrent 모드에서 이미 실행 중인 스레드의 호출은 멈출 수 없으므로 결과만 버리고,
+    아직 시작하지 않은 호출은 취소합니다.
+    """
+    relevant, graded = [], 0
+    if mode == "sequential":
+        for i, text in enumerate(texts):
+            result = grade(text)
+            graded += 1
+            if is_relevant(result):
+                relevant.append(i)
+                if enough.add(text):
+                    break
+        return relevant, graded
+
+    if mode != "concurrent":
+        raise ValueError(f"알 수 없는 평가 모드입니다: {mode}")
+
+    # 컨텍스트(콜백, 사용량 장부)를 복사하는 풀
+    executor = ContextThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = {executor.submit(grade, text): i for i, text in enumerate(texts)}
+        while pending and not enough.enough:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            # 같이 끝난 결과는 순위순으로 채택한다
+            for future in sorted(done, key=pending.get):
+                i = pending.pop(future)
+                graded += 1
+                if is_relevant(future.result()) and not enough.enough:
+                    relevant.append(i)
+                    enough.add(texts[i])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return sorted(relevant), graded
+
+async def agrade_until_enough(texts, agrade, is_relevant, enough, mode="concurrent", max_concurrency=None):
+    """
+    grade_until_enough의 비동기 버전. concurrent 모드에서는 남은 평가 태스크를 실제로 취소합니다.
+
+    Args:
+        agrade (callable): 본문 → 평가 결과 코루틴
+        max_concurrency (int): 동시에 실행할 평가 수 (None이면 전부)
+    """
+    relevant, graded = [], 0
+    if mode == "sequential":
+        for i, text in enumerate(texts):
+            result = await agrade(text)
+            graded += 1
+            if is_relevant(result):
+                relevant.append(i)
+                if enough.add(text):
+                    break
+        return relevant, graded
+
+    if mode != "concurrent":
+        raise ValueError(f"알 수 없는 평가 모드입니다: {mode}")
+
+    semaphore = asyncio.Semaphore(max_concurrency or max(len(texts), 1))
+
+    async def limited(text):
+        async with semaphore:
+            return await agrade(text)
+
+    pending = {asyncio.ensure_future(limited(text)): i for i, text in enumerate(texts)}
+    try:
+        while pending and not enough.enough:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=pending.get):
+                i = pending.pop(task)
+                graded += 1
+                if is_relevant(task.result()) and not enough.enough:
+                    relevant.append(i)
+                    enough.add(texts[i])
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    return sorted(relevant), graded
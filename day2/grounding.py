@@ -0,0 +1,122 @@
+import re
+import threading
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?。])\s+|\n+")
+def split_sentences(text):
+    """답변을 문장 단위로 나눕니다."""
+    return [s.strip() for s in _SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+def _ngrams(words, n):
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+def ngram_overlap(sentence, context_words, n=3):
+    """문장의 단어 n-gram 중 문서에도 있는 비율 (짧은 문장은 n을 줄여서 계산)"""
+    words = _words(sentence)
+    if not words:
+        return 1.0
+    n = min(n, len(words))
+    sentence_ngrams = _ngrams(words, n)
+    return len(sentence_ngrams & _ngrams(context_words, n)) / len(sentence_ngrams)
+
+# 부정 표현: 겹침 점수로는 "uses"와 "does not use"를 구분할 수 없으므로 따로 비교한다
+_NEGATION_WORDS = {"not", "no", "never", "none", "nor", "neither", "without", "cannot", "nothing", "nobody"}
+_NEGATION_MARKERS = ("n't", "n’t", "않", "없", "못", "아니")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+def negation_count(text):
+    """문장의 부정 표현 수 (영어 부정어, 축약형 n't, 한국어 부정 어미)"""
+    text = text.lower()
+    return sum(1 for w in _words(text) if w in _NEGATION_WORDS) + sum(text.count(m) for m in _NEGATION_MARKERS)
+
+def numbers(text):
+    """문장에 나온 숫자 집합"""
+    return set(_NUMBER.findall(text))
+
+class GroundingStats:
+    """
+    사전 검사 지표
+
+    Attributes:
+        checks: 사전 검사 횟수
+        skipped: 근거가 명확해 LLM 평가를 생략한 횟수
+        escalated: 불확실해서 LLM 평가로 넘긴 횟수
+    """
+
+    def __init__(self):
+        self.checks = 0
+        self.skipped = 0
+        self.escalated = 0
+        self._lock = threading.Lock()
+
+    def record(self, grounded):
+        with self._lock:
+            self.checks += 1
+            if grounded:
+                self.skipped += 1
+            else:
+                self.escalated += 1
+
+    @property
+    def avoided_ratio(self):
+        """LLM 평가 호출을 생략한 비율"""
+        return self.skipped / self.checks if self.checks else 0.0
+
+    def as_dict(self):
+        return {"checks": self.checks, "skipped": self.skipped, "escalated": self.escalated, "avoided_ratio": self.avoided_ratio}
+
+class GroundingScorer:
+    """
+    답변 문장이 문서 문장을 거의 그대로 옮긴 것인지(near-extractive) 로컬에서 검사합니다.
+
+    문장마다 n-gram 겹침이 가장 큰 문서 문장을 찾고, 겹침이 ngram_threshold 이상이면서
+    부정 표현 수와 숫자가 그 문서 문장과 일치해야 근거 있음으로 봅니다. 겹침 점수나 임베딩 유사도로는
+    "사용한다"와 "사용하지 않는다" 같은 모순을 구분할 수 없으므로, 조금이라도 애매하면 LLM 평가로 넘깁니다.
+    모든 문장이 통과할 때만 LLM 평가를 생략합니다. (근거 없음을 로컬에서 판정하지는 않음)
+    """
+
+    def __init__(self, ngram_threshold=0.9):
+        self.ngram_threshold = ngram_threshold
+        self.stats = GroundingStats()
+
+    def _score(self, sentence, context_sentences):
+        """문장과 가장 많이 겹치는 문서 문장을 찾아 근거 여부를 판정합니다."""
+        overlap, match = max(
+            ((ngram_overlap(sentence, words), text) for text, words in context_sentences),
+            key=lambda pair: pair[0],
+            default=(0.0, ""),
+        )
+        negation_mismatch = negation_count(sentence) != negation_count(match)
+        number_mismatch = not numbers(sentence) <= numbers(match)
+        return {
+            "sentence": sentence,
+            "ngram": overlap,
+            "match": match,
+            "negation_mismatch": negation_mismatch,
+            "number_mismatch": number_mismatch,
+            "grounded": overlap >= self.ngram_threshold and not negation_mismatch and not number_mismatch,
+        }
+
+    def _decide(self, results):
+        grounded = bool(results) and all(r["grounded"] for r in results)
+        self.stats.record(grounded)
+        return grounded, results
+
+    def check(self, answer, contexts):
+        """
+        답변이 문서에 명확히 근거하는지 검사합니다.
+
+        Args:
+            answer (str): 생성된 답변
+            contexts (list): 문서 본문 목록
+
+        Returns:
+            tuple: (명확히 근거 있음 여부, 문장별 점수 목록)
+        """
+        sentences = split_sentences(answer)
+        if not sentences or not contexts:
+            return self._decide([])
+        context_sentences = [(text, _words(text)) for context in contexts for text in split_sentences(context)]
+        return self._decide([self._score(sentence, context_sentences) for sentence in sentences])
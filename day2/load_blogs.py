@@ -1,28 +1,112 @@
+import os
 from dotenv import load_dotenv
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from snapshot import SnapshotMismatchError, SnapshotVectorStore, snapshot_from_chroma
+from memprofile import profiler
+from dedupe import deduplicate
 
 load_dotenv() # .env 파일 로드
 
-def get_retriever():
+def select_adaptive(scored, mode, min_k, max_k, score_threshold, knee_gap):
+    """점수 내림차순 (문서, 점수) 목록에서 컷오프/knee 기준으로 필요한 만큼만 고릅니다."""
+    scored = scored[:max_k]
+    count = sum(1 for _, score in scored if score >= score_threshold)
+
+    if mode == "knee":
+        # 컷오프를 통과한 범위 안에서 점수가 크게 떨어지는 첫 지점에서 자른다
+        for i in range(max(min_k, 1), count):
+            if scored[i - 1][1] - scored[i][1] >= knee_gap:
+                count = i
+                break
+
+    return scored[:max(min_k, count)]
+
+class AdaptiveRetriever(BaseRetriever):
+    """유사도 점수에 따라 반환 개수가 달라지는 리트리버"""
+
+    vectorstore: VectorStore
+    mode: str = "threshold"
+    min_k: int = 1
+    max_k: int = 6
+    score_threshold: float = 0.35
+    knee_gap: float = 0.05
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        scored = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.max_k)
+        selected = select_adaptive(
+            scored, self.mode, self.min_k, self.max_k, self.score_threshold, self.knee_gap
+        )
+        for doc, score in selected:
+            doc.metadata["relevance_score"] = score
+        return [doc for doc, _ in selected]
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+def get_retriever(k=6, mode="fixed", min_k=1, max_k=6, score_threshold=0.35, knee_gap=0.05, snapshot_path=None,
+                  embedding=None, dedupe_threshold=None, embedding_model=EMBEDDING_MODEL):
+    embedding = embedding or OpenAIEmbeddings(model=embedding_model)
+
+    # 스냅샷이 있으면 문서를 다시 받거나 임베딩하지 않고 바로 연다
+    vectorstore = None
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            vectorstore = SnapshotVectorStore.load(snapshot_path, embedding, embedding_model)
+            print(f"스냅샷에서 벡터 저장소 로드: {snapshot_path} (문서 수: {len(vectorstore.snapshot)})")
+        except SnapshotMismatchError as e:
+            # 다른 임베딩 모델로 만든 스냅샷은 쓸 수 없으므로 현재 모델로 다시 만든다
+            print(f"{e} 현재 모델로 다시 만듭니다.")
+    if vectorstore is None:
+        vectorstore = build_vectorstore(embedding, dedupe_threshold)
+        if snapshot_path:
+            snapshot_from_chroma(vectorstore, snapshot_path, embedding_model)
+            print(f"스냅샷 저장: {snapshot_path}")
+
+    # mode: "fixed"는 항상 k개, "threshold"/"knee"는 점수에 따라 min_k~max_k개
+    if mode == "fixed":
+        retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={'k': k})
+    else:
+        retriever = AdaptiveRetriever(
+            vectorstore=vectorstore, mode=mode, min_k=min_k, max_k=max_k,
+            score_threshold=score_threshold, knee_gap=knee_gap
+        )
+    return retriever
+
+def build_vectorstore(embedding, dedupe_threshold=None):
+    """
+    블로그 글을 받아 분할하고 Chroma에 저장합니다.
+    dedupe_threshold가 None이 아니면 추정 자카드 유사도가 그 이상인 청크를 묶어 대표 하나만 저장합니다.
+    """
     urls = [
         "https://lilianweng.github.io/posts/2023-06-23-agent/",
         "https://lilianweng.github.io/posts/2023-03-15-prompt-engineering/",
         "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
     ]
 
-    loader = WebBaseLoader(urls)
-    docs = loader.load()
+    # 메모리 프로파일러가 꺼져 있으면 stage()는 아무 일도 하지 않는다
+    with profiler.stage("fetch"):
+        loader = WebBaseLoader(urls)
+        docs = loader.load()
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splits = text_splitter.split_documents(docs)
+    with profiler.stage("split"):
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        splits = text_splitter.split_documents(docs)
 
-    vectorstore = Chroma.from_documents(documents=splits, embedding=OpenAIEmbeddings(model="text-embedding-3-small"))
+    if dedupe_threshold is not None:
+        with profiler.stage("dedupe"):
+            splits, stats = deduplicate(splits, threshold=dedupe_threshold)
+        print(
+            f"중복 청크 제거: {stats.chunks} -> {stats.kept} "
+            f"(묶음 {stats.clusters}개, {stats.removed}개 제거, 인덱스 {stats.reduction:.1%} 감소)"
+        )
 
-    retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={'k': 6})
-    return retriever
+    with profiler.stage("store"):
+        vectorstore = Chroma.from_documents(documents=splits, embedding=profiler.wrap_embeddings(embedding))
+    return vectorstore
 
 if __name__ == "__main__":
     retriever = get_retriever()
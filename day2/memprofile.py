@@ -0,0 +1,292 @@
+"""
+단계별 메모리 프로파일러 (tracemalloc + RSS 샘플링)
+
+수집(fetch, split, embed, store)과 질의(retrieve, grade, generate) 단계마다
+파이썬 할당량, tracemalloc 피크, RSS 변화/피크와 상위 할당 위치를 기록합니다.
+꺼져 있으면 stage()와 래퍼는 아무 일도 하지 않습니다.
+
+사용법:
+    from memprofile import profiler
+    profiler.start()
+    with profiler.stage("split"):
+        ...
+    profiler.write_report("memory_profile.txt")
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from langchain_core.embeddings import Embeddings
+
+MIB = 1024 * 1024
+
+def read_rss():
+    """현재 프로세스의 RSS(바이트). /proc이 없으면 최대 RSS로 대신합니다."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS는 바이트, Linux는 KB 단위
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+class _ActiveStage:
+    """실행 중인 단계 하나의 측정값"""
+
+    def __init__(self, name, snapshot):
+        self.name = name
+        self.start_time = time.perf_counter()
+        self.start_traced = tracemalloc.get_traced_memory()[0]
+        self.peak_traced = self.start_traced
+        self.start_rss = read_rss()
+        self.peak_rss = self.start_rss
+        self.snapshot = snapshot
+
+class StageStats:
+    """
+    단계 이름별 누적 지표
+
+    Attributes:
+        calls: 실행 횟수
+        seconds: 총 소요 시간
+        allocated: 단계가 끝난 뒤에도 남아 있는 파이썬 할당량 합계 (바이트)
+        peak: 단계 시작 대비 tracemalloc 피크 증가량의 최댓값 (바이트)
+        rss_delta: RSS 변화량 합계 (바이트)
+        rss_peak: 단계 중 관측된 RSS 최댓값 (바이트)
+        sites: 할당 위치("파일:줄")별 (증가 바이트, 증가 블록 수)
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.allocated = 0
+        self.peak = 0
+        self.rss_delta = 0
+        self.rss_peak = 0
+        self.sites = {}
+
+    def top_sites(self, limit):
+        return sorted(self.sites.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+
+    def as_dict(self, top=10):
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "allocated_bytes": self.allocated,
+            "peak_bytes": self.peak,
+            "rss_delta_bytes": self.rss_delta,
+            "rss_peak_bytes": self.rss_peak,
+            "top_sites": [
+                {"site": site, "size_bytes": size, "blocks": count}
+                for site, (size, count) in self.top_sites(top)
+            ],
+        }
+
+class MemoryProfiler:
+    """
+    단계별 메모리 사용량을 기록합니다.
+
+    여러 단계가 동시에 실행되면(스레드/비동기 노드) 겹친 구간의 할당은
+    실행 중인 모든 단계에 함께 잡힙니다. 정확한 분리가 필요하면 순차 실행으로 측정하세요.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.top = 10
+        self.stats = {}
+        self._active = []
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def start(self, top=10, frames=1, sample_interval=0.05):
+        """
+        프로파일링을 켭니다.
+
+        Args:
+            top: 단계별로 보고할 상위 할당 위치 수 (0이면 스냅샷을 찍지 않음)
+            frames: 할당 위치마다 저장할 스택 프레임 수
+            sample_interval: RSS 샘플링 간격 (초)
+        """
+        if self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.top = top
+        self.enabled = True
+        self._stop.clear()
+        self._sampler = threading.Thread(
+            target=self._sample_rss, args=(sample_interval,), name="memprofile-rss", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self):
+        """프로파일링을 끕니다. 지금까지 모은 지표는 유지됩니다."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._stop.set()
+        self._sampler.join()
+        tracemalloc.stop()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+    def _sample_rss(self, interval):
+        while not self._stop.wait(interval):
+            rss = read_rss()
+            with self._lock:
+                for active in self._active:
+                    active.peak_rss = max(active.peak_rss, rss)
+
+    def _update_peaks(self):
+        """실행 중인 단계들의 피크를 갱신하고 tracemalloc 피크를 초기화합니다 (잠금 안에서 호출)."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for active in self._active:
+            active.peak_traced = max(active.peak_traced, peak)
+        tracemalloc.reset_peak()
+
+    def _take_snapshot(self):
+        if not self.top:
+            return None
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+
+    def _enter(self, name):
+        snapshot = self._take_snapshot()
+        with self._lock:
+            self._update_peaks()
+            active = _ActiveStage(name, snapshot)
+            self._active.append(active)
+        return active
+
+    def _exit(self, active):
+        with self._lock:
+            self._update_peaks()
+            self._active.remove(active)
+        end_traced = tracemalloc.get_traced_memory()[0]
+        end_rss = read_rss()
+        snapshot = self._take_snapshot()
+
+        with self._lock:
+            stats = self.stats.setdefault(active.name, StageStats())
+            stats.calls += 1
+            stats.seconds += time.perf_counter() - active.start_time
+            stats.allocated += end_traced - active.start_traced
+            stats.peak = max(stats.peak, active.peak_traced - active.start_traced)
+            stats.rss_delta += end_rss - active.start_rss
+            stats.rss_peak = max(stats.rss_peak, active.peak_rss, end_rss)
+            if snapshot is not None:
+                for diff in snapshot.compare_to(active.snapshot, "lineno"):
+                    if diff.size_diff <= 0:
+                        continue
+                    frame = diff.traceback[0]
+                    site = f"{frame.filename}:{frame.lineno}"
+                    size, count = stats.sites.get(site, (0, 0))
+                    stats.sites[site] = (size + diff.size_diff, count + diff.count_diff)
+
+    @contextmanager
+    def stage(self, name):
+        """with 블록을 name 단계로 측정합니다. 꺼져 있으면 아무 일도 하지 않습니다."""
+        if not self.enabled:
+            yield
+            return
+        active = self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit(active)
+
+    def profiled(self, name, fn):
+        """함수(동기/비동기) 실행을 name 단계로 측정하는 래퍼를 반환합니다."""
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def wrap_embeddings(self, embeddings):
+        """임베딩 호출을 "embed" 단계로 측정하는 Embeddings를 반환합니다. 꺼져 있으면 그대로 반환합니다."""
+        if not self.enabled:
+            return embeddings
+        return ProfiledEmbeddings(embeddings, self)
+
+    def summary(self):
+        with self._lock:
+            return {name: stats.as_dict(self.top) for name, stats in self.stats.items()}
+
+    def format_report(self):
+        lines = ["=== 단계별 메모리 프로파일 ==="]
+        lines.append(
+            f"{'stage':<12} {'calls':>6} {'seconds':>9} {'alloc MiB':>10} {'peak MiB':>9} "
+            f"{'RSS Δ MiB':>10} {'RSS peak':>9}"
+        )
+        with self._lock:
+            items = list(self.stats.items())
+        for name, stats in items:
+            lines.append(
+                f"{name:<12} {stats.calls:>6} {stats.seconds:>9.2f} {stats.allocated / MIB:>10.1f} "
+                f"{stats.peak / MIB:>9.1f} {stats.rss_delta / MIB:>10.1f} {stats.rss_peak / MIB:>9.1f}"
+            )
+        for name, stats in items:
+            sites = stats.top_sites(self.top)
+            if not sites:
+                continue
+            lines.append(f"\n--- {name}: 상위 할당 위치 ---")
+            for site, (size, count) in sites:
+                lines.append(f"{size / MIB:>9.2f} MiB {count:>+9} blocks  {site}")
+        return "\n".join(lines)
+
+    def write_report(self, path):
+        """보고서를 파일로 씁니다. 확장자가 .json이면 JSON, 아니면 표 형식 텍스트."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+            else:
+                f.write(self.format_report() + "\n")
+        return path
+
+class ProfiledEmbeddings(Embeddings):
+    """임베딩 호출을 "embed" 단계로 측정하는 래퍼"""
+
+    def __init__(self, embeddings, profiler):
+        self.embeddings = embeddings
+        self.profiler = profiler
+
+    def embed_documents(self, texts):
+        with self.profiler.stage("embed"):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        with self.profiler.stage("embed"):
+            return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts):
+        with self.profiler.stage("embed"):
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text):
+        with self.profiler.stage("embed"):
+            return await self.embeddings.aembed_query(text)
+
+profiler = MemoryProfiler()
@@ -1,7 +1,17 @@
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from load_blogs import get_retriever
+from singleflight import SingleFlight, normalize_question
+from grounding import GroundingScorer
+from cassette import Cassette, wrap_chat_model, wrap_embeddings
+from memprofile import profiler
+from usage import track_usage, tiered_model, model_key
+from early_exit import EnoughContext, grade_until_enough
+from query_cache import CachedQueryEmbeddings, CachedRetriever, LRUCache, index_version
+from scheduler import ExecutionScheduler
+from sentence_verify import VerificationStats, verify_sentences, format_unsupported, parse_revisions, splice_revisions
+from binary_grader import SINGLE_TOKEN_INSTRUCTION, GraderStats, single_token_settings, json_grader, binary_grader
 from operator import itemgetter
 from typing import List, Dict, Any, Tuple
 
@@ -10,9 +20,82 @@ class RAGSystemConfig:
     """RAG 시스템 설정"""
     def __init__(self):
         self.retrieval_k = 6
+        # 검색 모드: "fixed" | "threshold" (유사도 컷오프) | "knee" (점수 간격 감지)
+        self.retrieval_mode = "fixed"
+        self.retrieval_min_k = 1
+        self.retrieval_max_k = 6
+        self.retrieval_score_threshold = 0.35
+        self.retrieval_knee_gap = 0.05
+        # 인덱스 스냅샷 경로: 있으면 재구축 없이 바로 로드, 없으면 구축 후 저장 (None이면 사용 안 함)
+        self.snapshot_path = None
+        # 인덱싱 시 중복에 가까운 청크를 묶는 추정 자카드 유사도 기준 (None이면 중복 제거 안 함, 예: 0.8)
+        # 스냅샷을 쓰면 값을 바꾼 뒤 스냅샷 파일을 지워야 다시 만들 때 적용됨
+        self.dedupe_threshold = None
+        # 관련성 평가 모드: "all"(전부 평가) | "sequential"(순위순, 충분하면 종료) | "concurrent"(동시, 충분하면 나머지 취소)
+        self.grading_mode = "all"
+        # 조기 종료 조건: 관련 청크 수 / 채택한 문맥의 토큰 합 (None이면 해당 기준 없음)
+        self.early_exit_min_relevant = 2
+        self.early_exit_max_context_tokens = None
+        self.grading_max_concurrency = 4
+        # yes/no 평가기(relevance, hallucination)를 단일 토큰 logprob으로 판정할지 여부
+        # (logprobs가 없는 응답은 JSON 경로로 돌아감)
+        self.grader_fast_path = False
+        # 단일 토큰 경로에서 P(yes)가 이 값 이상이면 "yes"
+        self.grader_thresholds = {"relevance": 0.5, "hallucination": 0.5, "sentence": 0.5}
         self.max_attempts = 2
         self.llm_model = "gpt-4o-mini"
         self.llm_temperature = 0
+        # 체인별 모델 티어: llm_model/llm_temperature 위에 덮어쓸 ChatOpenAI 파라미터
+        # (relevance: 관련성 평가, answer: 답변 생성, hallucination: 할루시네이션 평가)
+        # 평가기의 max_tokens는 JSON 응답용이라 잘리지 않도록 64 이상으로 둠 (단일 토큰 경로는 따로 1로 설정)
+        self.chain_models = {
+            "relevance": {"max_tokens": 64},
+            "hallucination": {"max_tokens": 64},
+            "sentence": {"max_tokens": 64},
+        }
+        # 요청 예산을 다 쓴 뒤 체인별로 쓸 저렴한 티어 (없는 체인은 계속 chain_models 사용)
+        self.economy_chain_models = {
+            "relevance": {"model": "gpt-4.1-nano", "max_tokens": 64},
+            "hallucination": {"model": "gpt-4.1-nano", "max_tokens": 64},
+            "sentence": {"model": "gpt-4.1-nano", "max_tokens": 64},
+            "answer": {"max_tokens": 256},
+        }
+        # 요청당 LLM 비용 예산 (USD, None이면 무제한)
+        self.request_cost_budget = None
+        # 정규화한 질문이 같으면 질문 임베딩과 검색 결과를 재사용할지 여부 (LRU)
+        # 검색 결과는 스냅샷 파일이 다시 만들어지면 무효화됨
+        self.query_cache = True
+        self.query_embedding_cache_size = 4096
+        self.query_result_cache_size = 1024
+        # 실행 스케줄러: query()를 우선순위 클래스별 동시 실행 한도와 유한 큐로 제어
+        # (대화형 요청이 배치 평가에 밀리지 않도록 함, 큐가 가득 차면 QueueFullError로 거절)
+        self.scheduler_enabled = False
+        self.scheduler_max_concurrency = 8
+        self.scheduler_classes = {
+            "interactive": {"priority": 0, "max_concurrency": 8, "max_queue": 32},
+            "batch": {"priority": 1, "max_concurrency": 2, "max_queue": 256},
+        }
+        self.scheduler_default_class = "interactive"
+        # 동시에 들어온 같은 질문을 한 번만 실행할지 여부
+        self.coalesce_requests = True
+        # LLM 할루시네이션 평가 전에 로컬 근거 점수로 명확히 근거 있는 답변을 걸러낼지 여부
+        # 문서를 거의 그대로 옮긴 문장(n-gram 겹침이 높고 부정 표현/숫자가 일치)만 통과시키며, 기본은 꺼 둠
+        self.grounding_precheck = False
+        self.grounding_ngram_threshold = 0.9
+        # 할루시네이션 평가 방식: "answer"(답변 전체를 평가, 실패하면 전체 재생성)
+        # | "sentence"(문장별로 동시에 검증, 근거 없는 문장만 수정하고 검증된 문장은 다시 검증하지 않음)
+        self.hallucination_check_mode = "answer"
+        self.sentence_verify_max_concurrency = 8
+        self.embedding_model = "text-embedding-3-small"
+        # 카세트: None(실제 호출), "record"(호출 기록), "replay"(기록으로 오프라인 실행)
+        # replay 시 문서 로딩까지 오프라인으로 하려면 snapshot_path도 함께 지정
+        self.cassette_mode = None
+        self.cassette_path = "./cassettes/day2.jsonl"
+        self.cassette_replay_latency = True
+        # 단계(fetch/split/embed/store/retrieve/grade/generate)별 메모리 프로파일링 여부
+        self.memory_profile = False
+        self.memory_profile_path = "./memory_profile.txt"
+        self.memory_profile_top = 10
 
 
 class RAGSystem:
@@ -21,29 +104,138 @@ class RAGSystem:
     def __init__(self, config: RAGSystemConfig = None):
         """RAG 시스템 초기화"""
         self.config = config or RAGSystemConfig()
+
+        # 메모리 프로파일러 (벡터 저장소 구축 전에 켜야 수집 단계도 잡힌다)
+        if self.config.memory_profile:
+            profiler.start(top=self.config.memory_profile_top)
         
+        # 카세트 (기록/재생)
+        self.cassette = None
+        if self.config.cassette_mode:
+            self.cassette = Cassette(
+                self.config.cassette_path, self.config.cassette_mode, self.config.cassette_replay_latency
+            )
+
         # LLM 및 파서 초기화
-        self.llm = ChatOpenAI(
-            model=self.config.llm_model, 
-            temperature=self.config.llm_temperature
+        self._chat_models = {}
+        self.llm = self._chat_model({"model": self.config.llm_model, "temperature": self.config.llm_temperature})
+        self.embeddings = wrap_embeddings(
+            lambda: OpenAIEmbeddings(model=self.config.embedding_model),
+            self.config.embedding_model,
+            self.cassette,
         )
+        if self.config.query_cache:
+            self.embeddings = CachedQueryEmbeddings(
+                self.embeddings, self.config.embedding_model, LRUCache(self.config.query_embedding_cache_size)
+            )
         self.parser = JsonOutputParser()
         
         # 체인들 초기화
         self._setup_chains()
+
+        # 동일 질문 병합기
+        self._flight = SingleFlight()
+
+        # 문장 단위 검증 지표
+        self._verification_stats = VerificationStats()
+
+        # 실행 스케줄러
+        self.scheduler = None
+        if self.config.scheduler_enabled:
+            self.scheduler = ExecutionScheduler(
+                self.config.scheduler_classes,
+                self.config.scheduler_max_concurrency,
+                self.config.scheduler_default_class,
+            )
+
+        # 근거 사전 검사기
+        self.grounding_scorer = GroundingScorer(ngram_threshold=self.config.grounding_ngram_threshold)
         
         # Retriever 초기화 (한 번만!)
         print("벡터 저장소 초기화 중...")
-        self.retriever = get_retriever()
+        self.retriever = get_retriever(
+            k=self.config.retrieval_k,
+            mode=self.config.retrieval_mode,
+            min_k=self.config.retrieval_min_k,
+            max_k=self.config.retrieval_max_k,
+            score_threshold=self.config.retrieval_score_threshold,
+            knee_gap=self.config.retrieval_knee_gap,
+            snapshot_path=self.config.snapshot_path,
+            embedding=self.embeddings,
+            dedupe_threshold=self.config.dedupe_threshold,
+            embedding_model=self.config.embedding_model,
+        )
+        if self.config.query_cache:
+            self.retriever = CachedRetriever(
+                retriever=self.retriever,
+                cache=LRUCache(self.config.query_result_cache_size),
+                model_name=self.config.embedding_model,
+                version=lambda: index_version(self.config.snapshot_path),
+            )
         print("RAG 시스템 초기화 완료!")
     
+    def _chat_model(self, settings: Dict[str, Any]):
+        """ChatOpenAI 파라미터로 채팅 모델을 만듭니다. 같은 설정은 한 번만 만듭니다."""
+        key = model_key(settings)
+        if key not in self._chat_models:
+            # 카세트 기록은 모델 이름과 기본값이 아닌 파라미터로 구분한다
+            extra = [f"{k}={v}" for k, v in key[1] if not (k == "temperature" and v == 0)]
+            self._chat_models[key] = wrap_chat_model(
+                lambda: ChatOpenAI(**settings), ":".join([settings["model"], *extra]), self.cassette
+            )
+        return self._chat_models[key]
+
+    def _chain_llm(self, chain: str, single_token: bool = False):
+        """
+        체인별 티어 모델. 요청 예산을 다 쓰면 economy 티어로 바뀌고 사용량이 장부에 기록됩니다.
+        single_token이면 yes/no 한 토큰과 logprobs를 요청합니다.
+        """
+        base = {"model": self.config.llm_model, "temperature": self.config.llm_temperature}
+        primary = {**base, **self.config.chain_models.get(chain, {})}
+        economy = self.config.economy_chain_models.get(chain)
+        if economy is not None:
+            economy = {**primary, **economy}
+        if single_token:
+            primary = single_token_settings(primary)
+            economy = single_token_settings(economy) if economy else None
+        return tiered_model(
+            chain,
+            self._chat_model(primary),
+            self._chat_model(economy) if economy else None,
+            primary["model"],
+            economy["model"] if economy else None,
+        )
+
+    def _yes_no_chain(self, chain: str, json_prompt: PromptTemplate, fast_template: str, key: str, default: str):
+        """
+        yes/no 평가 체인. 결과는 항상 {key: "yes"|"no"}를 포함하고, 잘못된 JSON 응답은 default로 판정합니다.
+        grader_fast_path이면 단일 토큰 logprob으로 판정하고 logprobs가 없으면 JSON 경로로 돌아갑니다.
+        """
+        grader = json_grader(
+            json_prompt | self._chain_llm(chain), key=key, default=default, stats=self._grader_stats,
+            parser=self.parser,
+        )
+        if not self.config.grader_fast_path:
+            return grader
+        fast_prompt = PromptTemplate.from_template(fast_template + SINGLE_TOKEN_INSTRUCTION)
+        return binary_grader(
+            fast_prompt | self._chain_llm(chain, single_token=True),
+            grader,
+            key=key,
+            threshold=self.config.grader_thresholds.get(chain, 0.5),
+            stats=self._grader_stats,
+        )
+
     def _setup_chains(self):
         """프롬프트 체인들 설정"""
+        self._grader_stats = GraderStats()
+
         # 1. 관련성 평가 체인
-        relevance_prompt = PromptTemplate(
-            template="""You are an expert in evaluating the relevance between a user query and a retrieved document chunk.
+        relevance_task = """You are an expert in evaluating the relevance between a user query and a retrieved document chunk.
 Your task is to determine if the retrieved chunk is relevant to the user's query.
-Output your answer in JSON format, using the following structure:
+"""
+        relevance_prompt = PromptTemplate(
+            template=relevance_task + """Output your answer in JSON format, using the following structure:
 {{"relevance": "yes"}} if the chunk is relevant, or {{"relevance": "no"}} if it is not.
 
 User Query: {user_query}
@@ -55,7 +247,17 @@ Retrieved Chunk: {retrieved_chunk}
                 "format_instructions": self.parser.get_format_instructions()
             },
         )
-        self.relevance_chain = relevance_prompt | self.llm | self.parser
+        self.relevance_chain = self._yes_no_chain(
+            "relevance",
+            relevance_prompt,
+            relevance_task + """
+User Query: {user_query}
+Retrieved Chunk: {retrieved_chunk}
+
+Is the chunk relevant to the query? """,
+            key="relevance",
+            default="no",
+        )
         
         # 2. 답변 생성 체인
         answer_prompt = PromptTemplate(
@@ -71,11 +273,10 @@ Output your answer in JSON format, using the following structure: {{"answer": "Y
                 "format_instructions": self.parser.get_format_instructions()
             },
         )
-        self.answer_chain = answer_prompt | self.llm | self.parser
+        self.answer_chain = answer_prompt | self._chain_llm("answer") | self.parser
         
         # 3. Hallucination 평가 체인
-        hallucination_prompt = PromptTemplate(
-            template="""You are an expert in evaluating whether an AI-generated answer contains hallucinations.
+        hallucination_task = """You are an expert in evaluating whether an AI-generated answer contains hallucinations.
 Your task is to determine if the generated answer is faithful to the provided context and does not contain any information that is not supported by the context.
 
 A hallucination occurs when:
@@ -85,7 +286,9 @@ A hallucination occurs when:
 4. The answer draws conclusions that go beyond what the context supports
 
 Evaluate the generated answer against the provided context and determine if there are any hallucinations.
-Output your answer in JSON format, using the following structure:
+"""
+        hallucination_prompt = PromptTemplate(
+            template=hallucination_task + """Output your answer in JSON format, using the following structure:
 {{"hallucination": "yes"}} if the answer contains hallucinations, or {{"hallucination": "no"}} if it does not.
 
 Context: {context}
@@ -97,18 +300,85 @@ Generated Answer: {generated_answer}
                 "format_instructions": self.parser.get_format_instructions()
             },
         )
-        self.hallucination_chain = hallucination_prompt | self.llm | self.parser
+        # 잘못된 응답은 할루시네이션으로 보고 재생성한다
+        self.hallucination_chain = self._yes_no_chain(
+            "hallucination",
+            hallucination_prompt,
+            hallucination_task + """
+Context: {context}
+Generated Answer: {generated_answer}
+
+Does the answer contain hallucinations? """,
+            key="hallucination",
+            default="yes",
+        )
+
+        # 4. 문장 근거 평가 체인 (hallucination_check_mode = "sentence")
+        sentence_task = """You are an expert in evaluating whether a single sentence from an AI-generated answer is supported by the provided context.
+The sentence is supported only if every claim in it is stated in or directly follows from the context.
+"""
+        sentence_prompt = PromptTemplate(
+            template=sentence_task + """Output your answer in JSON format, using the following structure:
+{{"supported": "yes"}} if the sentence is supported, or {{"supported": "no"}} if it is not.
+
+Context: {context}
+Sentence: {sentence}
+{format_instructions}
+""",
+            input_variables=["context", "sentence"],
+            partial_variables={
+                "format_instructions": self.parser.get_format_instructions()
+            },
+        )
+        self.sentence_chain = self._yes_no_chain(
+            "sentence",
+            sentence_prompt,
+            sentence_task + """
+Context: {context}
+Sentence: {sentence}
+
+Is the sentence supported by the context? """,
+            key="supported",
+            default="no",
+        )
+
+        # 5. 근거 없는 문장 수정 체인
+        revise_prompt = PromptTemplate(
+            template="""Revise the answer so that it is fully supported by the provided context.
+The numbered sentences below are from the answer and are not supported by the context.
+For each listed sentence, rewrite it using only information from the context, or use an empty string to remove it.
+Do not change any other sentence.
+Output your answer in JSON format, using the following structure: {{"revisions": ["revised sentence 1", "..."]}}
+with one string per listed sentence in the same order.
+
+Context: {context}
+User Query: {user_query}
+Answer: {answer}
+Unsupported Sentences:
+{sentences}
+{format_instructions}
+""",
+            input_variables=["context", "user_query", "answer", "sentences"],
+            partial_variables={
+                "format_instructions": self.parser.get_format_instructions()
+            },
+        )
+        self.revise_chain = revise_prompt | self._chain_llm("answer") | self.parser
     
     def retrieve_documents(self, query: str) -> List[Any]:
         """문서 검색"""
         print(f"사용자 쿼리: {query}")
         print("관련 문서 검색 중...")
-        retrieved_docs = self.retriever.invoke(query)
+        with profiler.stage("retrieve"):
+            retrieved_docs = self.retriever.invoke(query)
         print(f"검색된 문서 개수: {len(retrieved_docs)}")
         return retrieved_docs
     
     def evaluate_relevance(self, documents: List[Any], query: str) -> Tuple[List[str], List[Any]]:
         """문서 관련성 평가"""
+        if self.config.grading_mode != "all":
+            return self._evaluate_relevance_early_exit(documents, query)
+
         relevant_chunks = []
         relevant_docs = []
         
@@ -117,10 +387,11 @@ Generated Answer: {generated_answer}
             chunk_content = doc.page_content
             print(f"문서 내용 미리보기: {chunk_content[:100]}...")
             
-            relevance_result = self.relevance_chain.invoke({
-                "user_query": query, 
-                "retrieved_chunk": chunk_content
-            })
+            with profiler.stage("grade"):
+                relevance_result = self.relevance_chain.invoke({
+                    "user_query": query, 
+                    "retrieved_chunk": chunk_content
+                })
             print(f"관련성 평가 결과: {relevance_result}")
             
             if relevance_result.get('relevance') == 'yes':
@@ -132,22 +403,55 @@ Generated Answer: {generated_answer}
         
         return relevant_chunks, relevant_docs
     
+    def _evaluate_relevance_early_exit(self, documents: List[Any], query: str) -> Tuple[List[str], List[Any]]:
+        """관련 청크가 충분히 모이면 남은 평가를 건너뛰는 관련성 평가"""
+        def grade(chunk_content):
+            with profiler.stage("grade"):
+                return self.relevance_chain.invoke({
+                    "user_query": query,
+                    "retrieved_chunk": chunk_content
+                })
+
+        relevant, graded = grade_until_enough(
+            [doc.page_content for doc in documents],
+            grade,
+            lambda result: result.get('relevance') == 'yes',
+            EnoughContext(self.config.early_exit_min_relevant, self.config.early_exit_max_context_tokens),
+            mode=self.config.grading_mode,
+            max_workers=self.config.grading_max_concurrency,
+        )
+        print(f"\n관련성 평가: {graded}/{len(documents)}개 평가, {len(relevant)}개 관련 ({self.config.grading_mode})")
+        if graded < len(documents):
+            print(f"-> 충분한 문맥 확보, {len(documents) - graded}개 평가 생략")
+        relevant_docs = [documents[i] for i in relevant]
+        return [doc.page_content for doc in relevant_docs], relevant_docs
+
     def generate_answer(self, query: str, context: str) -> Dict[str, Any]:
         """답변 생성"""
-        return self.answer_chain.invoke({
-            "user_query": query,
-            "context": context
-        })
+        with profiler.stage("generate"):
+            return self.answer_chain.invoke({
+                "user_query": query,
+                "context": context
+            })
     
     def check_hallucination(self, answer: str, context: str) -> Dict[str, Any]:
-        """Hallucination 검사"""
-        return self.hallucination_chain.invoke({
-            "context": context,
-            "generated_answer": answer
-        })
+        """Hallucination 검사 (근거가 명확하면 LLM 평가 생략)"""
+        with profiler.stage("grade"):
+            if self.config.grounding_precheck:
+                grounded, _ = self.grounding_scorer.check(answer, context.split("\n\n"))
+                if grounded:
+                    print("✅ 사전 검사: 모든 문장이 문서에 근거함, LLM 평가 생략")
+                    return {"hallucination": "no", "precheck": True}
+            return self.hallucination_chain.invoke({
+                "context": context,
+                "generated_answer": answer
+            })
     
     def generate_answer_with_validation(self, query: str, context: str) -> Dict[str, Any]:
         """검증과 함께 답변 생성 (재시도 로직 포함)"""
+        if self.config.hallucination_check_mode == "sentence":
+            return self._generate_answer_with_sentence_validation(query, context)
+
         attempt = 1
         
         while attempt <= self.config.max_attempts:
@@ -177,6 +481,78 @@ Generated Answer: {generated_answer}
         
         return answer_response
     
+    def verify_sentences(self, answer: str, context: str, verified: List[str] = ()):
+        """답변 문장별로 문서 근거를 동시에 검증합니다. verified에 있는 문장은 다시 검증하지 않습니다."""
+        contexts = context.split("\n\n")
+
+        def grade(sentence):
+            return self.sentence_chain.invoke({"context": context, "sentence": sentence})
+
+        def precheck(sentences):
+            return self.grounding_scorer.check("\n".join(sentences), contexts)[1]
+
+        with profiler.stage("grade"):
+            return verify_sentences(
+                answer,
+                grade,
+                lambda result: result.get('supported') == 'yes',
+                verified=verified,
+                precheck=precheck if self.config.grounding_precheck else None,
+                max_workers=self.config.sentence_verify_max_concurrency,
+                stats=self._verification_stats,
+            )
+
+    def revise_sentences(self, query: str, context: str, answer: str, unsupported: List[str]):
+        """근거 없는 문장만 수정한 답변을 반환합니다. 수정 응답이 잘못됐거나 답변이 비면 None."""
+        with profiler.stage("generate"):
+            result = self.revise_chain.invoke({
+                "context": context,
+                "user_query": query,
+                "answer": answer,
+                "sentences": format_unsupported(unsupported),
+            })
+        revisions = parse_revisions(result, len(unsupported))
+        revised = splice_revisions(answer, unsupported, revisions) if revisions else ""
+        if not revised:
+            self._verification_stats.add(fallbacks=1)
+            return None
+        self._verification_stats.add(revisions=1)
+        return revised
+
+    def _generate_answer_with_sentence_validation(self, query: str, context: str) -> Dict[str, Any]:
+        """문장 단위로 검증하고 근거 없는 문장만 수정하는 답변 생성"""
+        print(f"\n--- 답변 생성 (시도 1/{self.config.max_attempts}) ---")
+        answer_response = self.generate_answer(query, context)
+        print(f"생성된 답변: {answer_response}")
+        verified = []
+
+        for attempt in range(1, self.config.max_attempts + 1):
+            print(f"\n--- 문장 검증 (시도 {attempt}) ---")
+            answer = answer_response.get('answer', '')
+            verification = self.verify_sentences(answer, context, verified)
+            verified = verification.supported_sentences
+            unsupported = verification.unsupported_sentences
+            print(f"문장 검증 결과: {len(verification.sentences)}개 중 {len(unsupported)}개 근거 없음")
+
+            if verification.grounded:
+                print("✅ 모든 문장이 문서에 근거합니다.")
+                break
+            if attempt == self.config.max_attempts:
+                print("📝 최대 시도 횟수 도달. 현재 답변을 제공합니다.")
+                break
+
+            revised = self.revise_sentences(query, context, answer, unsupported) if unsupported else None
+            if revised is not None:
+                print(f"✏️  근거 없는 문장 {len(unsupported)}개만 수정합니다...")
+                answer_response = {**answer_response, "answer": revised}
+            else:
+                print("🔄 답변을 재생성합니다...")
+                answer_response = self.generate_answer(query, context)
+                verified = []
+            print(f"수정된 답변: {answer_response}")
+
+        return answer_response
+
     def format_sources(self, relevant_docs: List[Any]) -> List[str]:
         """출처 정보 포맷팅"""
         sources = []
@@ -192,8 +568,63 @@ Generated Answer: {generated_answer}
             sources.append(source_info)
         return sources
     
-    def query(self, user_query: str) -> Dict[str, Any]:
-        """RAG 시스템 메인 쿼리 메서드"""
+    def query(self, user_query: str, priority: str = None) -> Dict[str, Any]:
+        """
+        RAG 시스템 메인 쿼리 메서드 (같은 질문이 실행 중이면 그 결과를 함께 받음)
+        scheduler_enabled이면 priority 클래스(예: "interactive", "batch")의 자리가 날 때까지 기다리고,
+        큐가 가득 차면 QueueFullError가 발생합니다.
+        같은 우선순위 클래스의 실행에만 합류하므로 대화형 요청이 큐에서 기다리는 배치 요청 뒤에 서지 않습니다.
+        """
+        if not self.config.coalesce_requests:
+            return self._scheduled_query(user_query, priority)
+        key = (normalize_question(user_query), priority)
+        return self._flight.do(key, self._scheduled_query, user_query, priority)
+
+    def _scheduled_query(self, user_query: str, priority: str = None) -> Dict[str, Any]:
+        if self.scheduler is None:
+            return self._tracked_query(user_query)
+        return self.scheduler.run(lambda: self._tracked_query(user_query), priority)
+
+    def _tracked_query(self, user_query: str) -> Dict[str, Any]:
+        """_query를 실행하고 결과의 usage에 이 요청의 토큰/비용 집계를 담습니다."""
+        with track_usage(self.config.request_cost_budget) as ledger:
+            result = self._query(user_query)
+        usage = ledger.as_dict()
+        print(f"토큰 사용량: 입력 {usage['input_tokens']}, 출력 {usage['output_tokens']}, 비용 ${usage['cost']:.5f}")
+        return {**result, "usage": usage}
+
+    def verification_stats(self) -> Dict[str, Any]:
+        """문장 단위 검증 지표 (검증한 문장 수, 재사용 수, 근거 없는 문장 수, 부분 수정 수 등)"""
+        return self._verification_stats.as_dict()
+
+    def grounding_stats(self) -> Dict[str, Any]:
+        """근거 사전 검사 지표 (검사 수, LLM 평가 생략 수, 생략 비율)"""
+        return self.grounding_scorer.stats.as_dict()
+
+    def scheduler_metrics(self) -> Dict[str, Any]:
+        """클래스별 큐 깊이, 대기 시간, 거절 수 (스케줄러가 꺼져 있으면 빈 dict)"""
+        return self.scheduler.metrics() if self.scheduler else {}
+
+    def query_cache_stats(self) -> Dict[str, Any]:
+        """검색 결과 캐시와 질문 임베딩 캐시의 적중 지표 (query_cache가 꺼져 있으면 빈 dict)"""
+        if not self.config.query_cache:
+            return {}
+        return {"results": self.retriever.cache.stats(), "embeddings": self.embeddings.cache.stats()}
+
+    def grader_stats(self) -> Dict[str, Any]:
+        """yes/no 평가기 경로별 호출 수 (fast: logprob 판정, fallback: JSON 경로, malformed: 잘못된 응답, truncated: 잘린 응답)"""
+        return self._grader_stats.as_dict()
+
+    def memory_report(self, path: str = None) -> str:
+        """단계별 메모리 프로파일 보고서를 파일로 쓰고 경로를 반환합니다."""
+        return profiler.write_report(path or self.config.memory_profile_path)
+
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """요청 병합 지표 (전체 호출 수, 실제 실행 수, 합류 수, 합류 비율)"""
+        return self._flight.stats.as_dict()
+
+    def _query(self, user_query: str) -> Dict[str, Any]:
+        """질문 하나에 대한 실제 RAG 파이프라인"""
         print("\n" + "="*80)
         
         # 1. 문서 검색
@@ -241,3 +672,6 @@ if __name__ == "__main__":
     for query in sample_queries:
         result = rag_system.query(query)
         print()
+
+    if rag_system.config.memory_profile:
+        print(f"메모리 프로파일 저장: {rag_system.memory_report()}")
@@ -0,0 +1,188 @@
+"""
+문장 단위 근거 검증과 부분 수정
+
+답변 전체를 한 번에 평가하고 실패하면 처음부터 다시 생성하는 대신,
+답변을 문장으로 나눠 각 문장이 문서에 근거하는지 동시에 검증하고
+근거 없는 문장만 생성기에 수정(또는 삭제)하도록 요청합니다.
+이미 검증된 문장은 다음 검증에서 건너뛰므로 재시도마다 검증/수정 호출이 짧아집니다.
+"""
+import asyncio
+import re
+import threading
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from grounding import split_sentences
+
+class VerificationStats:
+    """
+    문장 검증 지표
+
+    Attributes:
+        verifications: 검증 횟수
+        checked: LLM으로 검증한 문장 수
+        reused: 이전에 검증돼 건너뛴 문장 수
+        prechecked: 로컬 사전 검사로 통과한 문장 수
+        unsupported: 근거 없다고 판정된 문장 수
+        revisions: 부분 수정 횟수
+        fallbacks: 수정 응답이 잘못돼 전체 재생성으로 돌아간 횟수
+    """
+
+    def __init__(self):
+        self.verifications = 0
+        self.checked = 0
+        self.reused = 0
+        self.prechecked = 0
+        self.unsupported = 0
+        self.revisions = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for field, count in counts.items():
+                setattr(self, field, getattr(self, field) + count)
+
+    def as_dict(self):
+        return {
+            "verifications": self.verifications,
+            "checked": self.checked,
+            "reused": self.reused,
+            "prechecked": self.prechecked,
+            "unsupported": self.unsupported,
+            "revisions": self.revisions,
+            "fallbacks": self.fallbacks,
+        }
+
+class SentenceVerification:
+    """
+    답변 한 개의 문장별 검증 결과
+
+    Attributes:
+        sentences: 답변 문장 목록
+        supported: 문장별 근거 여부
+    """
+
+    def __init__(self, sentences, supported):
+        self.sentences = sentences
+        self.supported = supported
+
+    @property
+    def grounded(self):
+        return bool(self.sentences) and all(self.supported)
+
+    @property
+    def supported_sentences(self):
+        return [s for s, ok in zip(self.sentences, self.supported) if ok]
+
+    @property
+    def unsupported_sentences(self):
+        return [s for s, ok in zip(self.sentences, self.supported) if not ok]
+
+def _reuse(answer, verified):
+    """답변을 문장으로 나누고, 이전에 검증된 문장은 통과(True), 나머지는 미정(None)으로 둡니다."""
+    sentences = split_sentences(answer)
+    verified = set(verified or ())
+    return sentences, [True if sentence in verified else None for sentence in sentences]
+
+def _unchecked(sentences, supported):
+    return [sentence for sentence, ok in zip(sentences, supported) if ok is None]
+
+def _apply_precheck(sentences, supported, results):
+    """로컬 사전 검사를 통과한 문장을 통과로 표시하고 그 수를 반환합니다."""
+    grounded = {r["sentence"] for r in results if r["grounded"]}
+    count = 0
+    for i, sentence in enumerate(sentences):
+        if supported[i] is None and sentence in grounded:
+            supported[i] = True
+            count += 1
+    return count
+
+def _result(sentences, supported, reused, prechecked, checked, stats):
+    verification = SentenceVerification(sentences, supported)
+    stats.add(
+        verifications=1, reused=reused, prechecked=prechecked, checked=checked,
+        unsupported=len(verification.unsupported_sentences),
+    )
+    return verification
+
+def verify_sentences(answer, grade, is_supported, verified=(), precheck=None, max_workers=8, stats=None):
+    """
+    답변의 각 문장이 문서에 근거하는지 동시에 검증합니다.
+
+    Args:
+        answer (str): 답변 본문 (출처 목록 제외)
+        grade (callable): 문장 → 평가 결과 (LLM 호출)
+        is_supported (callable): 평가 결과 → 근거 여부
+        verified (iterable): 이전에 검증을 통과한 문장들 (다시 검증하지 않음)
+        precheck (callable): 문장 목록 → 문장별 {"sentence", "grounded"} (로컬 사전 검사, None이면 생략)
+        max_workers (int): 동시에 검증할 문장 수
+
+    Returns:
+        SentenceVerification
+    """
+    stats = stats or VerificationStats()
+    sentences, supported = _reuse(answer, verified)
+    reused = supported.count(True)
+    prechecked = 0
+    if precheck is not None and _unchecked(sentences, supported):
+        prechecked = _apply_precheck(sentences, supported, precheck(_unchecked(sentences, supported)))
+
+    pending = [i for i, ok in enumerate(supported) if ok is None]
+    if pending:
+        # 컨텍스트(콜백, 사용량 장부)를 복사하는 풀
+        with ContextThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+            results = list(executor.map(grade, [sentences[i] for i in pending]))
+        for i, result in zip(pending, results):
+            supported[i] = bool(is_supported(result))
+    return _result(sentences, supported, reused, prechecked, len(pending), stats)
+
+async def averify_sentences(answer, agrade, is_supported, verified=(), precheck=None, max_concurrency=8, stats=None):
+    """
+    verify_sentences의 비동기 버전
+
+    Args:
+        agrade (callable): 문장 → 평가 결과 코루틴
+        precheck (callable): 문장 목록 → 문장별 결과 코루틴 (None이면 생략)
+        max_concurrency (int): 동시에 검증할 문장 수
+    """
+    stats = stats or VerificationStats()
+    sentences, supported = _reuse(answer, verified)
+    reused = supported.count(True)
+    prechecked = 0
+    if precheck is not None and _unchecked(sentences, supported):
+        prechecked = _apply_precheck(sentences, supported, await precheck(_unchecked(sentences, supported)))
+
+    pending = [i for i, ok in enumerate(supported) if ok is None]
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def limited(sentence):
+        async with semaphore:
+            return await agrade(sentence)
+
+    results = await asyncio.gather(*(limited(sentences[i]) for i in pending))
+    for i, result in zip(pending, results):
+        supported[i] = bool(is_supported(result))
+    return _result(sentences, supported, reused, prechecked, len(pending), stats)
+
+def format_unsupported(sentences):
+    """수정 프롬프트에 넣을 번호 붙은 문장 목록"""
+    return "\n".join(f"{i}. {sentence}" for i, sentence in enumerate(sentences, 1))
+
+def parse_revisions(result, count, key="revisions"):
+    """수정 응답에서 문장별 수정본 목록을 꺼냅니다. 형식이 맞지 않으면 None."""
+    revisions = result.get(key) if isinstance(result, dict) else None
+    if not isinstance(revisions, list) or len(revisions) != count:
+        return None
+    if not all(isinstance(revision, str) for revision in revisions):
+        return None
+    return [revision.strip() for revision in revisions]
+
+def splice_revisions(answer, sentences, revisions):
+    """
+    답변에서 근거 없는 문장만 수정본으로 바꿉니다. 빈 수정본은 문장을 삭제합니다.
+    나머지 문장과 줄바꿈 등 형식은 그대로 둡니다.
+    """
+    for sentence, revision in zip(sentences, revisions):
+        answer = answer.replace(sentence, revision, 1)
+    answer = re.sub(r"[ \t]{2,}", " ", answer)
+    answer = re.sub(r"\n{3,}", "\n\n", answer)
+    return answer.strip()
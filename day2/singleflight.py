@@ -0,0 +1,79 @@
+import re
+import threading
+import unicodedata
+
+def normalize_question(question):
+    """공백, 대소문자, 끝 문장부호 차이를 무시하도록 질문을 정규화합니다."""
+    question = unicodedata.normalize("NFKC", question).lower()
+    question = re.sub(r"\s+", " ", question).strip()
+    return question.rstrip("?!. ")
+
+class CoalescingStats:
+    """
+    요청 병합 지표
+
+    Attributes:
+        calls: 전체 호출 수
+        executions: 실제로 실행된 수
+        coalesced: 진행 중인 실행에 합류한 호출 수
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    @property
+    def ratio(self):
+        """전체 호출 중 합류로 처리된 비율"""
+        return self.coalesced / self.calls if self.calls else 0.0
+
+    def as_dict(self):
+        return {"calls": self.calls, "executions": self.executions, "coalesced": self.coalesced, "ratio": self.ratio}
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    같은 키로 동시에 들어온 요청을 하나의 실행으로 합칩니다.
+
+    먼저 들어온 호출이 실행하고, 실행 중에 들어온 같은 키의 호출은 기다렸다가
+    같은 결과(또는 같은 예외)를 받습니다. 실행이 끝나면 키가 비워지므로 결과를 캐시하지는 않습니다.
+    합류한 호출은 같은 결과 객체를 공유하므로 결과를 수정하지 않아야 합니다.
+    """
+
+    def __init__(self):
+        self.stats = CoalescingStats()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self.stats.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats.executions += 1
+            else:
+                self.stats.coalesced += 1
+
+        if leader:
+            try:
+                call.result = fn(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
@@ -0,0 +1,142 @@
+"""
+체인별 모델 티어와 요청 단위 토큰/비용 집계
+
+체인(router, grader, generator 등)마다 모델과 파라미터를 따로 두고, 요청마다 UsageLedger에
+모든 LLM 호출의 usage_metadata를 모읍니다. 요청 예산(USD)을 다 쓰면 이후 호출은 economy 티어로 보냅니다.
+
+사용법:
+    with track_usage(budget=0.01) as ledger:
+        app.invoke(inputs)
+    print(ledger.as_dict())
+"""
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.runnables import RunnableLambda
+
+# 1M 토큰당 USD (입력, 출력)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+def price_for(model, prices=MODEL_PRICES):
+    """모델 이름과 가장 길게 일치하는 접두사의 가격 (gpt-4o-mini-2024-07-18 → gpt-4o-mini). 모르면 (0, 0)."""
+    matches = [name for name in prices if model.startswith(name)]
+    if not matches:
+        return 0.0, 0.0
+    return prices[max(matches, key=len)]
+
+class UsageLedger:
+    """
+    요청 하나의 토큰/비용 장부
+
+    Attributes:
+        budget: 요청 예산 (USD, None이면 무제한)
+        calls: 체인별 {"calls", "input_tokens", "output_tokens", "cost", "models"}
+    """
+
+    def __init__(self, budget=None, prices=MODEL_PRICES):
+        self.budget = budget
+        self.prices = prices
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, chain, model, usage):
+        """LLM 호출 한 번의 usage_metadata를 기록합니다."""
+        usage = usage or {}
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        input_price, output_price = price_for(model, self.prices)
+        cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+        with self._lock:
+            entry = self.calls.setdefault(
+                chain, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0, "models": {}}
+            )
+            entry["calls"] += 1
+            entry["input_tokens"] += input_tokens
+            entry["output_tokens"] += output_tokens
+            entry["cost"] += cost
+            entry["models"][model] = entry["models"].get(model, 0) + 1
+
+    @property
+    def cost(self):
+        with self._lock:
+            return sum(entry["cost"] for entry in self.calls.values())
+
+    @property
+    def exhausted(self):
+        """예산을 다 썼는지 여부"""
+        return self.budget is not None and self.cost >= self.budget
+
+    def as_dict(self):
+        with self._lock:
+            chains = {chain: {**entry, "models": dict(entry["models"])} for chain, entry in self.calls.items()}
+        return {
+            "input_tokens": sum(entry["input_tokens"] for entry in chains.values()),
+            "output_tokens": sum(entry["output_tokens"] for entry in chains.values()),
+            "cost": sum(entry["cost"] for entry in chains.values()),
+            "budget": self.budget,
+            "chains": chains,
+        }
+
+current_ledger = ContextVar("current_ledger", default=None)
+
+@contextmanager
+def track_usage(budget=None, prices=MODEL_PRICES):
+    """
+    with 블록 안의 LLM 호출을 새 UsageLedger에 기록합니다.
+    스레드 풀과 asyncio 태스크는 컨텍스트를 복사하므로 그래프 노드의 호출도 같은 장부에 모입니다.
+    """
+    ledger = UsageLedger(budget, prices)
+    token = current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        current_ledger.reset(token)
+
+def model_key(settings):
+    """티어 설정을 (model, 정렬된 나머지 파라미터) 튜플로 만듭니다. 모델 캐시 키로 씁니다."""
+    return settings["model"], tuple(sorted(
+        (k, json.dumps(v, sort_keys=True) if isinstance(v, dict) else v)
+        for k, v in settings.items() if k != "model"
+    ))
+
+def tiered_model(chain, primary, economy=None, primary_name=None, economy_name=None):
+    """
+    체인에서 쓸 모델 Runnable을 만듭니다.
+
+    현재 요청의 장부(current_ledger)가 예산을 다 썼으면 economy 모델로 호출하고,
+    응답의 usage_metadata를 장부에 기록합니다. 장부가 없으면 기록 없이 primary로 호출합니다.
+
+    Args:
+        chain (str): 장부에 기록할 체인 이름
+        primary: 기본 채팅 모델
+        economy: 예산 소진 후 쓸 채팅 모델 (None이면 계속 primary)
+        primary_name, economy_name (str): 가격 계산에 쓸 모델 이름
+    """
+    def pick():
+        ledger = current_ledger.get()
+        if economy is not None and ledger is not None and ledger.exhausted:
+            return ledger, economy, economy_name
+        return ledger, primary, primary_name
+
+    def record(ledger, name, message):
+        if ledger is not None:
+            model = name or message.response_metadata.get("model_name", "unknown")
+            ledger.record(chain, model, getattr(message, "usage_metadata", None))
+        return message
+
+    def invoke(input, config):
+        ledger, model, name = pick()
+        return record(ledger, name, model.invoke(input, config))
+
+    async def ainvoke(input, config):
+        ledger, model, name = pick()
+        return record(ledger, name, await model.ainvoke(input, config))
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"{chain}_llm")
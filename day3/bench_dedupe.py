@@ -0,0 +1,100 @@
+"""
+중복 청크 제거 효과 측정
+
+URLS 문서를 분할한 청크 전체와 중복 제거 후 청크로 각각 top-k 검색을 해서
+인덱스 크기 감소와 검색 결과에서 빠진 중복 청크 수(=절약되는 문서 평가 LLM 호출 수)를 비교합니다.
+
+사용법:
+    python bench_dedupe.py                      # 임베딩 API로 검색
+    python bench_dedupe.py --lexical            # API 없이 단어 해시 벡터로 검색
+    python bench_dedupe.py --questions q.txt    # 한 줄에 질문 하나
+"""
+import argparse
+import re
+import zlib
+import numpy as np
+from dedupe import find_clusters
+from document_loader import load_documents, split_documents
+from config import RETRIEVAL_K, DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE
+
+DEFAULT_QUESTIONS = [
+    "What is task decomposition for LLM agents?",
+    "How does chain of thought prompting work?",
+    "What are the types of agent memory?",
+    "What is few-shot prompting?",
+    "How do adversarial attacks on LLMs work?",
+    "What is a jailbreak prompt?",
+    "How does ReAct combine reasoning and acting?",
+    "What is self-consistency sampling?",
+]
+
+def lexical_vectors(texts, dimensions=4096):
+    """단어를 해시해 만든 정규화된 빈도 벡터 (임베딩 API 없이 검색을 흉내냄)"""
+    vectors = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            vectors[i, zlib.crc32(word.encode("utf-8")) % dimensions] += 1.0
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def embedding_vectors(texts):
+    from models import embeddings
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def run_benchmark(chunk_vectors, question_vectors, representatives, k):
+    """
+    질문마다 전체 인덱스와 중복 제거 인덱스의 top-k를 비교합니다.
+
+    Returns:
+        dict: 질문당 평균 중복 결과 수(전체 인덱스), 평균 고유 묶음 수(두 인덱스)
+    """
+    kept = np.array([i for i, rep in enumerate(representatives) if i == rep])
+    duplicates, unique_full, unique_deduped = [], [], []
+    for q in question_vectors:
+        full = np.argsort(-(chunk_vectors @ q))[:k]
+        clusters = [representatives[i] for i in full]
+        duplicates.append(len(clusters) - len(set(clusters)))
+        unique_full.append(len(set(clusters)))
+
+        deduped = kept[np.argsort(-(chunk_vectors[kept] @ q))[:k]]
+        unique_deduped.append(len({representatives[i] for i in deduped}))
+    return {
+        "duplicates_per_query": float(np.mean(duplicates)),
+        "unique_full": float(np.mean(unique_full)),
+        "unique_deduped": float(np.mean(unique_deduped)),
+        "queries_with_duplicates": int(sum(1 for d in duplicates if d)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="중복 청크 제거 효과 측정")
+    parser.add_argument("--k", type=int, default=RETRIEVAL_K)
+    parser.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD)
+    parser.add_argument("--questions", help="질문 파일 (한 줄에 하나)")
+    parser.add_argument("--lexical", action="store_true", help="임베딩 API 대신 단어 해시 벡터 사용")
+    args = parser.parse_args()
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    chunks = split_documents(load_documents())
+    texts = [chunk.page_content for chunk in chunks]
+    representatives = find_clusters(
+        texts, args.threshold, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE
+    )
+    kept = sum(1 for i, rep in enumerate(representatives) if i == rep)
+    print(f"청크 수: {len(texts)} -> {kept} (인덱스 {1 - kept / len(texts):.1%} 감소, threshold={args.threshold})")
+
+    vectorize = lexical_vectors if args.lexical else embedding_vectors
+    vectors = vectorize(texts + questions)
+    result = run_benchmark(vectors[:len(texts)], vectors[len(texts):], representatives, args.k)
+
+    print(f"질문 {len(questions)}개, top-{args.k}")
+    print(f"전체 인덱스: 질문당 중복 결과 {result['duplicates_per_query']:.2f}개 "
+          f"(중복이 섞인 질문 {result['queries_with_duplicates']}개), 고유 결과 {result['unique_full']:.2f}개")
+    print(f"중복 제거 인덱스: 고유 결과 {result['unique_deduped']:.2f}개")
+    print(f"=> 질문당 문서 평가 LLM 호출 {result['duplicates_per_query']:.2f}회가 중복 청크에 쓰이지 않음")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+임베딩 차원 축소 / int8 양자화 recall@k vs 메모리 벤치마크
+
+기존 벡터스토어의 전체 차원 임베딩을 정답 기준으로 삼고, 차원 축소(앞쪽 차원만 남기고 재정규화,
+text-embedding-3의 dimensions 파라미터와 동일)와 int8 양자화 조합별로 recall@k를 측정합니다.
+
+사용법:
+    python bench_quantization.py                 # 기존 벡터스토어 사용
+    python bench_quantization.py --synthetic 50000  # API 없이 합성 데이터로 측정
+"""
+import argparse
+import numpy as np
+from quantization import Int8Index, normalize, truncate_dimensions
+
+def load_corpus_vectors():
+    """기존 벡터스토어의 임베딩을 모두 읽어옵니다."""
+    from document_loader import open_vectorstore
+    vectorstore = open_vectorstore()
+    vectors = []
+    for store in getattr(vectorstore, "shards", [vectorstore]):
+        vectors.extend(store._collection.get(include=["embeddings"])["embeddings"])
+    return normalize(vectors)
+
+def synthetic_vectors(n, dimensions, seed=0):
+    """주제 군집이 있는 합성 임베딩을 만듭니다."""
+    rng = np.random.default_rng(seed)
+    # 실제 임베딩처럼 앞쪽 차원에 분산이 몰리도록 차원별 스케일을 감소시킨다
+    decay = np.linspace(1.0, 0.2, dimensions, dtype=np.float32)
+    topics = rng.standard_normal((64, dimensions)).astype(np.float32) * decay
+    vectors = topics[rng.integers(0, len(topics), n)] + 0.6 * rng.standard_normal((n, dimensions)).astype(np.float32) * decay
+    return normalize(vectors)
+
+def make_queries(vectors, count, seed=1):
+    """코퍼스 벡터에 잡음을 섞어 질문 임베딩을 흉내냅니다."""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), count)]
+    return normalize(picks + 0.05 * rng.standard_normal(picks.shape).astype(np.float32))
+
+def exact_top_k(vectors, queries, k):
+    return [set(np.argsort(-(vectors @ q))[:k].tolist()) for q in queries]
+
+def recall(truth, found):
+    return float(np.mean([len(t & f) / len(t) for t, f in zip(truth, found)]))
+
+def run_benchmark(vectors, queries, k, dimension_options, rescore_factor):
+    truth = exact_top_k(vectors, queries, k)
+    rows = []
+    for dimensions in dimension_options:
+        reduced = truncate_dimensions(vectors, dimensions)
+        reduced_queries = truncate_dimensions(queries, dimensions)
+
+        # float32
+        found = exact_top_k(reduced, reduced_queries, k)
+        rows.append(("float32", dimensions, reduced.nbytes, recall(truth, found)))
+
+        # int8 (재채점 없음 / float 재채점)
+        plain = Int8Index.build(reduced)
+        rescored = Int8Index.build(reduced, float_vectors=reduced)
+        found = [set(i for i, _ in plain.search(q, k)) for q in reduced_queries]
+        rows.append(("int8", dimensions, plain.nbytes, recall(truth, found)))
+        found = [set(i for i, _ in rescored.search(q, k, rescore_k=k * rescore_factor)) for q in reduced_queries]
+        rows.append((f"int8+rescore x{rescore_factor}", dimensions, rescored.nbytes, recall(truth, found)))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="임베딩 양자화 recall@k vs 메모리 벤치마크")
+    parser.add_argument("--synthetic", type=int, default=0, help="합성 벡터 개수 (0이면 기존 벡터스토어 사용)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.synthetic, 1536) if args.synthetic else load_corpus_vectors()
+    queries = make_queries(vectors, args.queries)
+    full = vectors.shape[1]
+    dimension_options = [d for d in (full, 1024, 512, 256) if d <= full]
+
+    print(f"벡터 수: {len(vectors)}, 원본 차원: {full}, k={args.k}")
+    print(f"{'storage':>20} {'dims':>6} {'memory(MB)':>11} {'bytes/vec':>10} {f'recall@{args.k}':>10}")
+    for storage, dimensions, nbytes, r in run_benchmark(vectors, queries, args.k, dimension_options, args.rescore_factor):
+        print(f"{storage:>20} {dimensions:>6} {nbytes / 2**20:>11.2f} {nbytes / len(vectors):>10.0f} {r:>10.3f}")
+    print("* int8+rescore의 float 벡터는 memmap으로 디스크에 두므로 메모리에 포함하지 않음")
+
+if __name__ == "__main__":
+    main()
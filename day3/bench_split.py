@@ -0,0 +1,61 @@
+"""
+텍스트 분할 병렬화 벤치마크
+
+사용법:
+    python bench_split.py               # URLS 문서를 받아서 측정
+    python bench_split.py --copies 50   # 받은 문서를 50배로 복제해 대용량 코퍼스 흉내
+"""
+import argparse
+import os
+import time
+from document_loader import load_documents, split_documents
+
+def run_benchmark(docs_list, worker_counts, repeat=3):
+    """프로세스 수별 분할 시간을 측정하고 단일 프로세스 결과와 동일한지 확인합니다."""
+    baseline = None
+    baseline_time = None
+    results = []
+
+    for workers in worker_counts:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            chunks = split_documents(docs_list, workers=workers)
+            best = min(best, time.perf_counter() - start)
+
+        if baseline is None:
+            baseline, baseline_time = chunks, best
+        same = (
+            len(chunks) == len(baseline)
+            and all(
+                a.page_content == b.page_content and a.metadata == b.metadata
+                for a, b in zip(chunks, baseline)
+            )
+        )
+        results.append({
+            "workers": workers,
+            "seconds": best,
+            "speedup": baseline_time / best,
+            "chunks": len(chunks),
+            "identical": same,
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="텍스트 분할 병렬화 벤치마크")
+    parser.add_argument("--copies", type=int, default=20, help="문서 복제 배수")
+    parser.add_argument("--repeat", type=int, default=3, help="측정 반복 횟수 (최솟값 사용)")
+    args = parser.parse_args()
+
+    docs_list = load_documents() * args.copies
+    print(f"문서 수: {len(docs_list)}, 총 문자 수: {sum(len(d.page_content) for d in docs_list):,}")
+
+    cpu = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, cpu} & set(range(1, cpu + 1)))
+
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'chunks':>8} {'identical':>10}")
+    for r in run_benchmark(docs_list, worker_counts, repeat=args.repeat):
+        print(f"{r['workers']:>8} {r['seconds']:>9.3f} {r['speedup']:>7.2f}x {r['chunks']:>8} {str(r['identical']):>10}")
+
+if __name__ == "__main__":
+    main()
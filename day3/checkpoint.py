@@ -0,0 +1,96 @@
+import sqlite3
+from contextlib import asynccontextmanager
+import uuid
+import zlib
+from langchain_core.documents import Document
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from chunk_store import chunk_store
+from deadline import refresh_deadline
+from config import CHECKPOINT_DB_PATH, CHECKPOINT_COMPRESS_MIN_BYTES, CHECKPOINT_CHUNK_STORE_PATH
+
+_DOC_TAG = "__doc__"
+_ZLIB_PREFIX = "zlib+"
+
+def compact(obj):
+    """Document를 [본문, 메타데이터]만 남긴 가벼운 구조로 바꿉니다."""
+    if isinstance(obj, Document):
+        return {_DOC_TAG: [obj.page_content, obj.metadata]}
+    if isinstance(obj, dict):
+        return {key: compact(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(compact(value) for value in obj)
+    return obj
+
+def expand(obj):
+    """compact()로 줄인 구조를 다시 Document로 되돌립니다."""
+    if isinstance(obj, dict):
+        if len(obj) == 1 and _DOC_TAG in obj:
+            page_content, metadata = obj[_DOC_TAG]
+            return Document(page_content=page_content, metadata=metadata)
+        return {key: expand(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(expand(value) for value in obj)
+    return obj
+
+class CompactSerializer:
+    """
+    GraphState 체크포인트용 직렬화기
+
+    Document의 클래스 경로 등 부가 정보를 빼고 본문과 메타데이터만 저장하며,
+    일정 크기 이상이면 zlib으로 압축해 체크포인트 쓰기 비용을 줄입니다.
+    """
+
+    def __init__(self, min_compress_size=CHECKPOINT_COMPRESS_MIN_BYTES):
+        self._inner = JsonPlusSerializer()
+        self.min_compress_size = min_compress_size
+
+    def dumps_typed(self, obj):
+        type_, data = self._inner.dumps_typed(compact(obj))
+        if len(data) >= self.min_compress_size:
+            return _ZLIB_PREFIX + type_, zlib.compress(data)
+        return type_, data
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_.startswith(_ZLIB_PREFIX):
+            type_, payload = type_[len(_ZLIB_PREFIX):], zlib.decompress(payload)
+        return expand(self._inner.loads_typed((type_, payload)))
+
+    def dumps(self, obj):
+        return self._inner.dumps(compact(obj))
+
+    def loads(self, data):
+        return expand(self._inner.loads(data))
+
+def create_checkpointer(path=CHECKPOINT_DB_PATH):
+    """
+    SQLite 파일에 그래프 상태를 저장하는 체크포인터를 만듭니다.
+    상태에는 청크 참조만 저장되므로 청크 저장소도 디스크에 저장하도록 바꿉니다.
+    """
+    chunk_store.ensure_persistent(CHECKPOINT_CHUNK_STORE_PATH)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    return SqliteSaver(conn, serde=CompactSerializer())
+
+@asynccontextmanager
+async def create_async_checkpointer(path=CHECKPOINT_DB_PATH):
+    """비동기 그래프(create_workflow(async_mode=True))용 체크포인터. async with로 사용합니다."""
+    chunk_store.ensure_persistent(CHECKPOINT_CHUNK_STORE_PATH)
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    async with aiosqlite.connect(path) as conn:
+        yield AsyncSqliteSaver(conn, serde=CompactSerializer())
+
+def thread_config(thread_id=None):
+    """요청마다 고유한 thread id를 가진 실행 설정을 만듭니다."""
+    return {"configurable": {"thread_id": thread_id or uuid.uuid4().hex}}
+
+def resume_workflow(app, config):
+    """마지막으로 완료된 노드 다음부터 실행을 재개합니다. (입력으로 None을 넘김, 마감 시각은 새로 잡음)"""
+    refresh_deadline(app, config)
+    return app.stream(None, config)
+
+def inspect_workflow(app, config):
+    """저장된 마지막 상태와 다음에 실행될 노드를 반환합니다."""
+    snapshot = app.get_state(config)
+    return snapshot.values, snapshot.next
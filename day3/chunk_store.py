@@ -0,0 +1,151 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+from langchain_core.documents import Document
+from config import CHUNK_STORE_PATH, CHUNK_STORE_MAX_ITEMS
+
+# 현재 그래프 실행이 고정(pin)한 청크 id 집합. 노드 스레드와 asyncio 태스크에도 전파된다
+_run_pins = ContextVar("chunk_store_run_pins", default=None)
+
+def chunk_id(doc):
+    """출처와 본문으로 청크 id를 만듭니다. 같은 청크는 요청이 달라도 같은 id를 갖습니다."""
+    key = f"{doc.metadata.get('source', '')}\n{doc.page_content}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+class ChunkStore:
+    """
+    청크 id → Document 저장소
+
+    그래프 상태는 {"id", "score"} 참조만 들고 다니고, 본문이 필요한 노드에서만
+    hydrate()로 Document를 꺼내 씁니다. 메모리는 LRU로 제한하며, path를 지정하면
+    SQLite에도 저장해 프로세스가 재시작돼도 체크포인트의 참조를 복원할 수 있습니다.
+    pinned() 블록(그래프 실행 하나) 안에서 저장하거나 꺼낸 청크는 블록이 끝날 때까지 LRU에서
+    내보내지 않으므로, 실행 중인 상태의 참조는 항상 hydrate할 수 있습니다.
+    꺼낸 Document는 여러 요청이 공유하므로 수정하지 않아야 합니다.
+    """
+
+    def __init__(self, path=CHUNK_STORE_PATH, max_items=CHUNK_STORE_MAX_ITEMS):
+        self.max_items = max_items
+        self._cache = OrderedDict()
+        self._pins = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._connect(path)
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def persistent(self):
+        return self._conn is not None
+
+    def _connect(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, page_content TEXT, metadata TEXT)"
+        )
+
+    def _insert(self, items):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO chunks VALUES (?, ?, ?)",
+            [(id_, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)) for id_, doc in items],
+        )
+        self._conn.commit()
+
+    def ensure_persistent(self, path):
+        """
+        SQLite 저장을 켭니다 (이미 켜져 있으면 그대로). 체크포인터를 쓰면 재시작 후에도 체크포인트의
+        참조를 복원해야 하므로 반드시 호출합니다. 메모리에 있던 청크도 함께 저장합니다.
+        """
+        with self._lock:
+            if self._conn is None:
+                self._connect(path)
+                self._insert(self._cache.items())
+
+    def _pin(self, id_):
+        """현재 실행이 pinned() 블록 안이면 청크를 고정합니다. 락을 잡은 상태로 호출합니다."""
+        pins = _run_pins.get()
+        if pins is not None and id_ not in pins:
+            pins.add(id_)
+            self._pins[id_] = self._pins.get(id_, 0) + 1
+
+    def _remember(self, id_, doc):
+        self._cache[id_] = doc
+        self._cache.move_to_end(id_)
+        self._pin(id_)
+        self._evict()
+
+    def _evict(self):
+        """고정되지 않은 오래된 청크부터 내보냅니다. 모두 고정돼 있으면 잠시 max_items를 넘을 수 있습니다."""
+        excess = len(self._cache) - self.max_items
+        if excess <= 0:
+            return
+        for id_ in list(islice((i for i in self._cache if i not in self._pins), excess)):
+            del self._cache[id_]
+
+    @contextmanager
+    def pinned(self):
+        """
+        블록 안에서 저장하거나 꺼낸 청크를 블록이 끝날 때까지 고정합니다.
+        그래프 실행 하나를 감싸 실행 중인 상태의 참조가 LRU에서 밀려나지 않도록 합니다.
+        """
+        ids = set()
+        token = _run_pins.set(ids)
+        try:
+            yield ids
+        finally:
+            _run_pins.reset(token)
+            with self._lock:
+                for id_ in ids:
+                    count = self._pins.get(id_, 0) - 1
+                    if count > 0:
+                        self._pins[id_] = count
+                    else:
+                        self._pins.pop(id_, None)
+                self._evict()
+
+    def put(self, doc):
+        """Document를 저장하고 id를 반환합니다."""
+        id_ = chunk_id(doc)
+        with self._lock:
+            if id_ not in self._cache and self._conn is not None:
+                self._insert([(id_, doc)])
+            self._remember(id_, doc)
+        return id_
+
+    def get(self, id_):
+        with self._lock:
+            doc = self._cache.get(id_)
+            if doc is not None:
+                self._cache.move_to_end(id_)
+                self._pin(id_)
+                return doc
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT page_content, metadata FROM chunks WHERE id = ?", (id_,)
+                ).fetchone()
+                if row is not None:
+                    doc = Document(page_content=row[0], metadata=json.loads(row[1]))
+                    self._remember(id_, doc)
+                    return doc
+        raise KeyError(f"청크 저장소에 없는 청크입니다: {id_} (CHUNK_STORE_PATH 설정을 확인하세요)")
+
+    def to_refs(self, documents):
+        """Document 목록을 저장하고 {"id", "score"} 참조 목록으로 바꿉니다."""
+        refs = []
+        for doc in documents:
+            score = doc.metadata.get("relevance_score", doc.metadata.get("score"))
+            refs.append({"id": self.put(doc), "score": score})
+        return refs
+
+    def hydrate(self, refs):
+        """참조 목록을 Document 목록으로 바꿉니다."""
+        return [self.get(ref["id"]) for ref in refs]
+
+chunk_store = ChunkStore()
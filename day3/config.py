@@ -13,6 +13,70 @@ LLM_MODEL = "gpt-4o-mini"
 EMBEDDING_MODEL = "text-embedding-3-small"
 LLM_TEMPERATURE = 0
 
+# 체인별 모델 티어 설정 (ChatOpenAI 파라미터)
+# router: 질문 라우터, grader: yes/no 평가기들, generator: 답변 생성기
+# router/grader의 max_tokens는 JSON 응답용이라 잘리지 않도록 64 이상으로 둠 (단일 토큰 경로는 따로 1로 설정)
+CHAIN_MODELS = {
+    "router": {"model": LLM_MODEL, "temperature": LLM_TEMPERATURE, "max_tokens": 64},
+    "grader": {"model": LLM_MODEL, "temperature": LLM_TEMPERATURE, "max_tokens": 64},
+    "generator": {"model": LLM_MODEL, "temperature": LLM_TEMPERATURE},
+}
+# 요청 예산을 다 쓴 뒤 체인별로 쓸 저렴한 티어 (없는 체인은 계속 CHAIN_MODELS 사용)
+ECONOMY_CHAIN_MODELS = {
+    "router": {"model": "gpt-4.1-nano", "temperature": 0, "max_tokens": 64},
+    "grader": {"model": "gpt-4.1-nano", "temperature": 0, "max_tokens": 64},
+    "generator": {"model": LLM_MODEL, "temperature": LLM_TEMPERATURE, "max_tokens": 256},
+}
+# 요청당 LLM 비용 예산 (USD, None이면 무제한)
+REQUEST_COST_BUDGET = None
+
+# yes/no 평가기 단일 토큰 경로 설정
+# True이면 평가기가 JSON 대신 'yes'/'no' 한 토큰(max_tokens=1, logprobs)으로 답하고
+# P(yes)를 임계값과 비교해 판정 (logprobs가 없으면 JSON 경로로 돌아감)
+GRADER_FAST_PATH = False
+# 평가기별 P(yes) 임계값
+GRADER_THRESHOLDS = {
+    "retrieval_grader": 0.5,
+    "hallucination_grader": 0.5,
+    "answer_grader": 0.5,
+    "generate_decision_grader": 0.5,
+    "sentence_grader": 0.5,
+}
+
+# 실행 스케줄러 설정
+# True이면 그래프 실행(run_question/arun_question)을 우선순위 클래스별 동시 실행 한도와 유한 큐로 제어
+# (대화형 요청이 배치 평가 작업에 밀려 굶지 않도록 함, 큐가 가득 차면 QueueFullError로 거절)
+SCHEDULER_ENABLED = False
+# 모든 클래스를 합친 동시 실행 수
+SCHEDULER_MAX_CONCURRENCY = 8
+# 클래스별 우선순위(작을수록 먼저), 동시 실행 한도, 큐 길이
+SCHEDULER_CLASSES = {
+    "interactive": {"priority": 0, "max_concurrency": 8, "max_queue": 32},
+    "batch": {"priority": 1, "max_concurrency": 2, "max_queue": 256},
+}
+# priority를 지정하지 않은 요청의 클래스
+SCHEDULER_DEFAULT_CLASS = "interactive"
+
+# 요청 헤징 설정
+# True이면 호출이 체인별 지연 분위수까지 끝나지 않을 때 같은 요청을 한 번 더 보내고 먼저 온 응답을 사용
+HEDGING_ENABLED = False
+# 헤징 지연으로 쓸 관측 지연 분위수
+HEDGE_QUANTILE = 0.9
+# 이만큼 관측되기 전에는 HEDGE_INITIAL_DELAY_SECONDS 사용
+HEDGE_MIN_SAMPLES = 20
+HEDGE_INITIAL_DELAY_SECONDS = 3.0
+HEDGE_MIN_DELAY_SECONDS = 0.05
+# 체인별 헤징 예산: 전체 호출 중 헤징할 수 있는 최대 비율
+HEDGE_BUDGETS = {
+    "retrieval_grader": 0.1,
+    "rag_chain": 0.05,
+    "hallucination_grader": 0.1,
+    "tavily_search": 0.1,
+}
+HEDGE_DEFAULT_BUDGET = 0.05
+# 체인별 동기 호출 스레드 풀 크기 (체인마다 따로 두므로 한 체인이 다른 체인의 동시 실행을 막지 않음)
+HEDGE_MAX_WORKERS = 64
+
 # 문서 설정
 URLS = [
     "https://lilianweng.github.io/posts/2023-06-23-agent/",
@@ -22,4 +86,165 @@ URLS = [
 
 CHUNK_SIZE = 250
 CHUNK_OVERLAP = 0
-COLLECTION_NAME = "rag-chroma" 
\ No newline at end of file
+COLLECTION_NAME = "rag-chroma" 
+
+# 인덱싱 설정
+# 텍스트 분할에 사용할 프로세스 수 (1이면 단일 프로세스, 0이면 CPU 코어 수만큼)
+SPLIT_WORKERS = 1
+
+# 질문 라우터 설정
+# 그래프 시작 시 질문을 벡터스토어/웹 검색으로 라우팅할지 여부
+USE_QUESTION_ROUTER = True
+# 토픽(출처)별 센트로이드 개수
+ROUTER_CENTROIDS_PER_TOPIC = 4
+# 센트로이드와의 코사인 유사도가 이 값 이상이면 벡터스토어로 라우팅
+ROUTER_HIGH_THRESHOLD = 0.45
+# 이 값 이하이면 웹 검색으로 라우팅, 그 사이는 LLM 라우터(question_router)로 판단
+ROUTER_LOW_THRESHOLD = 0.25
+
+# 문서 평가 설정
+# "all": 검색된 청크를 모두 평가
+# "sequential": 순위순으로 하나씩 평가하다가 충분하면 종료
+# "concurrent": 동시에 평가하다가 충분하면 남은 평가 호출 취소
+GRADING_MODE = "all"
+# 관련 청크를 이만큼 채택하면 종료 (None이면 개수 기준 없음)
+EARLY_EXIT_MIN_RELEVANT = 2
+# 채택한 청크의 토큰 합이 이 값 이상이면 종료 (None이면 토큰 기준 없음)
+EARLY_EXIT_MAX_CONTEXT_TOKENS = None
+# concurrent 모드에서 동시에 실행할 평가 수
+GRADING_MAX_CONCURRENCY = 4
+
+# 웹 검색 결과 write-back 설정
+# True이면 평가를 통과한 웹 검색 결과를 별도 컬렉션에 저장하고, retrieve와 라우터가 그 컬렉션도 검색
+WEB_WRITEBACK = False
+WEB_COLLECTION_NAME = "rag-web-cache"
+# 저장한 웹 검색 결과의 유효 기간 (초)
+WEB_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# retrieve에서 웹 캐시에서 가져올 최대 청크 수
+WEB_CACHE_K = 2
+# 웹 캐시 청크의 관련도 점수가 이 값 이상일 때만 사용 (라우터도 이 기준으로 웹 검색 대신 retrieve로 보냄)
+WEB_CACHE_MIN_SCORE = 0.5
+
+# 부모-자식(small-to-big) 검색 설정
+# True이면 CHUNK_SIZE 자식 청크로 검색하고 부모 섹션별로 묶어 병합한 윈도우를 반환 (켜거나 끄면 인덱스 재생성 필요)
+PARENT_RETRIEVAL = False
+# 부모 섹션 크기 (토큰)
+PARENT_CHUNK_SIZE = 1000
+# 반환할 부모 윈도우 최대 크기 (토큰)
+PARENT_MAX_TOKENS = 750
+# 반환할 부모 윈도우 수 (문서 평가 LLM 호출 수)
+PARENT_K = 3
+# 부모별로 묶기 전에 검색할 자식 청크 수
+PARENT_CANDIDATES = 12
+PARENT_STORE_PATH = "./chroma_db/parents.sqlite"
+
+# 검색 설정
+# "fixed": 항상 RETRIEVAL_K개, "threshold": 유사도 컷오프, "knee": 점수 간격(knee) 감지
+RETRIEVAL_MODE = "fixed"
+RETRIEVAL_K = 4
+# 적응형 모드에서 반환할 최소/최대 청크 수
+RETRIEVAL_MIN_K = 1
+RETRIEVAL_MAX_K = 8
+# 관련도 점수(0~1) 컷오프
+RETRIEVAL_SCORE_THRESHOLD = 0.35
+# knee 모드에서 인접 점수 차이가 이 값 이상이면 그 지점에서 자름
+RETRIEVAL_KNEE_GAP = 0.05
+
+# 질문 임베딩/검색 결과 캐시 설정
+# True이면 정규화한 질문이 같으면 임베딩 API 호출과 검색을 다시 하지 않음
+QUERY_CACHE_ENABLED = True
+# 캐시할 질문 임베딩 수 / 검색 결과 수 (LRU)
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+QUERY_RESULT_CACHE_SIZE = 1024
+# 인덱스 버전 표식 파일: 벡터스토어를 다시 만들 때마다 갱신되어 이전 검색 결과 캐시가 무효화됨
+INDEX_VERSION_PATH = "./chroma_db/index_version"
+
+# 체크포인트 설정
+# True이면 그래프 상태를 SQLite에 저장해 실패한 실행을 마지막 완료 노드부터 재개할 수 있음
+CHECKPOINT_ENABLED = False
+CHECKPOINT_DB_PATH = "./checkpoints.sqlite"
+# 체크포인터를 쓸 때 CHUNK_STORE_PATH가 None이면 청크 저장소로 쓸 SQLite 경로
+CHECKPOINT_CHUNK_STORE_PATH = "./chunks.sqlite"
+# 직렬화 결과가 이 크기(바이트) 이상이면 zlib으로 압축
+CHECKPOINT_COMPRESS_MIN_BYTES = 512
+
+# 요청 마감 시간 설정
+# 요청당 시간 예산(초), None이면 제한 없음
+REQUEST_DEADLINE_SECONDS = 30
+# 노드별 예상 소요 시간(초) 초기값, 실행하면서 EWMA로 갱신됨
+STEP_COST_DEFAULTS = {
+    "retrieve": 0.5,
+    "grade_documents": 2.0,
+    "websearch": 2.5,
+    "generate": 3.0,
+    "grade_generation": 1.5,
+}
+STEP_COST_ALPHA = 0.3
+
+# 샤딩 설정
+# 1보다 크면 청크를 여러 Chroma 컬렉션에 나누어 저장하고 병렬로 검색
+NUM_SHARDS = 1
+# 샤드 배정 기준: "source" (문서 출처별) 또는 "hash" (청크 내용 해시)
+SHARD_KEY = "source"
+
+# 임베딩 저장 설정
+# 임베딩 차원 수 (None이면 모델 기본값, text-embedding-3 계열은 축소 차원 지원)
+EMBEDDING_DIMENSIONS = None
+# None이면 Chroma의 float 벡터로 검색, "int8"이면 int8 스칼라 양자화 인덱스로 검색
+VECTOR_QUANTIZATION = None
+# int8 검색 후 top-k의 몇 배 후보를 float 벡터로 재채점할지
+QUANTIZATION_RESCORE_FACTOR = 4
+QUANTIZED_INDEX_PATH = "./chroma_db/int8_index"
+
+# 근거(grounding) 사전 검사 설정
+# True이면 LLM 할루시네이션 평가 전에 로컬 검사로 문서를 거의 그대로 옮긴 답변만 걸러냄
+# (겹침 점수로는 모순을 구분할 수 없어 부정 표현/숫자가 다르면 LLM 평가로 넘기지만, 기본은 꺼 둠)
+GROUNDING_PRECHECK = False
+# 문장의 단어 n-gram이 가장 가까운 문서 문장에 포함된 비율이 이 값 이상이어야 근거 있음
+GROUNDING_NGRAM_THRESHOLD = 0.9
+
+# 할루시네이션 평가 방식
+# "answer": 답변 전체를 한 번에 평가하고, 근거 없으면 답변을 처음부터 다시 생성
+# "sentence": 문장별로 동시에 검증하고, 근거 없는 문장만 생성기가 수정 (검증된 문장은 다시 검증하지 않음)
+HALLUCINATION_CHECK_MODE = "answer"
+# 문장 검증을 동시에 실행할 수
+SENTENCE_VERIFY_MAX_CONCURRENCY = 8
+
+# 청크 저장소 설정
+# 그래프 상태에는 청크 id와 점수만 담고 본문은 청크 저장소에서 필요할 때 읽어옴
+# None이면 메모리에만 보관, 경로를 지정하면 SQLite에도 저장
+# 체크포인터를 만들면 None이어도 CHECKPOINT_CHUNK_STORE_PATH에 저장 (재시작 후 체크포인트 재개에 필요)
+CHUNK_STORE_PATH = None
+# 메모리에 보관할 최대 청크 수 (LRU)
+CHUNK_STORE_MAX_ITEMS = 10000
+
+# 인덱스 스냅샷 설정
+# True이면 벡터스토어를 만들 때 스냅샷 파일도 쓰고, 로드할 때 Chroma 대신 스냅샷(memmap)을 사용
+USE_SNAPSHOT = False
+SNAPSHOT_PATH = "./chroma_db/index.snapshot"
+
+# 카세트(호출 기록/재생) 설정
+# None: 실제 호출, "record": 실제 호출 + 기록, "replay": 기록된 응답으로 오프라인 실행
+CASSETTE_MODE = os.getenv("CASSETTE_MODE") or None
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "./cassettes/day3.jsonl")
+# replay 시 기록된 응답 시간만큼 기다릴지 여부 (False면 지연 없이 재생)
+CASSETTE_REPLAY_LATENCY = os.getenv("CASSETTE_REPLAY_LATENCY", "1") == "1"
+
+# 메모리 프로파일링 설정
+# True이면 단계(fetch/split/embed/store/retrieve/grade/generate)별 할당량, 피크, RSS를 기록하고 보고서를 씀
+MEMORY_PROFILE = os.getenv("MEMORY_PROFILE", "0") == "1"
+MEMORY_PROFILE_PATH = os.getenv("MEMORY_PROFILE_PATH", "./memory_profile.txt")
+# 단계별로 보고할 상위 할당 위치 수
+MEMORY_PROFILE_TOP = 10
+
+# 중복 청크 제거 설정 (MinHash/LSH)
+# True이면 인덱싱 전에 거의 같은 청크를 묶어 대표 청크 하나만 저장
+# 인덱스 내용이 바뀌므로 켜거나 끈 뒤에는 python main.py --reindex로 다시 만들어야 적용됨
+DEDUP_ENABLED = False
+# 추정 자카드 유사도가 이 값 이상이면 같은 묶음
+DEDUP_THRESHOLD = 0.8
+# MinHash 서명 길이와 LSH 구간 수 (구간당 행 수 = DEDUP_NUM_PERM / DEDUP_BANDS)
+DEDUP_NUM_PERM = 128
+DEDUP_BANDS = 16
+# shingle 크기 (단어 수)
+DEDUP_SHINGLE_SIZE = 5
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+from functools import wraps
+from config import REQUEST_DEADLINE_SECONDS, STEP_COST_DEFAULTS, STEP_COST_ALPHA
+
+class StepCostModel:
+    """노드별 소요 시간을 지수 이동 평균(EWMA)으로 추적해 다음 단계 비용을 예측합니다."""
+
+    def __init__(self, defaults=STEP_COST_DEFAULTS, alpha=STEP_COST_ALPHA):
+        self._estimates = dict(defaults)
+        self._alpha = alpha
+        self._lock = threading.Lock()
+
+    def record(self, node, seconds):
+        with self._lock:
+            previous = self._estimates.get(node)
+            if previous is None:
+                self._estimates[node] = seconds
+            else:
+                self._estimates[node] = (1 - self._alpha) * previous + self._alpha * seconds
+
+    def predict(self, *nodes):
+        return sum(self._estimates.get(node, 0.0) for node in nodes)
+
+step_costs = StepCostModel()
+
+def timed(node, fn):
+    """노드 실행 시간을 step_costs에 기록하는 래퍼를 반환합니다."""
+    if asyncio.iscoroutinefunction(fn):
+        @wraps(fn)
+        async def async_wrapper(state):
+            start = time.time()
+            try:
+                return await fn(state)
+            finally:
+                step_costs.record(node, time.time() - start)
+        return async_wrapper
+
+    @wraps(fn)
+    def wrapper(state):
+        start = time.time()
+        try:
+            return fn(state)
+        finally:
+            step_costs.record(node, time.time() - start)
+    return wrapper
+
+def make_inputs(question, budget_seconds=REQUEST_DEADLINE_SECONDS):
+    """마감 시각(deadline)을 포함한 그래프 입력을 만듭니다."""
+    inputs = {"question": question}
+    if budget_seconds is not None:
+        inputs["deadline"] = time.time() + budget_seconds
+    return inputs
+
+def refresh_deadline(app, config, budget_seconds=REQUEST_DEADLINE_SECONDS):
+    """
+    체크포인트에서 재개하기 전에 마감 시각을 지금부터 다시 잡습니다.
+    체크포인트에 저장된 마감은 이미 지났을 수 있어 그대로 두면 재개한 실행이 재시도를 못 합니다.
+    """
+    if budget_seconds is not None:
+        app.update_state(config, {"deadline": time.time() + budget_seconds})
+
+async def arefresh_deadline(app, config, budget_seconds=REQUEST_DEADLINE_SECONDS):
+    """refresh_deadline의 비동기 버전"""
+    if budget_seconds is not None:
+        await app.aupdate_state(config, {"deadline": time.time() + budget_seconds})
+
+def remaining_time(state):
+    """마감까지 남은 시간(초). 마감이 없으면 무한대."""
+    deadline = state.get("deadline")
+    if deadline is None:
+        return float("inf")
+    return deadline - time.time()
+
+def can_afford(state, *nodes):
+    """남은 시간 안에 주어진 노드들을 실행할 수 있을지 예측합니다."""
+    remaining = remaining_time(state)
+    predicted = step_costs.predict(*nodes)
+    if remaining < predicted:
+        print(f"---DEADLINE: 남은 시간 {remaining:.1f}s < 예상 비용 {predicted:.1f}s---")
+        return False
+    return True
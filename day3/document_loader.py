@@ -1,55 +1,302 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.vectorstores import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from models import embeddings
-from config import URLS, CHUNK_SIZE, CHUNK_OVERLAP, COLLECTION_NAME
+from models import embeddings, embedding_name
+from router import reset_router
+from retrieval import build_retriever, invalidate_query_cache
+from sharded_store import ShardedVectorStore
+from quantization import QuantizedVectorStore
+from snapshot import SnapshotVectorStore, snapshot_from_chroma
+from memprofile import profiler
+from dedupe import deduplicate
+from chunk_store import chunk_id
+from query_cache import index_version
+from config import (
+    URLS, CHUNK_SIZE, CHUNK_OVERLAP, COLLECTION_NAME, SPLIT_WORKERS, NUM_SHARDS, SHARD_KEY,
+    VECTOR_QUANTIZATION, QUANTIZED_INDEX_PATH, USE_SNAPSHOT, SNAPSHOT_PATH,
+    DEDUP_ENABLED, DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE,
+    PARENT_RETRIEVAL, PARENT_CHUNK_SIZE, INDEX_VERSION_PATH
+)
 import os
 
+# 워커 프로세스마다 한 번만 생성되는 분할기 (tiktoken 인코더 재사용)
+_worker_splitter = None
+
+def create_text_splitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """tiktoken 기반 텍스트 분할기를 생성합니다."""
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+def _init_split_worker(chunk_size, chunk_overlap):
+    """워커 프로세스 초기화: 분할기와 토크나이저를 한 번만 만듭니다."""
+    global _worker_splitter
+    _worker_splitter = create_text_splitter(chunk_size, chunk_overlap)
+
+def _split_batch(docs):
+    """워커 프로세스에서 문서 묶음을 분할합니다."""
+    return _worker_splitter.split_documents(docs)
+
+def _partition(docs, num_batches):
+    """문서 순서를 유지한 채 연속된 묶음으로 나눕니다."""
+    size, rest = divmod(len(docs), num_batches)
+    batches, start = [], 0
+    for i in range(num_batches):
+        end = start + size + (1 if i < rest else 0)
+        if end > start:
+            batches.append(docs[start:end])
+        start = end
+    return batches
+
+def split_documents(docs_list, workers=SPLIT_WORKERS, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    문서들을 청크로 분할합니다.
+
+    workers가 1보다 크면 문서를 여러 프로세스에 나누어 분할합니다.
+    문서 단위로 나누고 순서대로 합치므로 결과 청크의 순서와 메타데이터는
+    단일 프로세스로 분할한 결과와 같습니다.
+
+    Args:
+        docs_list (list): 분할할 Document 목록
+        workers (int): 프로세스 수 (1이면 단일 프로세스, 0이면 CPU 코어 수)
+        chunk_size (int): 청크 크기 (토큰)
+        chunk_overlap (int): 청크 간 겹침 (토큰)
+
+    Returns:
+        list: 분할된 Document 목록
+    """
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(docs_list))
+
+    if workers <= 1:
+        return create_text_splitter(chunk_size, chunk_overlap).split_documents(docs_list)
+
+    # 문서 길이 편차를 흡수하기 위해 워커 수보다 많은 묶음으로 나눈다
+    batches = _partition(docs_list, min(len(docs_list), workers * 4))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_split_worker,
+        initargs=(chunk_size, chunk_overlap),
+    ) as executor:
+        # map은 제출 순서대로 결과를 돌려주므로 청크 순서가 결정적이다
+        results = executor.map(_split_batch, batches)
+        return [chunk for batch in results for chunk in batch]
+
+def split_parent_child(docs_list, workers=SPLIT_WORKERS):
+    """
+    문서를 PARENT_CHUNK_SIZE 부모 섹션으로 나눈 뒤 각 부모를 CHUNK_SIZE 자식 청크로 나눕니다.
+
+    자식 청크에는 parent_id와 부모 안에서의 위치(child_index)를 기록하고,
+    부모별 자식 목록은 ParentStore에 저장합니다. 인덱스에는 자식 청크만 들어갑니다.
+
+    Returns:
+        list: 자식 청크 Document 목록
+    """
+    import tiktoken
+    from parent_retrieval import get_parent_store
+
+    parents = split_documents(docs_list, workers, chunk_size=PARENT_CHUNK_SIZE, chunk_overlap=0)
+    for parent in parents:
+        parent.metadata["parent_id"] = chunk_id(parent)
+    children = split_documents(parents, workers)
+
+    # from_tiktoken_encoder의 기본 인코딩과 같은 gpt2로 토큰 수를 센다
+    encoder = tiktoken.get_encoding("gpt2")
+    siblings = {}
+    for child in children:
+        group = siblings.setdefault(child.metadata["parent_id"], [])
+        child.metadata["child_index"] = len(group)
+        group.append((child.page_content, len(encoder.encode(child.page_content))))
+
+    get_parent_store().put_many(
+        (parent.metadata["parent_id"], parent.metadata, siblings.get(parent.metadata["parent_id"], []))
+        for parent in parents
+    )
+    print(f"부모-자식 분할: 부모 {len(parents)}개, 자식 {len(children)}개")
+    return children
+
+def split_for_index(docs_list):
+    """인덱싱할 청크를 만듭니다. PARENT_RETRIEVAL이면 자식 청크, 아니면 일반 청크."""
+    if PARENT_RETRIEVAL:
+        return split_parent_child(docs_list)
+    return split_documents(docs_list)
+
+def dedupe_chunks(doc_splits):
+    """DEDUP_ENABLED이면 중복에 가까운 청크를 제거하고 감소량을 출력합니다."""
+    if not DEDUP_ENABLED:
+        return doc_splits
+    kept, stats = deduplicate(
+        doc_splits,
+        threshold=DEDUP_THRESHOLD,
+        num_perm=DEDUP_NUM_PERM,
+        bands=DEDUP_BANDS,
+        shingle_size=DEDUP_SHINGLE_SIZE,
+    )
+    print(
+        f"중복 청크 제거: {stats.chunks} -> {stats.kept} "
+        f"(묶음 {stats.clusters}개, {stats.removed}개 제거, 인덱스 {stats.reduction:.1%} 감소)"
+    )
+    return kept
+
+def load_documents(urls=URLS):
+    """웹 문서들을 로드합니다."""
+    docs = [WebBaseLoader(url).load() for url in urls]
+    return [item for sublist in docs for item in sublist]
+
 def create_vectorstore():
     """웹 문서들을 로드하고 새로운 벡터스토어를 생성합니다."""
     print("새로운 벡터스토어 생성 중...")
     
     # 문서 로드
-    docs = [WebBaseLoader(url).load() for url in URLS]
-    docs_list = [item for sublist in docs for item in sublist]
+    with profiler.stage("fetch"):
+        docs_list = load_documents()
 
     # 텍스트 분할
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
-    )
-    doc_splits = text_splitter.split_documents(docs_list)
+    with profiler.stage("split"):
+        if PARENT_RETRIEVAL:
+            from parent_retrieval import get_parent_store
+            get_parent_store().clear()
+        doc_splits = split_for_index(docs_list)
+
+    # 중복에 가까운 청크 제거
+    with profiler.stage("dedupe"):
+        doc_splits = dedupe_chunks(doc_splits)
 
     # 벡터스토어에 추가 (디스크에 저장)
-    vectorstore = Chroma.from_documents(
-        documents=doc_splits,
-        collection_name=COLLECTION_NAME,
-        embedding=embeddings,
-        persist_directory="./chroma_db"
-    )
+    # 임베딩 호출은 "embed" 단계로 따로 잡히고, "store"에는 임베딩을 포함한 전체가 잡힌다
+    embedding = profiler.wrap_embeddings(embeddings)
+    with profiler.stage("store"):
+        if NUM_SHARDS > 1:
+            vectorstore = ShardedVectorStore.from_documents(
+                documents=doc_splits,
+                embedding=embedding,
+                collection_prefix=COLLECTION_NAME,
+                num_shards=NUM_SHARDS,
+                persist_directory="./chroma_db",
+                shard_key=SHARD_KEY,
+            )
+        else:
+            vectorstore = Chroma.from_documents(
+                documents=doc_splits,
+                collection_name=COLLECTION_NAME,
+                embedding=embedding,
+                persist_directory="./chroma_db"
+            )
     
+    reset_router()
+    reset_active_vectorstore()
+
+    if USE_SNAPSHOT:
+        count = snapshot_from_chroma(vectorstore, SNAPSHOT_PATH, embedding_name)
+        print(f"스냅샷 저장 완료: {SNAPSHOT_PATH} (문서 수: {count})")
+
+    if VECTOR_QUANTIZATION == "int8":
+        vectorstore = quantize_vectorstore(vectorstore, rebuild=True)
+
+    # 스냅샷/양자화 인덱스까지 새로 만든 뒤에 이전 검색 결과 캐시를 무효화한다
+    invalidate_query_cache()
+
     print(f"벡터스토어 생성 완료: {COLLECTION_NAME}")
-    return vectorstore.as_retriever()
+    return build_retriever(vectorstore)
 
-def load_existing_vectorstore():
-    """기존 벡터스토어를 로드합니다. 없으면 에러를 발생시킵니다."""
-    try:
-        # 기존 벡터스토어 로드 시도 (디스크에서)
+def open_vectorstore():
+    """디스크의 기존 벡터스토어를 엽니다. 없거나 비어 있으면 에러를 발생시킵니다."""
+    # 기존 벡터스토어 로드 시도 (디스크에서)
+    if NUM_SHARDS > 1:
+        vectorstore = ShardedVectorStore(
+            COLLECTION_NAME, NUM_SHARDS, embeddings,
+            persist_directory="./chroma_db", shard_key=SHARD_KEY
+        )
+    else:
         vectorstore = Chroma(
             collection_name=COLLECTION_NAME,
             embedding_function=embeddings,
             persist_directory="./chroma_db"
         )
+
+    # 컬렉션이 실제로 존재하고 문서가 있는지 확인
+    if count_chunks(vectorstore) == 0:
+        raise ValueError(f"벡터스토어 '{COLLECTION_NAME}' 컬렉션이 비어있습니다.")
+    return vectorstore
+
+def quantize_vectorstore(vectorstore, rebuild=False):
+    """벡터스토어의 임베딩으로 int8 인덱스를 열거나, 없거나 오래됐으면 새로 만듭니다."""
+    if not rebuild and os.path.exists(f"{QUANTIZED_INDEX_PATH}.npz"):
+        quantized = QuantizedVectorStore.load(QUANTIZED_INDEX_PATH, embeddings)
+        if len(quantized.documents) == count_chunks(vectorstore):
+            return quantized
+    print("int8 양자화 인덱스 생성 중...")
+    return QuantizedVectorStore.build(vectorstore, QUANTIZED_INDEX_PATH)
+
+def count_chunks(vectorstore):
+    """벡터스토어에 저장된 청크 수를 반환합니다."""
+    if isinstance(vectorstore, ShardedVectorStore):
+        return vectorstore.count()
+    return vectorstore._collection.count()
+
+def rebuild_shard(index):
+    """샤드 하나만 다시 만듭니다. 나머지 샤드와 이전 샤드는 새 샤드로 교체될 때까지 계속 검색에 사용됩니다."""
+    # 이 프로세스가 검색에 쓰는 인스턴스가 있으면 그 인스턴스에서 교체해 검색 중인 샤드가 지워지지 않게 한다
+    active = _active_store[1] if _active_store else None
+    vectorstore = active if isinstance(active, ShardedVectorStore) else ShardedVectorStore(
+        COLLECTION_NAME, NUM_SHARDS, embeddings,
+        persist_directory="./chroma_db", shard_key=SHARD_KEY
+    )
+    count = vectorstore.rebuild_shard(index, dedupe_chunks(split_for_index(load_documents())))
+    reset_router()
+    reset_active_vectorstore()
+    invalidate_query_cache()
+    print(f"샤드 {index} 재생성 완료: {COLLECTION_NAME}-{index} (문서 수: {count})")
+    return count
+
+# 프로세스에서 한 번 연 검색용 벡터스토어 (인덱스 버전, 벡터스토어)
+_active_store = None
+_active_store_lock = threading.Lock()
+
+def open_active_vectorstore():
+    """
+    검색에 쓰는 벡터스토어를 프로세스마다 한 번만 열어 재사용합니다.
+    인덱스 버전(invalidate_query_cache가 올림)이 바뀌면 다른 프로세스가 다시 만든 인덱스도 새로 엽니다.
+    """
+    global _active_store
+    version = index_version(INDEX_VERSION_PATH)
+    with _active_store_lock:
+        if _active_store is None or _active_store[0] != version:
+            _active_store = (version, _open_active_vectorstore())
+        return _active_store[1]
+
+def reset_active_vectorstore():
+    """벡터스토어를 다시 만든 뒤 다음 검색에서 새로 열도록 캐시를 비웁니다."""
+    global _active_store
+    with _active_store_lock:
+        _active_store = None
+
+def _open_active_vectorstore():
+    """검색에 실제로 쓰는 벡터스토어(스냅샷, int8 인덱스 또는 Chroma)를 엽니다. 없으면 에러를 발생시킵니다."""
+    # 스냅샷이 있으면 SQLite를 열지 않고 memmap으로 바로 연다
+    if USE_SNAPSHOT and os.path.exists(SNAPSHOT_PATH):
+        # 다른 임베딩 모델로 만든 스냅샷이면 SnapshotMismatchError (python main.py --reindex로 다시 만든다)
+        vectorstore = SnapshotVectorStore.load(SNAPSHOT_PATH, embeddings, embedding_name)
+        print(f"스냅샷 로드 완료: {SNAPSHOT_PATH} (문서 수: {len(vectorstore.snapshot)})")
+        return vectorstore
+
+    try:
+        vectorstore = open_vectorstore()
         
-        # 컬렉션이 실제로 존재하고 문서가 있는지 확인
-        collection = vectorstore._collection
-        if collection.count() == 0:
-            raise ValueError(f"벡터스토어 '{COLLECTION_NAME}' 컬렉션이 비어있습니다.")
-        
-        print(f"기존 벡터스토어 로드 완료: {COLLECTION_NAME} (문서 수: {collection.count()})")
-        return vectorstore.as_retriever()
+        print(f"기존 벡터스토어 로드 완료: {COLLECTION_NAME} (문서 수: {count_chunks(vectorstore)})")
+        if VECTOR_QUANTIZATION == "int8":
+            vectorstore = quantize_vectorstore(vectorstore)
+        return vectorstore
         
     except Exception as e:
         raise RuntimeError(
             f"기존 벡터스토어를 로드할 수 없습니다: {e}\n"
             f"먼저 main.py를 실행하여 벡터스토어를 생성해주세요."
-        ) 
\ No newline at end of file
+        )
+
+def load_existing_vectorstore():
+    """기존 벡터스토어를 로드합니다. 없으면 에러를 발생시킵니다."""
+    return build_retriever(open_active_vectorstore()) 
\ No newline at end of file
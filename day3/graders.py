@@ -1,6 +1,43 @@
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from models import llm
+from models import chain_llm
+from hedging import hedged
+from binary_grader import SINGLE_TOKEN_INSTRUCTION, GraderStats, binary_grader, json_grader, warn_truncated
+from config import GRADER_FAST_PATH, GRADER_THRESHOLDS
+
+# 체인별 모델 티어 (config.CHAIN_MODELS)
+# 각 체인은 HEDGING_ENABLED이면 체인 이름별 예산으로 헤징된다
+router_llm = chain_llm("router")
+grader_llm = chain_llm("grader")
+generator_llm = chain_llm("generator")
+# yes/no 평가기의 단일 토큰 logprob 경로용 모델
+grader_fast_llm = chain_llm("grader", single_token=True) if GRADER_FAST_PATH else None
+
+# 평가기 경로별 호출 수 (logprob / JSON 대체 / 잘못된 응답)
+grader_stats = GraderStats()
+
+def yes_no_grader(name, system, criteria, human):
+    """
+    yes/no 평가기를 만듭니다. 결과는 항상 {"score": "yes"|"no"}를 포함합니다.
+
+    GRADER_FAST_PATH이면 criteria(system에서 JSON 지시를 뺀 부분) + 단일 토큰 지시로
+    logprob 판정을 하고, logprobs가 없으면 system 프롬프트의 JSON 경로로 돌아갑니다.
+    """
+    json_prompt = ChatPromptTemplate.from_messages([
+        ("system", system),
+        ("human", human),
+    ])
+    grader = json_grader(json_prompt | grader_llm, stats=grader_stats)
+    if GRADER_FAST_PATH:
+        fast_prompt = ChatPromptTemplate.from_messages([
+            ("system", criteria + SINGLE_TOKEN_INSTRUCTION),
+            ("human", human),
+        ])
+        grader = binary_grader(
+            fast_prompt | grader_fast_llm, grader,
+            threshold=GRADER_THRESHOLDS.get(name, 0.5), stats=grader_stats,
+        )
+    return hedged(name, grader)
 
 # 질문 라우터
 router_system = """You are an expert at routing a user question to a vectorstore or web search.
@@ -14,21 +51,24 @@ router_prompt = ChatPromptTemplate.from_messages([
     ("human", "question: {question}"),
 ])
 
-question_router = router_prompt | llm | JsonOutputParser()
+question_router = hedged(
+    "question_router", router_prompt | router_llm | warn_truncated("question_router") | JsonOutputParser()
+)
 
 # 검색 문서 평가기
-retrieval_system = """You are a grader assessing relevance
+retrieval_criteria = """You are a grader assessing relevance
 of a retrieved document to a user question. If the document contains keywords related to the user question,
 grade it as relevant. It does not need to be a stringent test. The goal is to filter out erroneous retrievals. \n
 Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question. \n
-Provide the binary score as a JSON with a single key 'score' and no premable or explanation."""
+"""
+retrieval_system = retrieval_criteria + "Provide the binary score as a JSON with a single key 'score' and no premable or explanation."
 
-retrieval_prompt = ChatPromptTemplate.from_messages([
-    ("system", retrieval_system),
-    ("human", "question: {question}\n\n document: {document} "),
-])
-
-retrieval_grader = retrieval_prompt | llm | JsonOutputParser()
+retrieval_grader = yes_no_grader(
+    "retrieval_grader",
+    retrieval_system,
+    retrieval_criteria,
+    "question: {question}\n\n document: {document} ",
+)
 
 # RAG 답변 생성기
 rag_system = """You are an assistant for question-answering tasks.
@@ -40,45 +80,75 @@ rag_prompt = ChatPromptTemplate.from_messages([
     ("human", "question: {question}\n\n context: {context} "),
 ])
 
-rag_chain = rag_prompt | llm | StrOutputParser()
+rag_chain = hedged("rag_chain", rag_prompt | generator_llm | StrOutputParser())
 
 # 할루시네이션 평가기
-hallucination_system = """You are a grader assessing whether
+hallucination_criteria = """You are a grader assessing whether
 an answer is grounded in / supported by a set of facts. Give a binary 'yes' or 'no' score to indicate
-whether the answer is grounded in / supported by a set of facts. Provide the binary score as a JSON with a
+whether the answer is grounded in / supported by a set of facts. """
+hallucination_system = hallucination_criteria + """Provide the binary score as a JSON with a
 single key 'score' and no preamble or explanation."""
 
-hallucination_prompt = ChatPromptTemplate.from_messages([
-    ("system", hallucination_system),
-    ("human", "documents: {documents}\n\n answer: {generation} "),
-])
-
-hallucination_grader = hallucination_prompt | llm | JsonOutputParser()
+hallucination_grader = yes_no_grader(
+    "hallucination_grader",
+    hallucination_system,
+    hallucination_criteria,
+    "documents: {documents}\n\n answer: {generation} ",
+)
 
 # 답변 평가기
-answer_system = """You are a grader assessing whether an
+answer_criteria = """You are a grader assessing whether an
 answer is useful to resolve a question. Give a binary score 'yes' or 'no' to indicate whether the answer is
-useful to resolve a question. Provide the binary score as a JSON with a single key 'score' and no preamble or explanation."""
+useful to resolve a question. """
+answer_system = answer_criteria + "Provide the binary score as a JSON with a single key 'score' and no preamble or explanation."
 
-answer_prompt = ChatPromptTemplate.from_messages([
-    ("system", answer_system),
-    ("human", "question: {question}\n\n answer: {generation} "),
-])
-
-answer_grader = answer_prompt | llm | JsonOutputParser()
+answer_grader = yes_no_grader(
+    "answer_grader",
+    answer_system,
+    answer_criteria,
+    "question: {question}\n\n answer: {generation} ",
+)
 
 # 문서 생성 결정 평가기
-generate_decision_system = """You are a grader assessing whether the retrieved documents
+generate_decision_criteria = """You are a grader assessing whether the retrieved documents
 contain sufficient information to generate a meaningful answer to the user question. 
 Evaluate if the documents are relevant and contain enough content to answer the question.
 Give a binary score 'yes' or 'no' to indicate whether answer generation should proceed.
 'yes' means the documents are sufficient to generate an answer.
 'no' means the documents are insufficient and web search should be performed instead.
-Provide the binary score as a JSON with a single key 'score' and no preamble or explanation."""
-
-generate_decision_prompt = ChatPromptTemplate.from_messages([
-    ("system", generate_decision_system),
-    ("human", "question: {question}\n\n documents: {documents} "),
+"""
+generate_decision_system = generate_decision_criteria + "Provide the binary score as a JSON with a single key 'score' and no preamble or explanation."
+
+generate_decision_grader = yes_no_grader(
+    "generate_decision_grader",
+    generate_decision_system,
+    generate_decision_criteria,
+    "question: {question}\n\n documents: {documents} ",
+)
+
+# 문장 근거 평가기 (HALLUCINATION_CHECK_MODE = "sentence")
+sentence_criteria = """You are a grader assessing whether a single sentence from an answer
+is supported by a set of facts. Give a binary 'yes' or 'no' score to indicate whether every claim
+in the sentence is stated in or directly follows from the facts. """
+sentence_system = sentence_criteria + "Provide the binary score as a JSON with a single key 'score' and no preamble or explanation."
+
+sentence_grader = yes_no_grader(
+    "sentence_grader",
+    sentence_system,
+    sentence_criteria,
+    "documents: {documents}\n\n sentence: {sentence} ",
+)
+
+# 근거 없는 문장 수정기
+revise_system = """You are revising an answer so that it is fully supported by the retrieved context.
+You are given the answer and a numbered list of its sentences that are not supported by the context.
+For each listed sentence, rewrite it using only information from the context, or return an empty string to remove it.
+Do not change any other sentence. Return a JSON with a single key 'revisions' whose value is a list of strings,
+one per listed sentence in the same order, and no preamble or explanation."""
+
+revise_prompt = ChatPromptTemplate.from_messages([
+    ("system", revise_system),
+    ("human", "question: {question}\n\n context: {context}\n\n answer: {answer}\n\n unsupported sentences:\n{sentences} "),
 ])
 
-generate_decision_grader = generate_decision_prompt | llm | JsonOutputParser() 
\ No newline at end of file
+revise_chain = hedged("revise_chain", revise_prompt | generator_llm | JsonOutputParser())
@@ -0,0 +1,220 @@
+"""
+요청 헤징 (hedged requests)
+
+호출이 그 체인에서 관측된 지연 분위수(기본 p90)까지 끝나지 않으면 같은 요청을 한 번 더 보내고,
+먼저 성공한 응답을 쓰고 나머지는 취소합니다. 체인별 예산(전체 호출 중 헤징할 수 있는 비율)으로
+추가 비용을 제한합니다.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+import numpy as np
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from config import (
+    HEDGING_ENABLED, HEDGE_QUANTILE, HEDGE_MIN_SAMPLES, HEDGE_INITIAL_DELAY_SECONDS,
+    HEDGE_MIN_DELAY_SECONDS, HEDGE_BUDGETS, HEDGE_DEFAULT_BUDGET, HEDGE_MAX_WORKERS
+)
+
+class HedgeStats:
+    """
+    체인별 헤징 지표
+
+    Attributes:
+        calls: 전체 호출 수
+        hedged: 두 번째 요청을 보낸 호출 수
+        hedge_wins: 두 번째 요청이 먼저 성공한 수
+        denied: 지연 기준을 넘었지만 예산이 없어 헤징하지 못한 수
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    @property
+    def win_rate(self):
+        """헤징한 호출 중 두 번째 요청이 이긴 비율"""
+        return self.hedge_wins / self.hedged if self.hedged else 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "denied": self.denied,
+            "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+            "win_rate": self.win_rate,
+        }
+
+class Hedger:
+    """
+    체인 하나의 헤징 정책
+
+    Args:
+        name (str): 체인 이름
+        budget (float): 전체 호출 중 헤징할 수 있는 최대 비율 (0.1이면 10%)
+        quantile (float): 헤징 지연으로 쓸 관측 지연 분위수
+        min_samples (int): 이만큼 관측되기 전에는 initial_delay 사용
+        initial_delay (float): 초기 헤징 지연 (초)
+        min_delay (float): 헤징 지연 하한 (초)
+        window (int): 분위수 계산에 쓸 최근 관측 수
+        max_workers (int): 동기 호출의 두 시도를 실행하는 이 체인 전용 스레드 풀 크기
+    """
+
+    def __init__(self, name, budget=HEDGE_DEFAULT_BUDGET, quantile=HEDGE_QUANTILE, min_samples=HEDGE_MIN_SAMPLES,
+                 initial_delay=HEDGE_INITIAL_DELAY_SECONDS, min_delay=HEDGE_MIN_DELAY_SECONDS, window=500,
+                 max_workers=HEDGE_MAX_WORKERS):
+        self.name = name
+        self.budget = budget
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.stats = HedgeStats()
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        # 컨텍스트를 복사해 사용량 장부와 콜백이 유지된다
+        self._executor = ContextThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"hedge-{name}")
+
+    def delay(self):
+        """지금 적용할 헤징 지연 (초)"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            return max(self.min_delay, float(np.quantile(self._latencies, self.quantile)))
+
+    def _start(self):
+        with self._lock:
+            self.stats.calls += 1
+
+    def _take_budget(self):
+        with self._lock:
+            if self.stats.hedged + 1 > self.budget * self.stats.calls:
+                self.stats.denied += 1
+                return False
+            self.stats.hedged += 1
+            return True
+
+    def _finish(self, start, hedge_won=False):
+        with self._lock:
+            # 호출자가 체감한 지연 (첫 요청 시작부터 이긴 응답까지)
+            self._latencies.append(time.perf_counter() - start)
+            if hedge_won:
+                self.stats.hedge_wins += 1
+
+    def call(self, fn):
+        """fn()을 헤징해서 실행합니다. 스레드에서 실행 중인 진 요청은 멈출 수 없어 결과만 버립니다."""
+        self._start()
+        start = time.perf_counter()
+        started = threading.Event()
+
+        def run_primary():
+            started.set()
+            return fn()
+
+        primary = self._executor.submit(run_primary)
+        # 풀에서 기다린 시간은 헤징 지연에 넣지 않는다 (큐 대기만으로 헤징하지 않도록)
+        started.wait()
+        # 헤징 여부는 wait 결과로만 판단한다. fn이 TimeoutError를 던져도 느린 요청으로 보지 않는다
+        done, _ = wait([primary], timeout=self.delay())
+        if primary in done:
+            result = primary.result()
+            self._finish(start)
+            return result
+
+        if not self._take_budget():
+            result = primary.result()
+            self._finish(start)
+            return result
+
+        hedge = self._executor.submit(fn)
+        pending = [primary, hedge]
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            pending = [f for f in pending if f not in done]
+            winner = next((f for f in (primary, hedge) if f in done and f.exception() is None), None)
+            if winner is not None:
+                for f in pending:
+                    f.cancel()
+                self._finish(start, hedge_won=winner is hedge)
+                return winner.result()
+        # 두 요청이 모두 실패하면 첫 요청의 예외를 전달
+        return primary.result()
+
+    async def acall(self, fn):
+        """call의 비동기 버전. fn은 코루틴을 반환하며, 진 요청은 취소됩니다."""
+        self._start()
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({primary}, timeout=self.delay())
+        if done or not self._take_budget():
+            result = await primary
+            self._finish(start)
+            return result
+
+        hedge = asyncio.ensure_future(fn())
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in (primary, hedge) if t in done and t.exception() is None), None)
+                if winner is not None:
+                    self._finish(start, hedge_won=winner is hedge)
+                    return winner.result()
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+_hedgers = {}
+_hedgers_lock = threading.Lock()
+
+def get_hedger(name):
+    """체인 이름별 Hedger (HEDGE_BUDGETS에 없으면 HEDGE_DEFAULT_BUDGET)"""
+    with _hedgers_lock:
+        if name not in _hedgers:
+            _hedgers[name] = Hedger(name, budget=HEDGE_BUDGETS.get(name, HEDGE_DEFAULT_BUDGET))
+        return _hedgers[name]
+
+def hedge_stats():
+    """체인별 헤징 지표 (호출 수, 헤징 수, 헤징 승률 등)"""
+    with _hedgers_lock:
+        hedgers = list(_hedgers.values())
+    return {hedger.name: {**hedger.stats.as_dict(), "delay": hedger.delay()} for hedger in hedgers}
+
+def hedged(name, runnable, enabled=HEDGING_ENABLED):
+    """Runnable 호출을 헤징하는 Runnable을 반환합니다. 꺼져 있으면 그대로 반환합니다."""
+    if not enabled:
+        return runnable
+    hedger = get_hedger(name)
+
+    def invoke(input, config):
+        return hedger.call(lambda: runnable.invoke(input, config))
+
+    async def ainvoke(input, config):
+        return await hedger.acall(lambda: runnable.ainvoke(input, config))
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"hedged_{name}")
+
+class HedgedSearchClient:
+    """검색 클라이언트의 search 호출을 헤징합니다."""
+
+    def __init__(self, inner, name="tavily_search"):
+        self.inner = inner
+        self.hedger = get_hedger(name)
+
+    def search(self, **kwargs):
+        return self.hedger.call(lambda: self.inner.search(**kwargs))
+
+class AsyncHedgedSearchClient(HedgedSearchClient):
+    async def search(self, **kwargs):
+        return await self.hedger.acall(lambda: self.inner.search(**kwargs))
+
+def hedge_search_client(client, is_async=False, enabled=HEDGING_ENABLED):
+    if not enabled:
+        return client
+    return (AsyncHedgedSearchClient if is_async else HedgedSearchClient)(client)
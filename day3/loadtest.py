@@ -0,0 +1,298 @@
+"""
+워크플로우 부하 테스트 (open-loop, 포아송 도착)
+
+목표 도착률(초당 요청 수)로 요청을 보내고 응답을 기다리지 않고 다음 요청을 예약합니다.
+동시 실행 수(concurrency)를 넘는 요청은 큐에서 기다리며, 그 시간을 큐 대기 시간으로 기록합니다.
+
+사용법:
+    python loadtest.py --target fake --rate 5 --duration 30
+    python loadtest.py --target day3 --rate 0.5 --requests 20 --questions ../requests.jsonl
+    python loadtest.py --target day2 --rate 0.5 --requests 20
+    python loadtest.py --target fake --rate 20 --duration 20 --sweep 1,2,4,8,16,32
+
+실제 코드 경로를 API 없이 측정하려면 카세트 replay 모드(CASSETTE_MODE=replay)와 함께 사용하세요.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_QUESTIONS = [
+    "What is task decomposition for LLM agents?",
+    "What are the types of agent memory?",
+    "What is chain-of-thought prompting?",
+    "How do adversarial attacks on LLMs work?",
+    "Who won the last FIFA World Cup?",
+]
+
+def load_questions(path):
+    """JSONL(question/title 키) 또는 한 줄에 질문 하나인 텍스트 파일에서 질문을 읽습니다."""
+    if not path:
+        return list(DEFAULT_QUESTIONS)
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                line = record.get("question") or record.get("title") or ""
+            if line:
+                questions.append(line)
+    return questions
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))
+    return values[index]
+
+# fake 대상의 단계별 지연 중앙값(초). --fake-latencies로 바꿀 수 있음
+DEFAULT_STAGE_LATENCIES = {"retrieve": 0.15, "grade": 0.4, "generate": 1.2, "grade_generation": 0.5}
+
+def positive_float(value):
+    """0보다 큰 실수만 받는 argparse 타입"""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"0보다 커야 합니다: {value}")
+    return number
+
+def stage_latencies(value):
+    """'retrieve=0.15,generate=2.0' 형식의 단계별 지연 중앙값. 지정하지 않은 단계는 기본값을 씁니다."""
+    latencies = dict(DEFAULT_STAGE_LATENCIES)
+    for item in value.split(","):
+        stage, _, seconds = item.partition("=")
+        stage = stage.strip()
+        if stage not in DEFAULT_STAGE_LATENCIES:
+            raise argparse.ArgumentTypeError(
+                f"알 수 없는 단계입니다: {stage} (가능한 단계: {', '.join(DEFAULT_STAGE_LATENCIES)})"
+            )
+        try:
+            latencies[stage] = float(seconds)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"지연 값이 숫자가 아닙니다: {item}")
+        if latencies[stage] < 0:
+            raise argparse.ArgumentTypeError(f"지연은 0 이상이어야 합니다: {item}")
+    return latencies
+
+class FakePipeline:
+    """
+    day3 파이프라인 단계 지연을 흉내내는 가짜 백엔드
+
+    단계별 지연은 로그정규분포(중앙값, 꼬리 정도 sigma)로 뽑고, error_rate 확률로 실패합니다.
+    """
+
+    def __init__(self, stage_latencies=None, sigma=0.5, error_rate=0.0, grader_calls=4, seed=None):
+        self.stage_latencies = stage_latencies or dict(DEFAULT_STAGE_LATENCIES)
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.grader_calls = grader_calls
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sample(self, median):
+        with self._lock:
+            return median * math.exp(self._random.gauss(0, self.sigma))
+
+    def __call__(self, question):
+        time.sleep(self._sample(self.stage_latencies["retrieve"]))
+        for _ in range(self.grader_calls):
+            time.sleep(self._sample(self.stage_latencies["grade"]))
+        time.sleep(self._sample(self.stage_latencies["generate"]))
+        time.sleep(self._sample(self.stage_latencies["grade_generation"]))
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise RuntimeError("fake backend error")
+        return {"generation": f"answer to {question}"}
+
+def build_target(name, args):
+    """부하를 걸 대상 함수(question -> result)를 만듭니다."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    if name == "fake":
+        return FakePipeline(
+            stage_latencies=args.fake_latencies, sigma=args.fake_sigma, error_rate=args.fake_error_rate, seed=args.seed
+        )
+    if name == "day3":
+        from workflow import create_workflow, run_question
+        from deadline import make_inputs
+        from chunk_store import chunk_store
+        app = create_workflow()
+        if args.coalesce:
+            return lambda question: run_question(app, question)
+
+        def invoke(question):
+            with chunk_store.pinned():
+                return app.invoke(make_inputs(question))
+        return invoke
+    if name == "day2":
+        # day2 모듈이 같은 이름의 day3 모듈보다 먼저 잡히도록 경로 맨 앞에 추가
+        sys.path.insert(0, os.path.join(here, "..", "day2"))
+        from query_rag import RAGSystem, RAGSystemConfig
+        config = RAGSystemConfig()
+        config.coalesce_requests = args.coalesce
+        return RAGSystem(config).query
+    raise ValueError(f"알 수 없는 대상입니다: {name}")
+
+def run_load(target, questions, rate, concurrency, duration=None, requests=None, seed=None, window=5.0):
+    """
+    open-loop 부하를 걸고 요청별 기록을 반환합니다.
+
+    Args:
+        target: question -> result 함수
+        questions (list): 질문 목록 (순환 사용)
+        rate (float): 목표 도착률 (초당 요청 수)
+        concurrency (int): 동시 실행 수
+        duration (float): 부하 시간(초)
+        requests (int): 보낼 요청 수 (duration보다 우선)
+        window (float): 시간대별 집계 구간(초)
+    """
+    rng = random.Random(seed)
+    records = []
+    lock = threading.Lock()
+
+    def execute(index, question, scheduled):
+        started = time.perf_counter()
+        error = None
+        try:
+            target(question)
+        except Exception as e:
+            error = repr(e)
+        finished = time.perf_counter()
+        with lock:
+            records.append({
+                "index": index, "scheduled": scheduled, "started": started, "finished": finished,
+                "queue_delay": started - scheduled, "service": finished - started,
+                "latency": finished - scheduled, "error": error,
+            })
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    begin = time.perf_counter()
+    next_at = begin
+    index = 0
+    while True:
+        if requests is not None and index >= requests:
+            break
+        if requests is None and next_at - begin >= duration:
+            break
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        # 예약 시각 기준으로 기록해 스케줄러 지연도 대기 시간에 포함
+        executor.submit(execute, index, questions[index % len(questions)], next_at)
+        index += 1
+        next_at += rng.expovariate(rate)
+    executor.shutdown(wait=True)
+    end = time.perf_counter()
+
+    for record in records:
+        for key in ("scheduled", "started", "finished"):
+            record[key] -= begin
+    return summarize(records, end - begin, window)
+
+def summarize(records, elapsed, window):
+    ok = [r for r in records if r["error"] is None]
+    latencies = [r["latency"] for r in ok]
+    services = [r["service"] for r in ok]
+    queue = [r["queue_delay"] for r in records]
+
+    timeline = []
+    # 도착이 있었던 구간까지만 집계 (남은 요청을 처리하는 꼬리 구간 제외)
+    last_arrival = max((r["scheduled"] for r in records), default=0.0)
+    buckets = int(last_arrival // window) + 1 if records else 0
+    for b in range(buckets):
+        lo, hi = b * window, (b + 1) * window
+        in_window = [r for r in records if lo <= r["scheduled"] < hi]
+        delays = [r["queue_delay"] for r in in_window]
+        timeline.append({
+            "start": lo,
+            "arrivals": len(in_window),
+            "queue_delay_mean": sum(delays) / len(delays) if delays else 0.0,
+            "queue_delay_p95": percentile(delays, 95) if delays else 0.0,
+            "errors": sum(1 for r in in_window if r["error"]),
+        })
+
+    return {
+        "requests": len(records),
+        "completed": len(ok),
+        "errors": len(records) - len(ok),
+        "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+        "elapsed": elapsed,
+        "throughput": len(ok) / elapsed if elapsed else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "service_p50": percentile(services, 50),
+        "queue_delay_p50": percentile(queue, 50),
+        "queue_delay_p95": percentile(queue, 95),
+        "timeline": timeline,
+    }
+
+def print_summary(summary, concurrency):
+    print(f"\n=== concurrency={concurrency} ===")
+    print(f"요청 {summary['requests']}개, 완료 {summary['completed']}개, 오류율 {summary['error_rate']:.1%}, "
+          f"처리량 {summary['throughput']:.2f} req/s")
+    print(f"지연 p50/p95/p99: {summary['latency_p50']:.2f}s / {summary['latency_p95']:.2f}s / {summary['latency_p99']:.2f}s "
+          f"(서비스 p50 {summary['service_p50']:.2f}s, 큐 대기 p50/p95 {summary['queue_delay_p50']:.2f}s / {summary['queue_delay_p95']:.2f}s)")
+    print(f"{'t(s)':>6} {'arrivals':>9} {'queue mean':>11} {'queue p95':>10} {'errors':>7}")
+    for row in summary["timeline"]:
+        print(f"{row['start']:>6.0f} {row['arrivals']:>9} {row['queue_delay_mean']:>10.2f}s {row['queue_delay_p95']:>9.2f}s {row['errors']:>7}")
+
+def find_saturation(results, tolerance=0.05):
+    """최대 처리량의 (1 - tolerance) 이상을 내는 가장 작은 동시 실행 수"""
+    best = max(summary["throughput"] for _, summary in results)
+    for concurrency, summary in results:
+        if summary["throughput"] >= best * (1 - tolerance):
+            return concurrency
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="open-loop 부하 테스트")
+    parser.add_argument("--target", choices=["day3", "day2", "fake"], default="fake")
+    parser.add_argument("--questions", help="질문 파일 (JSONL 또는 텍스트)")
+    parser.add_argument("--rate", type=positive_float, default=1.0, help="초당 도착 요청 수 (0보다 커야 함)")
+    parser.add_argument("--duration", type=positive_float, default=30.0, help="부하 시간(초)")
+    parser.add_argument("--requests", type=int, help="보낼 요청 수 (지정 시 duration 무시)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sweep", help="동시 실행 수 목록 (예: 1,2,4,8)")
+    parser.add_argument("--window", type=float, default=5.0, help="시간대별 집계 구간(초)")
+    parser.add_argument("--coalesce", action="store_true", help="동일 질문 병합(single-flight) 사용")
+    parser.add_argument(
+        "--fake-latencies", type=stage_latencies,
+        help="fake 대상의 단계별 지연 중앙값(초), 예: retrieve=0.15,grade=0.4,generate=1.2,grade_generation=0.5",
+    )
+    parser.add_argument("--fake-sigma", type=float, default=0.5, help="fake 대상의 지연 꼬리(로그정규 sigma)")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="결과를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    target = build_target(args.target, args)
+    levels = [int(c) for c in args.sweep.split(",")] if args.sweep else [args.concurrency]
+
+    results = []
+    for concurrency in levels:
+        summary = run_load(target, questions, args.rate, concurrency, args.duration, args.requests, args.seed, args.window)
+        print_summary(summary, concurrency)
+        results.append((concurrency, summary))
+
+    if len(results) > 1:
+        print(f"\n{'concurrency':>11} {'req/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'errors':>7}")
+        for concurrency, s in results:
+            print(f"{concurrency:>11} {s['throughput']:>7.2f} {s['latency_p50']:>6.2f}s {s['latency_p95']:>6.2f}s {s['latency_p99']:>6.2f}s {s['error_rate']:>6.1%}")
+        print(f"포화 지점(최대 처리량의 95% 이상을 내는 최소 동시 실행 수): {find_saturation(results)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([{"concurrency": c, **s} for c, s in results], f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
+import sys
 from pprint import pprint
 from models import llm, tavily_client
 from document_loader import create_vectorstore, load_existing_vectorstore
 from graders import question_router, retrieval_grader, rag_chain
 from workflow import create_workflow
+from config import (
+    CHECKPOINT_ENABLED, GROUNDING_PRECHECK, MEMORY_PROFILE, MEMORY_PROFILE_PATH, MEMORY_PROFILE_TOP,
+    REQUEST_COST_BUDGET, HEDGING_ENABLED, GRADER_FAST_PATH, QUERY_CACHE_ENABLED,
+    SCHEDULER_ENABLED, HALLUCINATION_CHECK_MODE
+)
+from deadline import make_inputs
+from memprofile import profiler
+from usage import track_usage
+from chunk_store import chunk_store
 
 def main():
     """메인 실행 함수"""
@@ -43,24 +53,87 @@ def main():
     # generation = rag_chain.invoke({"context": docs, "question": question})
     # print(generation)
     
+    # 메모리 프로파일: MEMORY_PROFILE=1 python main.py [--reindex]
+    if MEMORY_PROFILE:
+        profiler.start(top=MEMORY_PROFILE_TOP)
+    if "--reindex" in sys.argv:
+        create_vectorstore()
+
     # 7. 전체 워크플로우 실행
     print("\n=== Full Workflow Execution ===")
-    app = create_workflow()
+    # 재개: python main.py --resume <thread_id>
+    resume_thread_id = sys.argv[2] if len(sys.argv) > 2 and sys.argv[1] == "--resume" else None
+
+    config = None
+    if CHECKPOINT_ENABLED or resume_thread_id:
+        from checkpoint import create_checkpointer, thread_config, resume_workflow
+        app = create_workflow(checkpointer=create_checkpointer())
+        config = thread_config(resume_thread_id)
+        print(f"thread_id: {config['configurable']['thread_id']}")
+    else:
+        app = create_workflow()
     
-    inputs = {"question": "세계에서 3대 중량이 가장 높은 사람은 누구인가? (벤치프레스, 스쿼트, 데드리프트)"}
+    inputs = make_inputs("세계에서 3대 중량이 가장 높은 사람은 누구인가? (벤치프레스, 스쿼트, 데드리프트)")
+    if resume_thread_id:
+        stream = resume_workflow(app, config)
+    else:
+        stream = app.stream(inputs, config)
+
+    # 노드는 바뀐 키만 반환하므로 출력을 합쳐 최종 상태를 만든다
     final_state = None
-    for output in app.stream(inputs):
-        for key, value in output.items():
-            pprint(f"Finished running: {key}:")
-            final_state = value
+    with track_usage(REQUEST_COST_BUDGET) as ledger, chunk_store.pinned():
+        for output in stream:
+            for key, value in output.items():
+                pprint(f"Finished running: {key}:")
+                final_state = {**(final_state or {}), **(value or {})}
     
     # 최종 결과 출력
     if final_state and "generation" in final_state:
         print("\n=== Final Answer ===")
+        if final_state.get("degraded"):
+            print("(시간 제한으로 검증이 끝나지 않은 답변입니다)")
         print(final_state["generation"])
     else:
         print("\n=== Final State ===")
         pprint(final_state)
 
+    print("\n=== Token Usage ===")
+    pprint(ledger.as_dict())
+
+    if HEDGING_ENABLED:
+        from hedging import hedge_stats
+        print("\n=== Hedging ===")
+        pprint(hedge_stats())
+
+    if GRADER_FAST_PATH:
+        from graders import grader_stats
+        print("\n=== Grader Paths ===")
+        pprint(grader_stats.as_dict())
+
+    if QUERY_CACHE_ENABLED:
+        from retrieval import query_cache_stats
+        print("\n=== Query Cache ===")
+        pprint(query_cache_stats())
+
+    if SCHEDULER_ENABLED:
+        from workflow import scheduler
+        print("\n=== Scheduler ===")
+        pprint(scheduler.metrics())
+
+    if HALLUCINATION_CHECK_MODE == "sentence":
+        from nodes import verification_stats
+        print("\n=== Sentence Verification ===")
+        pprint(verification_stats.as_dict())
+
+    if GROUNDING_PRECHECK:
+        from grounding import get_scorer
+        print("\n=== Grounding Precheck ===")
+        pprint(get_scorer().stats.as_dict())
+
+    if MEMORY_PROFILE:
+        profiler.stop()
+        print(f"\n{profiler.format_report()}")
+        print(f"메모리 프로파일 저장: {profiler.write_report(MEMORY_PROFILE_PATH)}")
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
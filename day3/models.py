@@ -1,12 +1,70 @@
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from tavily import TavilyClient
-from config import LLM_MODEL, LLM_TEMPERATURE, EMBEDDING_MODEL, TAVILY_API_KEY
+from tavily import TavilyClient, AsyncTavilyClient
+from cassette import Cassette, wrap_chat_model, wrap_embeddings, wrap_search_client
+from usage import tiered_model, model_key
+from hedging import hedge_search_client
+from binary_grader import single_token_settings
+from query_cache import CachedQueryEmbeddings, LRUCache
+from config import (
+    LLM_MODEL, LLM_TEMPERATURE, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, TAVILY_API_KEY,
+    CASSETTE_MODE, CASSETTE_PATH, CASSETTE_REPLAY_LATENCY, CHAIN_MODELS, ECONOMY_CHAIN_MODELS,
+    QUERY_CACHE_ENABLED, QUERY_EMBEDDING_CACHE_SIZE
+)
+
+# 카세트 (CASSETTE_MODE가 없으면 None, 실제 호출)
+cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_REPLAY_LATENCY) if CASSETTE_MODE else None
+
+# 같은 설정의 모델은 한 번만 만든다
+_chat_models = {}
+
+def chat_model(settings):
+    """티어 설정(ChatOpenAI 파라미터)으로 채팅 모델을 만듭니다."""
+    key = model_key(settings)
+    if key not in _chat_models:
+        # 카세트 기록은 모델 이름과 기본값이 아닌 파라미터로 구분한다
+        extra = [f"{k}={v}" for k, v in key[1] if not (k == "temperature" and v == 0)]
+        _chat_models[key] = wrap_chat_model(
+            lambda: ChatOpenAI(**settings), ":".join([settings["model"], *extra]), cassette
+        )
+    return _chat_models[key]
+
+def chain_llm(chain, single_token=False):
+    """
+    체인별 티어 모델. 요청 예산을 다 쓰면 ECONOMY_CHAIN_MODELS로 바뀌고 사용량이 장부에 기록됩니다.
+    single_token이면 yes/no 한 토큰과 logprobs를 요청하는 설정으로 만듭니다.
+    """
+    primary = CHAIN_MODELS[chain]
+    economy = ECONOMY_CHAIN_MODELS.get(chain)
+    if single_token:
+        primary = single_token_settings(primary)
+        economy = single_token_settings(economy) if economy else None
+    return tiered_model(
+        chain,
+        chat_model(primary),
+        chat_model(economy) if economy else None,
+        primary["model"],
+        economy["model"] if economy else None,
+    )
 
 # LLM 초기화
-llm = ChatOpenAI(model=LLM_MODEL, temperature=LLM_TEMPERATURE)
+llm = chat_model({"model": LLM_MODEL, "temperature": LLM_TEMPERATURE})
 
 # 임베딩 모델 초기화
-embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+embedding_name = f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}" if EMBEDDING_DIMENSIONS else EMBEDDING_MODEL
+embeddings = wrap_embeddings(
+    lambda: OpenAIEmbeddings(model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS),
+    embedding_name,
+    cassette,
+)
+# 질문 임베딩 캐시 (검색, 센트로이드 라우터, 웹 캐시 검색이 함께 쓴다)
+if QUERY_CACHE_ENABLED:
+    embeddings = CachedQueryEmbeddings(embeddings, embedding_name, LRUCache(QUERY_EMBEDDING_CACHE_SIZE))
 
-# Tavily 클라이언트 초기화
-tavily_client = TavilyClient(api_key=TAVILY_API_KEY) 
\ No newline at end of file
+# Tavily 클라이언트 초기화 (HEDGING_ENABLED이면 search 호출을 헤징)
+tavily_client = hedge_search_client(
+    wrap_search_client(lambda: TavilyClient(api_key=TAVILY_API_KEY), cassette)
+)
+async_tavily_client = hedge_search_client(
+    wrap_search_client(lambda: AsyncTavilyClient(api_key=TAVILY_API_KEY), cassette, is_async=True),
+    is_async=True,
+)
@@ -1,5 +1,27 @@
-from models import tavily_client
-from graders import retrieval_grader, rag_chain, hallucination_grader, answer_grader, generate_decision_grader
+import asyncio
+from langchain_core.documents import Document
+from models import tavily_client, async_tavily_client
+from deadline import can_afford
+from grounding import get_scorer, strip_sources
+from chunk_store import chunk_store
+from early_exit import EnoughContext, grade_until_enough, agrade_until_enough
+from sentence_verify import (
+    VerificationStats, verify_sentences, averify_sentences, format_unsupported, parse_revisions, splice_revisions
+)
+from config import (
+    GROUNDING_PRECHECK, GRADING_MODE, EARLY_EXIT_MIN_RELEVANT, EARLY_EXIT_MAX_CONTEXT_TOKENS,
+    GRADING_MAX_CONCURRENCY, WEB_WRITEBACK, HALLUCINATION_CHECK_MODE, SENTENCE_VERIFY_MAX_CONCURRENCY
+)
+from graders import (
+    retrieval_grader, rag_chain, hallucination_grader, answer_grader, generate_decision_grader,
+    sentence_grader, revise_chain
+)
+
+# 문장 단위 검증 지표 (HALLUCINATION_CHECK_MODE = "sentence")
+verification_stats = VerificationStats()
+
+class LoopLimitError(RuntimeError):
+    """재시도 루프가 최대 횟수에 도달했을 때 발생합니다. 체크포인트가 있으면 상태를 조회/재개할 수 있습니다."""
 
 def web_search(state):
     """
@@ -9,7 +31,7 @@ def web_search(state):
         state (dict): The current graph state
 
     Returns:
-        state (dict): Appended web results to documents
+        state (dict): Appended web results to documents (청크 참조 목록)
     """
     print("---WEB SEARCH---")
     question = state["question"]
@@ -19,9 +41,24 @@ def web_search(state):
     response = tavily_client.search(
         query=question, search_depth="advanced", max_results=3
     )
-    
+    docs = _web_results_to_documents(response)
+    return {"documents": chunk_store.to_refs(docs)}
+
+async def aweb_search(state):
+    """web_search의 비동기 버전 (AsyncTavilyClient 사용)"""
+    print("---WEB SEARCH---")
+    question = state["question"]
+    print({"question": question})
+
+    response = await async_tavily_client.search(
+        query=question, search_depth="advanced", max_results=3
+    )
+    docs = _web_results_to_documents(response)
+    return {"documents": chunk_store.to_refs(docs)}
+
+def _web_results_to_documents(response):
+    """Tavily 검색 결과를 출처 정보가 담긴 Document 목록으로 바꿉니다."""
     # Create document-like structure with source information
-    from langchain_core.documents import Document
     docs = []
     
     for result in response['results']:
@@ -40,7 +77,7 @@ def web_search(state):
     for doc in docs:
         print(f"  - {doc.metadata['title']}: {doc.metadata['source']}")
     
-    return {"documents": docs, "question": question}
+    return docs
 
 def retrieve(state):
     """
@@ -61,7 +98,39 @@ def retrieve(state):
     
     # Retrieval
     documents = retriever.invoke(question)
-    
+    if WEB_WRITEBACK:
+        documents += _web_cache_documents(question)
+    _tag_vector_documents(documents)
+    return {"documents": chunk_store.to_refs(documents)}
+
+async def aretrieve(state):
+    """retrieve의 비동기 버전"""
+    print("---RETRIEVE---")
+    question = state["question"]
+
+    from document_loader import load_existing_vectorstore
+    # 벡터스토어 열기는 디스크 I/O라 이벤트 루프를 막지 않도록 스레드에서 실행
+    retriever = await asyncio.to_thread(load_existing_vectorstore)
+
+    documents = await retriever.ainvoke(question)
+    if WEB_WRITEBACK:
+        documents += await asyncio.to_thread(_web_cache_documents, question)
+    _tag_vector_documents(documents)
+    return {"documents": chunk_store.to_refs(documents)}
+
+def _web_cache_documents(question):
+    """웹 캐시(이전에 평가를 통과한 웹 검색 결과)에서 만료되지 않은 관련 청크를 가져옵니다."""
+    from web_cache import get_web_cache
+    documents = []
+    for doc, score in get_web_cache().search(question):
+        doc.metadata["relevance_score"] = score
+        documents.append(doc)
+    if documents:
+        print(f"웹 캐시 검색 결과: {len(documents)}개 청크")
+    return documents
+
+def _tag_vector_documents(documents):
+    """벡터스토어 문서에 source_type 메타데이터를 추가하고 결과를 출력합니다."""
     # 벡터스토어 문서에 source_type 메타데이터 추가
     for doc in documents:
         if 'source_type' not in doc.metadata:
@@ -72,8 +141,6 @@ def retrieve(state):
         source = doc.metadata.get('source', '알 수 없음')
         title = doc.metadata.get('title', '제목 없음')
         print(f"  - {title}: {source}")
-    
-    return {"documents": documents, "question": question}
 
 def generate(state):
     """
@@ -87,18 +154,75 @@ def generate(state):
     """
     print("---GENERATE---")
     question = state["question"]
-    documents = state["documents"]
+    documents = chunk_store.hydrate(state["documents"])
+
+    # 문장 검증에서 근거 없는 문장이 나왔으면 답변 전체 대신 그 문장들만 수정
+    if state.get("unsupportedSentences"):
+        unsupported, inputs = _revise_inputs(state, documents)
+        revised = _revision_result(state, documents, unsupported, revise_chain.invoke(inputs))
+        if revised is not None:
+            return revised
 
     # RAG generation
     generation = rag_chain.invoke({"context": documents, "question": question})
+    full_response = _with_sources(generation, documents)
     
+    return _generation_result(full_response)
+
+async def agenerate(state):
+    """generate의 비동기 버전"""
+    print("---GENERATE---")
+    question = state["question"]
+    documents = chunk_store.hydrate(state["documents"])
+
+    if state.get("unsupportedSentences"):
+        unsupported, inputs = _revise_inputs(state, documents)
+        revised = _revision_result(state, documents, unsupported, await revise_chain.ainvoke(inputs))
+        if revised is not None:
+            return revised
+
+    generation = await rag_chain.ainvoke({"context": documents, "question": question})
+    full_response = _with_sources(generation, documents)
+
+    return _generation_result(full_response)
+
+def _generation_result(full_response):
+    """새로 생성한 답변의 상태 업데이트. 문장 검증 모드에서는 이전 답변의 검증 결과를 비운다."""
+    if HALLUCINATION_CHECK_MODE != "sentence":
+        return {"generation": full_response}
+    return {"generation": full_response, "verifiedSentences": [], "unsupportedSentences": []}
+
+def _revise_inputs(state, documents):
+    unsupported = state["unsupportedSentences"]
+    return unsupported, {
+        "question": state["question"],
+        "context": documents,
+        "answer": strip_sources(state["generation"]),
+        "sentences": format_unsupported(unsupported),
+    }
+
+def _revision_result(state, documents, unsupported, result):
+    """
+    수정 응답을 답변에 반영한 상태 업데이트를 만듭니다. 검증을 통과한 문장(verifiedSentences)은 그대로 둡니다.
+    응답 형식이 잘못됐거나 답변이 비면 None (전체 재생성으로 돌아감).
+    """
+    revisions = parse_revisions(result, len(unsupported))
+    answer = splice_revisions(strip_sources(state["generation"]), unsupported, revisions) if revisions else ""
+    if not answer:
+        verification_stats.add(fallbacks=1)
+        print("---REVISE: MALFORMED REVISION, RE-GENERATE WHOLE ANSWER---")
+        return None
+    verification_stats.add(revisions=1)
+    print(f"---REVISE: {len(unsupported)} UNSUPPORTED SENTENCE(S)---")
+    return {"generation": _with_sources(answer, documents), "unsupportedSentences": []}
+
+def _with_sources(generation, documents):
+    """생성된 답변 뒤에 출처 정보를 붙입니다."""
     # 출처 정보 추가
     sources = format_sources(documents)
     
     # 생성된 답변에 출처 정보 추가
-    full_response = f"{generation}\n\n📚 **출처:**\n" + "\n".join(sources)
-    
-    return {"documents": documents, "question": question, "generation": full_response}
+    return f"{generation}\n\n📚 **출처:**\n" + "\n".join(sources)
 
 def format_sources(documents):
     """문서들의 출처 정보를 포맷팅"""
@@ -134,17 +258,26 @@ def grade_documents(state):
     """
     print("---CHECK DOCUMENT RELEVANCE TO QUESTION---")
     question = state["question"]
-    documents = state["documents"]
+    refs = state["documents"]
+    documents = chunk_store.hydrate(refs)
     relevanceCheckCount = state.get("relevanceCheckCount", 0)
 
-    # 웹 검색 후 최대 2번까지 관련성 검사를 허용 (벡터 검색 1번 + 웹 검색 후 1번)
-    if relevanceCheckCount >= 2:
-        print("---DECISION: MAX RELEVANCE CHECK COUNT REACHED, INCLUDE WEB SEARCH---")
-        raise Exception("failed: not relevant")
+    _check_relevance_limit(relevanceCheckCount)
+
+    if GRADING_MODE != "all":
+        relevant, graded = grade_until_enough(
+            [d.page_content for d in documents],
+            lambda text: retrieval_grader.invoke({"question": question, "document": text}),
+            _is_relevant,
+            _enough_context(),
+            mode=GRADING_MODE,
+            max_workers=GRADING_MAX_CONCURRENCY,
+        )
+        return _early_exit_result(refs, relevant, graded, relevanceCheckCount)
 
     # Score each doc
     filtered_docs = []
-    for d in documents:
+    for ref, d in zip(refs, documents):
         score = retrieval_grader.invoke(
             {"question": question, "document": d.page_content}
         )
@@ -152,7 +285,7 @@ def grade_documents(state):
         # Document relevant
         if grade.lower() == "yes":
             print("---GRADE: DOCUMENT RELEVANT---")
-            filtered_docs.append(d)
+            filtered_docs.append(ref)
         # Document not relevant
         else:
             print("---GRADE: DOCUMENT NOT RELEVANT---")
@@ -160,12 +293,75 @@ def grade_documents(state):
             # We set a flag to indicate that we want to run web search
             continue
 
-    return {"documents": filtered_docs, "question": question, "relevanceCheckCount": relevanceCheckCount + 1}
+    return _relevance_result(filtered_docs, relevanceCheckCount)
+
+async def agrade_documents(state):
+    """grade_documents의 비동기 버전. 모든 문서를 abatch로 동시에 평가합니다."""
+    print("---CHECK DOCUMENT RELEVANCE TO QUESTION---")
+    question = state["question"]
+    refs = state["documents"]
+    documents = chunk_store.hydrate(refs)
+    relevanceCheckCount = state.get("relevanceCheckCount", 0)
+
+    _check_relevance_limit(relevanceCheckCount)
+
+    if GRADING_MODE != "all":
+        relevant, graded = await agrade_until_enough(
+            [d.page_content for d in documents],
+            lambda text: retrieval_grader.ainvoke({"question": question, "document": text}),
+            _is_relevant,
+            _enough_context(),
+            mode=GRADING_MODE,
+            max_concurrency=GRADING_MAX_CONCURRENCY,
+        )
+        return _early_exit_result(refs, relevant, graded, relevanceCheckCount)
+
+    scores = await retrieval_grader.abatch(
+        [{"question": question, "document": d.page_content} for d in documents]
+    )
+    filtered_docs = []
+    for ref, score in zip(refs, scores):
+        if score["score"].lower() == "yes":
+            print("---GRADE: DOCUMENT RELEVANT---")
+            filtered_docs.append(ref)
+        else:
+            print("---GRADE: DOCUMENT NOT RELEVANT---")
+
+    return _relevance_result(filtered_docs, relevanceCheckCount)
+
+def _is_relevant(score):
+    return score["score"].lower() == "yes"
+
+def _enough_context():
+    return EnoughContext(EARLY_EXIT_MIN_RELEVANT, EARLY_EXIT_MAX_CONTEXT_TOKENS)
+
+def _early_exit_result(refs, relevant, graded, relevanceCheckCount):
+    """조기 종료 평가 결과를 그래프 상태 업데이트로 만듭니다."""
+    print(f"---GRADE: {len(relevant)} OF {graded} GRADED DOCUMENTS RELEVANT---")
+    if graded < len(refs):
+        print(f"---GRADE: ENOUGH CONTEXT, SKIPPED {len(refs) - graded} OF {len(refs)} DOCUMENTS---")
+    return _relevance_result([refs[i] for i in relevant], relevanceCheckCount)
+
+def _relevance_result(filtered_docs, relevanceCheckCount):
+    """문서 평가 결과를 그래프 상태 업데이트로 만들고, 통과한 웹 검색 결과는 웹 캐시에 저장합니다."""
+    if WEB_WRITEBACK:
+        from web_cache import write_back
+        write_back(chunk_store.hydrate(filtered_docs))
+    return {"documents": filtered_docs, "relevanceCheckCount": relevanceCheckCount + 1}
+
+def _check_relevance_limit(relevanceCheckCount):
+    # 웹 검색 후 최대 2번까지 관련성 검사를 허용 (벡터 검색 1번 + 웹 검색 후 1번)
+    if relevanceCheckCount >= 2:
+        print("---DECISION: MAX RELEVANCE CHECK COUNT REACHED, INCLUDE WEB SEARCH---")
+        raise LoopLimitError("failed: not relevant")
 
 def route_question(state):
     """
     Route question to web search or RAG.
 
+    먼저 로컬 센트로이드 라우터로 판단하고, 신뢰 구간 사이에 있는 질문만
+    LLM 라우터(question_router)로 판단합니다.
+
     Args:
         state (dict): The current graph state
 
@@ -175,15 +371,57 @@ def route_question(state):
     print("---ROUTE QUESTION---")
     question = state["question"]
     print(question)
-    
-    from graders import question_router
-    source = question_router.invoke({"question": question})
-    print(source)
-    print(source["datasource"])
-    if source["datasource"] == "web_search":
+
+    from router import get_router
+    datasource, similarity, topic = get_router().route(question)
+    print(f"센트로이드 유사도: {similarity:.3f} ({topic})")
+
+    if datasource is None:
+        print("---ROUTE QUESTION: UNCERTAIN, ASK LLM ROUTER---")
+        from graders import question_router
+        source = question_router.invoke({"question": question})
+        print(source)
+        datasource = "websearch" if source.get("datasource") == "web_search" else "vectorstore"
+
+    if datasource == "websearch" and WEB_WRITEBACK and _web_cache_hit(question):
+        datasource = "vectorstore"
+    return _route_decision(datasource)
+
+async def aroute_question(state):
+    """route_question의 비동기 버전"""
+    print("---ROUTE QUESTION---")
+    question = state["question"]
+    print(question)
+
+    from router import get_router
+    router = await asyncio.to_thread(get_router)
+    datasource, similarity, topic = await router.aroute(question)
+    print(f"센트로이드 유사도: {similarity:.3f} ({topic})")
+
+    if datasource is None:
+        print("---ROUTE QUESTION: UNCERTAIN, ASK LLM ROUTER---")
+        from graders import question_router
+        source = await question_router.ainvoke({"question": question})
+        print(source)
+        datasource = "websearch" if source.get("datasource") == "web_search" else "vectorstore"
+
+    if datasource == "websearch" and WEB_WRITEBACK and await asyncio.to_thread(_web_cache_hit, question):
+        datasource = "vectorstore"
+    return _route_decision(datasource)
+
+def _web_cache_hit(question):
+    """이전에 저장한 웹 검색 결과 중 이 질문에 쓸 만한 청크가 있는지 확인합니다."""
+    from web_cache import get_web_cache
+    hits = get_web_cache().search(question, k=1)
+    if hits:
+        print(f"---ROUTE QUESTION: WEB CACHE HIT ({hits[0][1]:.3f})---")
+    return bool(hits)
+
+def _route_decision(datasource):
+    if datasource == "websearch":
         print("---ROUTE QUESTION TO WEB SEARCH---")
         return "websearch"
-    elif source["datasource"] == "vectorstore":
+    else:
         print("---ROUTE QUESTION TO RAG---")
         return "vectorstore"
 
@@ -195,7 +433,7 @@ def decide_to_generate(state):
         state (dict): The current graph state
 
     Returns:
-        str: Binary decision "yes" or "no"
+        str: Binary decision "yes" or "no", or "degraded" when the deadline does not allow a retry
     """
     print("---ASSESS DOCUMENTS FOR GENERATION---")
     question = state["question"]
@@ -203,6 +441,10 @@ def decide_to_generate(state):
     
     # documents가 비어있으면 no, 있으면 yes를 반환한다.
     if len(documents) == 0:
+        # 웹 검색 후 다시 평가하고 답변까지 만들 시간이 없으면 지금까지의 결과로 끝낸다
+        if not can_afford(state, "websearch", "grade_documents", "generate"):
+            print("---DECISION: NO DOCUMENTS FOUND, NO TIME LEFT FOR WEB SEARCH---")
+            return "degraded"
         print("---DECISION: NO DOCUMENTS FOUND, INCLUDE WEB SEARCH---")
         return "no"
     else:
@@ -220,38 +462,104 @@ def grade_generation_v_documents_and_question(state):
         str: Decision for next node to call
     """
     print("---CHECK HALLUCINATIONS---")
-    question = state["question"]
-    documents = state["documents"]
+    documents = chunk_store.hydrate(state["documents"])
     generation = state["generation"]
-    hasHallucination = state.get("hasHallucination", False)
     hallucinationCheckCount = state.get("hallucinationCheckCount", 0)
 
-    # 할루시네이션 체크를 최대 2번까지 허용
-    if hallucinationCheckCount >= 2:
-        print("---DECISION: MAX HALLUCINATION CHECK COUNT REACHED, INCLUDE WEB SEARCH---")
-        raise Exception("failed: not hallucination")
+    _check_hallucination_limit(hallucinationCheckCount)
+
+    if HALLUCINATION_CHECK_MODE == "sentence":
+        contexts = [d.page_content for d in documents]
+        verification = verify_sentences(
+            strip_sources(generation),
+            lambda sentence: sentence_grader.invoke({"documents": documents, "sentence": sentence}),
+            _is_relevant,
+            verified=state.get("verifiedSentences"),
+            precheck=(lambda sentences: get_scorer().check("\n".join(sentences), contexts)[1])
+            if GROUNDING_PRECHECK else None,
+            max_workers=SENTENCE_VERIFY_MAX_CONCURRENCY,
+            stats=verification_stats,
+        )
+        return _sentence_result(state, verification)
+
+    # 로컬 사전 검사로 근거가 명확하면 LLM 평가를 생략
+    if GROUNDING_PRECHECK:
+        grounded, _ = get_scorer().check(strip_sources(generation), [d.page_content for d in documents])
+        if grounded:
+            print("---PRECHECK: ALL SENTENCES GROUNDED, SKIP LLM GRADER---")
+            return _hallucination_result(state, "yes")
 
     score = hallucination_grader.invoke(
         {"documents": documents, "generation": generation}
     )
-    grade = score["score"]
+    return _hallucination_result(state, score["score"])
+
+async def agrade_generation_v_documents_and_question(state):
+    """grade_generation_v_documents_and_question의 비동기 버전"""
+    print("---CHECK HALLUCINATIONS---")
+    _check_hallucination_limit(state.get("hallucinationCheckCount", 0))
+    documents = chunk_store.hydrate(state["documents"])
+
+    if HALLUCINATION_CHECK_MODE == "sentence":
+        contexts = [d.page_content for d in documents]
+
+        async def precheck(sentences):
+            return (await get_scorer().acheck("\n".join(sentences), contexts))[1]
+
+        verification = await averify_sentences(
+            strip_sources(state["generation"]),
+            lambda sentence: sentence_grader.ainvoke({"documents": documents, "sentence": sentence}),
+            _is_relevant,
+            verified=state.get("verifiedSentences"),
+            precheck=precheck if GROUNDING_PRECHECK else None,
+            max_concurrency=SENTENCE_VERIFY_MAX_CONCURRENCY,
+            stats=verification_stats,
+        )
+        return _sentence_result(state, verification)
+
+    if GROUNDING_PRECHECK:
+        grounded, _ = await get_scorer().acheck(
+            strip_sources(state["generation"]), [d.page_content for d in documents]
+        )
+        if grounded:
+            print("---PRECHECK: ALL SENTENCES GROUNDED, SKIP LLM GRADER---")
+            return _hallucination_result(state, "yes")
+
+    score = await hallucination_grader.ainvoke(
+        {"documents": documents, "generation": state["generation"]}
+    )
+    return _hallucination_result(state, score["score"])
+
+def _check_hallucination_limit(hallucinationCheckCount):
+    # 할루시네이션 체크를 최대 2번까지 허용
+    if hallucinationCheckCount >= 2:
+        print("---DECISION: MAX HALLUCINATION CHECK COUNT REACHED, INCLUDE WEB SEARCH---")
+        raise LoopLimitError("failed: not hallucination")
+
+def _sentence_result(state, verification):
+    """문장 검증 결과를 상태 업데이트로 만듭니다. 근거 없는 문장은 다음 generate에서 수정됩니다."""
+    for sentence in verification.unsupported_sentences:
+        print(f"---UNSUPPORTED SENTENCE: {sentence[:80]}---")
+    return {
+        **_hallucination_result(state, "yes" if verification.grounded else "no"),
+        "verifiedSentences": verification.supported_sentences,
+        "unsupportedSentences": verification.unsupported_sentences,
+    }
+
+def _hallucination_result(state, grade):
+    """할루시네이션 평가 결과를 그래프 상태 업데이트로 만듭니다. (바뀌는 키만 반환)"""
+    hallucinationCheckCount = state.get("hallucinationCheckCount", 0)
 
     # Check hallucination
     if grade == "yes":
         print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
         return {
-            "question": question,
-            "documents": documents,
-            "generation": generation,
             "hasHallucination": False, 
             "hallucinationCheckCount": hallucinationCheckCount
         }
     else:
         print("---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS, RE-TRY---")
         return {
-            "question": question,
-            "documents": documents,
-            "generation": generation,
             "hasHallucination": True, 
             "hallucinationCheckCount": hallucinationCheckCount + 1
         }
@@ -264,8 +572,26 @@ def decide_to_print(state):
     # hasHallucination이 False이면 출력한다.
     hasHallucination = state.get("hasHallucination", False)
     if hasHallucination:
+        # 재생성과 재평가를 할 시간이 없으면 현재 답변을 degraded로 반환한다
+        if not can_afford(state, "generate", "grade_generation"):
+            print("---DECISION: HAS HALLUCINATION, NO TIME LEFT TO RE-GENERATE---")
+            return "degraded"
         print("---DECISION: HAS HALLUCINATION, RE-GENERATE---")
         return "no"
     else:
         print("---DECISION: NO HALLUCINATION, PRINT ANSWER---")
-        return "yes"
\ No newline at end of file
+        return "yes"
+
+def finalize_degraded(state):
+    """
+    마감 시간 때문에 재시도를 건너뛰고 지금까지의 최선의 답변을 반환합니다.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): generation과 degraded 플래그
+    """
+    print("---DEADLINE: RETURN BEST ANSWER SO FAR---")
+    generation = state.get("generation") or "시간 제한 내에 답변을 생성하지 못했습니다."
+    return {"generation": generation, "degraded": True}
\ No newline at end of file
@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, List
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from config import PARENT_STORE_PATH, PARENT_K, PARENT_CANDIDATES, PARENT_MAX_TOKENS
+
+class ParentStore:
+    """
+    부모 섹션 저장소 (SQLite)
+
+    부모마다 메타데이터와 자식 청크 목록 [(본문, 토큰 수), ...]을 순서대로 저장합니다.
+    검색은 작은 자식 청크로 하고, 답변 생성과 평가에는 이 목록으로 만든 부모 윈도우를 씁니다.
+    """
+
+    def __init__(self, path=PARENT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parents (id TEXT PRIMARY KEY, metadata TEXT, children TEXT)"
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM parents")
+            self._conn.commit()
+
+    def put_many(self, parents):
+        """
+        Args:
+            parents (list): (parent_id, metadata, [(본문, 토큰 수), ...]) 튜플 목록
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO parents VALUES (?, ?, ?)",
+                [
+                    (id_, json.dumps(metadata, ensure_ascii=False), json.dumps(children, ensure_ascii=False))
+                    for id_, metadata, children in parents
+                ],
+            )
+            self._conn.commit()
+
+    def get_many(self, ids):
+        """parent_id → (metadata, children). 없는 id는 결과에서 빠집니다."""
+        ids = list(ids)
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, metadata, children FROM parents WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {id_: (json.loads(metadata), json.loads(children)) for id_, metadata, children in rows}
+
+_parent_store = None
+_parent_store_lock = threading.Lock()
+
+def get_parent_store():
+    """프로세스에서 공유하는 ParentStore를 반환합니다."""
+    global _parent_store
+    with _parent_store_lock:
+        if _parent_store is None:
+            _parent_store = ParentStore()
+        return _parent_store
+
+def merge_window(children, hits, max_tokens):
+    """
+    한 부모 안에서 검색에 걸린 자식들을 포함하는 연속 구간을 고릅니다.
+
+    가장 점수가 높은 자식에서 시작해, 다음으로 점수가 높은 자식까지 구간을 넓혀도
+    max_tokens를 넘지 않으면 넓힙니다. 그 뒤 남은 예산만큼 앞뒤 이웃 자식을 덧붙입니다.
+
+    Args:
+        children (list): 부모의 자식 청크 [(본문, 토큰 수), ...]
+        hits (list): 점수 내림차순 자식 위치 목록
+        max_tokens (int): 윈도우 최대 토큰 수
+
+    Returns:
+        tuple: (시작 위치, 끝 위치(포함), 윈도우에 포함된 hit 수)
+    """
+    tokens = [count for _, count in children]
+    start = end = hits[0]
+    size = tokens[start]
+    included = 1
+
+    for hit in hits[1:]:
+        new_start, new_end = min(start, hit), max(end, hit)
+        new_size = sum(tokens[new_start:new_end + 1])
+        if new_size <= max_tokens:
+            start, end, size = new_start, new_end, new_size
+            included += 1
+        elif start <= hit <= end:
+            included += 1
+
+    # 남은 예산으로 앞뒤 문맥을 번갈아 덧붙인다
+    grew = True
+    while grew:
+        grew = False
+        if end + 1 < len(tokens) and size + tokens[end + 1] <= max_tokens:
+            end += 1
+            size += tokens[end]
+            grew = True
+        if start > 0 and size + tokens[start - 1] <= max_tokens:
+            start -= 1
+            size += tokens[start]
+            grew = True
+    return start, end, included
+
+class ParentWindowRetriever(BaseRetriever):
+    """
+    작은 자식 청크로 검색하고, 부모 섹션별로 묶어 병합한 윈도우를 반환하는 리트리버
+
+    같은 섹션의 조각 여러 개 대신 윈도우 하나를 돌려주므로 문서 평가 LLM 호출 수가 줄고,
+    생성기는 끊기지 않은 문맥을 받습니다. parent_id가 없는 청크(부모 없이 만든 인덱스)는 그대로 반환합니다.
+    """
+
+    vectorstore: VectorStore
+    parent_store: Any
+    k: int = PARENT_K
+    candidates: int = PARENT_CANDIDATES
+    max_tokens: int = PARENT_MAX_TOKENS
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        scored = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.candidates)
+
+        # 점수순을 유지한 채 부모별로 묶는다 (부모 순서 = 가장 높은 자식 점수 순)
+        groups = {}
+        for doc, score in scored:
+            key = doc.metadata.get("parent_id") or id(doc)
+            groups.setdefault(key, []).append((doc, score))
+        selected = list(groups.items())[:self.k]
+
+        parents = self.parent_store.get_many(key for key, _ in selected if isinstance(key, str))
+        results = []
+        for key, hits in selected:
+            best_doc, best_score = hits[0]
+            if key not in parents:
+                best_doc.metadata["relevance_score"] = best_score
+                results.append(best_doc)
+                continue
+
+            metadata, children = parents[key]
+            start, end, included = merge_window(
+                children, [doc.metadata["child_index"] for doc, _ in hits], self.max_tokens
+            )
+            results.append(Document(
+                page_content="\n".join(text for text, _ in children[start:end + 1]),
+                metadata={
+                    **metadata,
+                    "parent_id": key,
+                    "child_start": start,
+                    "child_end": end,
+                    "matched_children": included,
+                    "relevance_score": best_score,
+                },
+            ))
+
+        print(f"부모 문서 검색: 자식 {len(scored)}개 → 부모 윈도우 {len(results)}개")
+        return results
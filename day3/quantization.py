@@ -0,0 +1,174 @@
+import json
+import math
+import os
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from config import QUANTIZATION_RESCORE_FACTOR
+
+# 한 번에 float로 복원해 점수를 계산할 행 수 (메모리 사용량 상한)
+_BLOCK_ROWS = 65536
+
+def normalize(vectors):
+    """벡터를 단위 길이로 정규화합니다."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def truncate_dimensions(vectors, dimensions):
+    """
+    앞쪽 dimensions개 차원만 남기고 다시 정규화합니다.
+    text-embedding-3 계열에서 dimensions 파라미터로 받은 임베딩과 같은 결과입니다.
+    """
+    return normalize(np.asarray(vectors, dtype=np.float32)[..., :dimensions])
+
+class Int8Index:
+    """
+    차원별 스칼라 양자화(int8) 인덱스
+
+    각 차원의 최솟값/최댓값 범위를 256단계로 나눠 저장하므로 float32 대비 메모리가 1/4입니다.
+    근사 점수로 후보를 고른 뒤 float 벡터(보통 디스크의 memmap)로 후보만 재채점합니다.
+    """
+
+    def __init__(self, codes, offset, scale, float_vectors=None):
+        self.codes = codes
+        self.offset = offset
+        self.scale = scale
+        self.float_vectors = float_vectors
+
+    @classmethod
+    def build(cls, vectors, float_vectors=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        scale = np.maximum(high - low, 1e-12) / 255.0
+        codes = (np.round((vectors - low) / scale) - 128).astype(np.int8)
+        return cls(codes, low, scale, float_vectors)
+
+    @property
+    def nbytes(self):
+        """메모리에 상주하는 인덱스 크기 (재채점용 float 벡터 제외)"""
+        return self.codes.nbytes + self.offset.nbytes + self.scale.nbytes
+
+    def vector(self, row):
+        """row번째 벡터. 재채점용 float 벡터가 없으면 int8 코드에서 복원합니다."""
+        if self.float_vectors is not None:
+            return np.asarray(self.float_vectors[row], dtype=np.float32)
+        return (self.codes[row].astype(np.float32) + 128.0) * self.scale + self.offset
+
+    def approximate_scores(self, query):
+        """q·v ≈ q·offset + (q*scale)·(code+128) 로 복원 없이 내적을 근사합니다."""
+        query = np.asarray(query, dtype=np.float32)
+        bias = float(query @ self.offset) + 128.0 * float((query * self.scale).sum())
+        weights = query * self.scale
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), _BLOCK_ROWS):
+            block = self.codes[start:start + _BLOCK_ROWS].astype(np.float32)
+            scores[start:start + _BLOCK_ROWS] = block @ weights + bias
+        return scores
+
+    def search(self, query, k, rescore_k=None):
+        """
+        근사 점수로 rescore_k개 후보를 고르고 float 벡터로 재채점해 top-k를 반환합니다.
+
+        Returns:
+            list: (행 번호, 코사인 유사도) 튜플 목록, 유사도 내림차순
+        """
+        scores = self.approximate_scores(query)
+        rescore_k = min(len(scores), max(k, rescore_k or k))
+        candidates = np.argpartition(-scores, rescore_k - 1)[:rescore_k]
+
+        if self.float_vectors is not None:
+            # 후보 행만 디스크에서 읽어 정확한 점수로 바꾼다
+            order = np.sort(candidates)
+            exact = np.asarray(self.float_vectors[order], dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+            candidates, candidate_scores = order, exact
+        else:
+            candidate_scores = scores[candidates]
+
+        best = np.argsort(-candidate_scores)[:k]
+        return [(int(candidates[i]), float(candidate_scores[i])) for i in best]
+
+    def save(self, path):
+        np.savez(f"{path}.npz", codes=self.codes, offset=self.offset, scale=self.scale)
+
+    @classmethod
+    def load(cls, path, float_vectors=None):
+        data = np.load(f"{path}.npz")
+        return cls(data["codes"], data["offset"], data["scale"], float_vectors)
+
+class QuantizedVectorStore(VectorStore):
+    """
+    int8 양자화 인덱스로 검색하는 읽기 전용 벡터스토어
+
+    관련도 점수는 Chroma(l2)와 같은 식으로 계산해 RETRIEVAL_SCORE_THRESHOLD를 그대로 쓸 수 있습니다.
+    """
+
+    def __init__(self, documents, index, embedding, rescore_factor=QUANTIZATION_RESCORE_FACTOR):
+        self.documents = documents
+        self.index = index
+        self.embedding = embedding
+        self.rescore_factor = rescore_factor
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def embedded_chunks(self):
+        """(메타데이터, 임베딩) 쌍을 순회합니다."""
+        for row, doc in enumerate(self.documents):
+            yield doc.metadata, self.index.vector(row)
+
+    def similarity_search_with_relevance_scores(self, query, k=4, **kwargs):
+        query_vector = normalize(self.embedding.embed_query(query))
+        hits = self.index.search(query_vector, k, rescore_k=k * self.rescore_factor)
+        # 정규화된 벡터의 제곱 L2 거리 = 2 - 2cos, Chroma의 관련도 함수와 동일하게 변환
+        return [(self.documents[row], 1.0 - (2.0 - 2.0 * score) / math.sqrt(2)) for row, score in hits]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k, **kwargs)]
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise TypeError("QuantizedVectorStore는 읽기 전용입니다. 원본 벡터스토어에서 다시 빌드하세요.")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = normalize(embedding.embed_documents(texts))
+        documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        return cls(documents, Int8Index.build(vectors, vectors), embedding)
+
+    @classmethod
+    def build(cls, vectorstore, path):
+        """
+        Chroma(또는 샤딩된) 벡터스토어의 임베딩으로 인덱스를 만들어 path에 저장합니다.
+        재채점용 float 벡터는 메모리에 올리지 않도록 memmap 파일로 저장합니다.
+        """
+        documents, vectors = [], []
+        for store in getattr(vectorstore, "shards", [vectorstore]):
+            data = store._collection.get(include=["embeddings", "metadatas", "documents"])
+            for text, metadata, vector in zip(data["documents"], data["metadatas"], data["embeddings"]):
+                documents.append(Document(page_content=text, metadata=metadata or {}))
+                vectors.append(vector)
+        vectors = normalize(vectors)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        float_vectors = np.lib.format.open_memmap(f"{path}.f32.npy", mode="w+", dtype=np.float32, shape=vectors.shape)
+        float_vectors[:] = vectors
+        float_vectors.flush()
+
+        index = Int8Index.build(vectors)
+        index.save(path)
+        with open(f"{path}.docs.jsonl", "w", encoding="utf-8") as f:
+            for doc in documents:
+                f.write(json.dumps([doc.page_content, doc.metadata], ensure_ascii=False) + "\n")
+        return cls.load(path, vectorstore.embeddings)
+
+    @classmethod
+    def load(cls, path, embedding):
+        """저장된 인덱스를 엽니다. float 벡터는 memmap으로 필요한 행만 읽습니다."""
+        float_vectors = np.load(f"{path}.f32.npy", mmap_mode="r")
+        index = Int8Index.load(path, float_vectors)
+        with open(f"{path}.docs.jsonl", encoding="utf-8") as f:
+            documents = [Document(page_content=text, metadata=metadata) for text, metadata in map(json.loads, f)]
+        return cls(documents, index, embedding)
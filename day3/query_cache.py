@@ -0,0 +1,161 @@
+"""
+질문 임베딩과 검색 결과 캐시
+
+같은 질문(정규화 후)을 다시 검색하면 임베딩 API를 부르지 않고 이전 결과를 씁니다.
+- 질문 임베딩: (임베딩 모델, 정규화된 질문)으로 캐시. 인덱스와 무관하므로 재구축 후에도 유지됩니다.
+- 검색 결과: (정규화된 질문, 임베딩 모델, 인덱스 버전)으로 캐시. 인덱스를 다시 만들면 버전이 바뀌어
+  이전 결과는 더 이상 맞지 않습니다.
+"""
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from singleflight import normalize_question
+
+class LRUCache:
+    """
+    스레드 안전한 LRU 캐시
+
+    Attributes:
+        maxsize: 최대 항목 수
+        hits, misses, evictions: 조회/제거 지표
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """값을 반환합니다. 없으면 None."""
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+class CachedQueryEmbeddings(Embeddings):
+    """embed_query 결과를 (모델, 정규화된 질문)으로 캐시합니다. embed_documents는 그대로 호출합니다."""
+
+    def __init__(self, inner, model_name, cache=None):
+        self.inner = inner
+        self.model_name = model_name
+        self.cache = cache if cache is not None else LRUCache(4096)
+
+    def _key(self, text):
+        return self.model_name, normalize_question(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.inner.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = await self.inner.aembed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+class CachedRetriever(BaseRetriever):
+    """
+    리트리버 결과를 (정규화된 질문, 임베딩 모델, 인덱스 버전)으로 캐시합니다.
+    노드가 메타데이터를 고쳐도 캐시가 오염되지 않도록 저장할 때와 꺼낼 때 Document를 복사합니다.
+    """
+
+    retriever: BaseRetriever
+    cache: Any
+    model_name: str
+    version: Callable[[], Any]
+
+    def _key(self, query):
+        return normalize_question(query), self.model_name, self.version()
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = self._key(query)
+        documents = self.cache.get(key)
+        if documents is None:
+            documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+            self.cache.put(key, copy.deepcopy(documents))
+            return documents
+        return copy.deepcopy(documents)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = self._key(query)
+        documents = self.cache.get(key)
+        if documents is None:
+            documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+            self.cache.put(key, copy.deepcopy(documents))
+            return documents
+        return copy.deepcopy(documents)
+
+def index_version(path):
+    """인덱스 버전 표식 파일의 수정 시각 (없으면 0). 다른 프로세스가 인덱스를 다시 만들어도 바뀝니다."""
+    try:
+        return os.stat(path).st_mtime_ns if path else 0
+    except FileNotFoundError:
+        return 0
+
+def bump_index_version(path):
+    """인덱스를 다시 만들거나 동기화한 뒤 호출해 버전을 올립니다."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # 파일 시스템 시각 해상도 안에서 연달아 올려도 버전이 바뀌도록 수정 시각을 직접 지정한다
+    version = max(time.time_ns(), index_version(path) + 1)
+    with open(path, "w") as f:
+        f.write(str(version))
+    os.utime(path, ns=(version, version))
+    return version
@@ -0,0 +1,95 @@
+from typing import List
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from query_cache import CachedRetriever, LRUCache, index_version, bump_index_version
+from config import (
+    RETRIEVAL_MODE, RETRIEVAL_K, RETRIEVAL_MIN_K, RETRIEVAL_MAX_K,
+    RETRIEVAL_SCORE_THRESHOLD, RETRIEVAL_KNEE_GAP, PARENT_RETRIEVAL,
+    QUERY_CACHE_ENABLED, QUERY_RESULT_CACHE_SIZE, INDEX_VERSION_PATH, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS
+)
+
+# 검색 결과 캐시. 노드마다 리트리버를 새로 만들므로 프로세스 전역으로 둔다
+_result_cache = LRUCache(QUERY_RESULT_CACHE_SIZE)
+
+def select_adaptive(scored, mode=RETRIEVAL_MODE, min_k=RETRIEVAL_MIN_K, max_k=RETRIEVAL_MAX_K,
+                    score_threshold=RETRIEVAL_SCORE_THRESHOLD, knee_gap=RETRIEVAL_KNEE_GAP):
+    """
+    점수순으로 정렬된 (문서, 점수) 목록에서 실제로 관련 있는 만큼만 고릅니다.
+
+    Args:
+        scored (list): (Document, relevance score) 튜플 목록, 점수 내림차순
+        mode (str): "threshold" 또는 "knee"
+        min_k (int): 최소 반환 개수
+        max_k (int): 최대 반환 개수
+        score_threshold (float): 관련도 점수 컷오프
+        knee_gap (float): knee로 판단할 인접 점수 차이
+
+    Returns:
+        list: 선택된 (Document, score) 튜플 목록
+    """
+    scored = scored[:max_k]
+    count = sum(1 for _, score in scored if score >= score_threshold)
+
+    if mode == "knee":
+        # 컷오프를 통과한 범위 안에서 점수가 크게 떨어지는 첫 지점에서 자른다
+        for i in range(max(min_k, 1), count):
+            if scored[i - 1][1] - scored[i][1] >= knee_gap:
+                count = i
+                break
+
+    return scored[:max(min_k, count)]
+
+class AdaptiveRetriever(BaseRetriever):
+    """유사도 점수에 따라 반환 개수가 달라지는 리트리버"""
+
+    vectorstore: VectorStore
+    mode: str = RETRIEVAL_MODE
+    min_k: int = RETRIEVAL_MIN_K
+    max_k: int = RETRIEVAL_MAX_K
+    score_threshold: float = RETRIEVAL_SCORE_THRESHOLD
+    knee_gap: float = RETRIEVAL_KNEE_GAP
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        scored = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.max_k)
+        selected = select_adaptive(
+            scored, self.mode, self.min_k, self.max_k, self.score_threshold, self.knee_gap
+        )
+        for doc, score in selected:
+            doc.metadata["relevance_score"] = score
+        print(f"적응형 검색: 후보 {len(scored)}개 중 {len(selected)}개 선택 ({self.mode})")
+        return [doc for doc, _ in selected]
+
+def build_retriever(vectorstore, mode=RETRIEVAL_MODE):
+    """설정된 검색 모드에 맞는 리트리버를 만듭니다. QUERY_CACHE_ENABLED이면 결과를 캐시합니다."""
+    if PARENT_RETRIEVAL:
+        from parent_retrieval import ParentWindowRetriever, get_parent_store
+        retriever = ParentWindowRetriever(vectorstore=vectorstore, parent_store=get_parent_store())
+    elif mode == "fixed":
+        retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+    else:
+        retriever = AdaptiveRetriever(vectorstore=vectorstore, mode=mode)
+    if not QUERY_CACHE_ENABLED:
+        return retriever
+    return CachedRetriever(
+        retriever=retriever,
+        cache=_result_cache,
+        model_name=f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}" if EMBEDDING_DIMENSIONS else EMBEDDING_MODEL,
+        version=lambda: index_version(INDEX_VERSION_PATH),
+    )
+
+def invalidate_query_cache():
+    """벡터스토어를 다시 만들거나 동기화한 뒤 호출합니다. 인덱스 버전을 올리고 검색 결과 캐시를 비웁니다."""
+    bump_index_version(INDEX_VERSION_PATH)
+    _result_cache.clear()
+
+def query_cache_stats():
+    """검색 결과 캐시와 질문 임베딩 캐시의 적중 지표"""
+    from models import embeddings
+    stats = {"results": _result_cache.stats()}
+    if hasattr(embeddings, "cache"):
+        stats["embeddings"] = embeddings.cache.stats()
+    return stats
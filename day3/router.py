@@ -0,0 +1,118 @@
+import numpy as np
+from models import embeddings
+from config import ROUTER_CENTROIDS_PER_TOPIC, ROUTER_HIGH_THRESHOLD, ROUTER_LOW_THRESHOLD
+
+def _normalize(matrix):
+    """행 벡터들을 단위 길이로 정규화합니다."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def _spherical_kmeans(vectors, k, iterations=10):
+    """코사인 유사도 기반 k-means로 센트로이드를 구합니다. (초기값이 고정이라 결과가 결정적)"""
+    k = min(k, len(vectors))
+    # 문서 순서상 고르게 떨어진 청크로 초기화
+    centroids = vectors[np.linspace(0, len(vectors) - 1, k).astype(int)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(k):
+            members = vectors[assignment == i]
+            if len(members):
+                centroids[i] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+def _embedded_chunks(vectorstore):
+    """벡터스토어의 (메타데이터, 임베딩) 쌍을 순회합니다."""
+    if hasattr(vectorstore, "embedded_chunks"):
+        yield from vectorstore.embedded_chunks()
+        return
+    # 샤딩된 벡터스토어면 모든 샤드의 임베딩을 모은다
+    for store in getattr(vectorstore, "shards", [vectorstore]):
+        data = store._collection.get(include=["embeddings", "metadatas"])
+        yield from zip(data["metadatas"], data["embeddings"])
+
+class CentroidRouter:
+    """
+    질문 임베딩을 코퍼스의 토픽 센트로이드와 비교해 LLM 호출 없이 라우팅합니다.
+
+    Attributes:
+        topics: 센트로이드별 토픽 이름 (출처 URL)
+        centroids: 정규화된 센트로이드 행렬
+    """
+
+    def __init__(self, topics, centroids, high_threshold=ROUTER_HIGH_THRESHOLD, low_threshold=ROUTER_LOW_THRESHOLD):
+        self.topics = topics
+        self.centroids = centroids
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, group_key="source", per_topic=ROUTER_CENTROIDS_PER_TOPIC):
+        """
+        인덱싱된 청크 임베딩을 출처별로 묶어 센트로이드를 만듭니다.
+        스냅샷/int8 인덱스처럼 embedded_chunks()가 있는 벡터스토어는 Chroma를 열지 않고 자체 행렬을 씁니다.
+        """
+        groups = {}
+        for metadata, vector in _embedded_chunks(vectorstore):
+            topic = (metadata or {}).get(group_key, "unknown")
+            groups.setdefault(topic, []).append(vector)
+
+        topics, centroids = [], []
+        for topic in sorted(groups):
+            vectors = _normalize(np.asarray(groups[topic], dtype=np.float32))
+            for centroid in _spherical_kmeans(vectors, per_topic):
+                topics.append(topic)
+                centroids.append(centroid)
+        return cls(topics, np.vstack(centroids))
+
+    def score(self, question):
+        """질문과 가장 가까운 토픽과 유사도를 반환합니다."""
+        query = _normalize(np.asarray(embeddings.embed_query(question), dtype=np.float32))
+        similarities = self.centroids @ query
+        best = int(np.argmax(similarities))
+        return self.topics[best], float(similarities[best])
+
+    async def ascore(self, question):
+        """score의 비동기 버전"""
+        query = _normalize(np.asarray(await embeddings.aembed_query(question), dtype=np.float32))
+        similarities = self.centroids @ query
+        best = int(np.argmax(similarities))
+        return self.topics[best], float(similarities[best])
+
+    def route(self, question):
+        """
+        질문을 라우팅합니다.
+
+        Returns:
+            tuple: ("vectorstore" | "websearch" | None, 유사도, 토픽)
+                   None이면 신뢰 구간 사이라 LLM 라우터로 판단해야 함
+        """
+        topic, similarity = self.score(question)
+        return self._decide(similarity), similarity, topic
+
+    async def aroute(self, question):
+        """route의 비동기 버전"""
+        topic, similarity = await self.ascore(question)
+        return self._decide(similarity), similarity, topic
+
+    def _decide(self, similarity):
+        if similarity >= self.high_threshold:
+            return "vectorstore"
+        if similarity <= self.low_threshold:
+            return "websearch"
+        return None
+
+_router = None
+
+def get_router():
+    """검색에 쓰는 벡터스토어(스냅샷, int8 인덱스 또는 Chroma)로부터 라우터를 한 번만 생성해 재사용합니다."""
+    global _router
+    if _router is None:
+        from document_loader import open_active_vectorstore
+        _router = CentroidRouter.from_vectorstore(open_active_vectorstore())
+    return _router
+
+def reset_router():
+    """벡터스토어를 다시 만든 뒤 센트로이드를 다시 계산하도록 캐시를 비웁니다."""
+    global _router
+    _router = None
@@ -0,0 +1,224 @@
+"""
+실행 스케줄러 (admission control + 우선순위 큐)
+
+대화형 요청과 배치 평가 작업이 같은 그래프를 함께 쓸 때, 실행을 우선순위 클래스별로 나눠
+전체 동시 실행 수와 클래스별 동시 실행 한도(quota) 안에서만 시작시킵니다.
+자리가 없으면 클래스별 큐에서 기다리고, 큐가 가득 차면 QueueFullError로 바로 거절합니다.
+자리가 나면 우선순위가 높은(숫자가 작은) 클래스의 가장 오래 기다린 요청부터 시작합니다.
+
+사용법:
+    scheduler = ExecutionScheduler({
+        "interactive": {"priority": 0, "max_concurrency": 8, "max_queue": 32},
+        "batch": {"priority": 1, "max_concurrency": 2, "max_queue": 256},
+    }, max_concurrency=8)
+    result = scheduler.run(lambda: app.invoke(inputs), priority="batch")
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+import numpy as np
+
+class QueueFullError(RuntimeError):
+    """클래스 큐가 가득 차 요청을 거절했을 때 발생합니다. 호출자는 나중에 다시 시도해야 합니다."""
+
+    def __init__(self, priority, depth):
+        super().__init__(f"'{priority}' 큐가 가득 찼습니다 (대기 {depth}개). 잠시 후 다시 시도해주세요.")
+        self.priority = priority
+        self.depth = depth
+
+class ClassStats:
+    """
+    우선순위 클래스 하나의 지표
+
+    Attributes:
+        submitted: 들어온 요청 수
+        rejected: 큐가 가득 차 거절한 수
+        completed / failed: 실행을 마친 수 / 예외로 끝난 수
+        running: 실행 중인 수
+        queued: 큐에서 기다리는 수 (큐 깊이)
+        max_queued: 관측된 최대 큐 깊이
+    """
+
+    def __init__(self, window=1000):
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+        self.queued = 0
+        self.max_queued = 0
+        self._waits = deque(maxlen=window)
+
+    def as_dict(self):
+        waits = np.asarray(self._waits) if self._waits else None
+        return {
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "wait_mean": float(waits.mean()) if waits is not None else 0.0,
+            "wait_p50": float(np.quantile(waits, 0.5)) if waits is not None else 0.0,
+            "wait_p95": float(np.quantile(waits, 0.95)) if waits is not None else 0.0,
+        }
+
+class _Waiter:
+    """큐에서 기다리는 요청. 동기 호출은 Event, 비동기 호출은 Future로 깨운다."""
+
+    def __init__(self, loop=None):
+        self.enqueued = time.perf_counter()
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+class ExecutionScheduler:
+    """
+    우선순위 클래스별 동시 실행 한도와 유한 큐를 갖는 실행 스케줄러
+
+    Args:
+        classes (dict): 클래스 이름 → {"priority": 작을수록 먼저, "max_concurrency": 클래스 동시 실행 한도,
+                        "max_queue": 클래스 큐 길이 (0이면 자리가 없을 때 바로 거절)}
+        max_concurrency (int): 모든 클래스를 합친 동시 실행 수
+        default_class (str): priority를 지정하지 않은 요청의 클래스 (None이면 우선순위가 가장 높은 클래스)
+
+    동기 호출(run)과 비동기 호출(arun)이 같은 스케줄러를 함께 쓸 수 있습니다.
+    """
+
+    def __init__(self, classes, max_concurrency, default_class=None):
+        self.classes = {name: dict(spec) for name, spec in classes.items()}
+        self.order = sorted(self.classes, key=lambda name: self.classes[name]["priority"])
+        self.max_concurrency = max_concurrency
+        self.default_class = default_class or self.order[0]
+        self.stats = {name: ClassStats() for name in self.classes}
+        self._queues = {name: deque() for name in self.classes}
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def _class(self, priority):
+        priority = priority or self.default_class
+        if priority not in self.classes:
+            raise ValueError(f"알 수 없는 우선순위 클래스입니다: {priority}")
+        return priority
+
+    def _has_slot(self, name):
+        return (
+            self._running < self.max_concurrency
+            and self.stats[name].running < self.classes[name]["max_concurrency"]
+        )
+
+    def _start(self, name, waited):
+        stats = self.stats[name]
+        stats.running += 1
+        stats._waits.append(waited)
+        self._running += 1
+
+    def _admit(self, name, loop=None):
+        """
+        자리가 있으면 바로 시작하고 None을, 없으면 큐에 넣고 _Waiter를 반환합니다.
+        자리가 날 때마다 _dispatch가 큐를 비우므로, 큐에 남은 요청은 모두 자리가 없어 기다리는 중이고
+        새 요청이 바로 시작해도 새치기가 되지 않습니다.
+        """
+        with self._lock:
+            stats = self.stats[name]
+            stats.submitted += 1
+            if self._has_slot(name):
+                self._start(name, 0.0)
+                return None
+            queue = self._queues[name]
+            if len(queue) >= self.classes[name]["max_queue"]:
+                stats.rejected += 1
+                raise QueueFullError(name, len(queue))
+            waiter = _Waiter(loop)
+            queue.append(waiter)
+            stats.queued = len(queue)
+            stats.max_queued = max(stats.max_queued, stats.queued)
+            return waiter
+
+    def _dispatch(self):
+        """빈 자리에 우선순위 순으로 기다리는 요청을 시작시킵니다. 락을 잡은 상태로 호출합니다."""
+        while self._running < self.max_concurrency:
+            name = next((n for n in self.order if self._queues[n] and self._has_slot(n)), None)
+            if name is None:
+                return
+            waiter = self._queues[name].popleft()
+            self.stats[name].queued = len(self._queues[name])
+            self._start(name, time.perf_counter() - waiter.enqueued)
+            waiter.wake()
+
+    def _release(self, name, failed):
+        with self._lock:
+            stats = self.stats[name]
+            stats.running -= 1
+            if failed:
+                stats.failed += 1
+            else:
+                stats.completed += 1
+            self._running -= 1
+            self._dispatch()
+
+    def _abandon(self, name, waiter):
+        """기다리다 취소된 요청을 정리합니다. 이미 시작 처리됐으면 자리를 돌려줍니다."""
+        with self._lock:
+            queue = self._queues[name]
+            if waiter in queue:
+                queue.remove(waiter)
+                self.stats[name].queued = len(queue)
+                return
+        self._release(name, failed=True)
+
+    def run(self, fn, priority=None):
+        """자리가 날 때까지 기다렸다가 fn()을 실행합니다. 큐가 가득 차면 QueueFullError."""
+        name = self._class(priority)
+        waiter = self._admit(name)
+        if waiter is not None:
+            waiter.event.wait()
+        failed = True
+        try:
+            result = fn()
+            failed = False
+            return result
+        finally:
+            self._release(name, failed)
+
+    async def arun(self, fn, priority=None):
+        """run의 비동기 버전. fn은 코루틴을 반환합니다."""
+        name = self._class(priority)
+        waiter = self._admit(name, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                self._abandon(name, waiter)
+                raise
+        failed = True
+        try:
+            result = await fn()
+            failed = False
+            return result
+        finally:
+            self._release(name, failed)
+
+    def queue_depth(self):
+        """클래스별 현재 큐 깊이"""
+        with self._lock:
+            return {name: len(queue) for name, queue in self._queues.items()}
+
+    def metrics(self):
+        """클래스별 지표 (큐 깊이, 대기 시간 평균/p50/p95, 거절 수 등)와 전체 실행 중 수"""
+        with self._lock:
+            classes = {name: self.stats[name].as_dict() for name in self.order}
+            running = self._running
+        return {"running": running, "max_concurrency": self.max_concurrency, "classes": classes}
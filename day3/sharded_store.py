@@ -0,0 +1,111 @@
+import hashlib
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from langchain_community.vectorstores import Chroma
+from langchain_core.vectorstores import VectorStore
+
+# 모든 ShardedVectorStore 인스턴스가 함께 쓰는 샤드 검색 풀 (인스턴스마다 만들면 풀이 쌓인다)
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="shard")
+
+class ShardedVectorStore(VectorStore):
+    """
+    청크를 여러 Chroma 컬렉션(샤드)에 나누어 저장하는 벡터스토어
+
+    질문 임베딩은 한 번만 계산하고 모든 샤드를 병렬로 검색한 뒤 점수순으로 top-k를 합칩니다.
+    VectorStore를 상속하므로 as_retriever()와 적응형 리트리버를 그대로 사용할 수 있습니다.
+    """
+
+    def __init__(self, collection_prefix, num_shards, embedding, persist_directory=None, shard_key="source"):
+        self.collection_prefix = collection_prefix
+        self.num_shards = num_shards
+        self.embedding = embedding
+        self.persist_directory = persist_directory
+        self.shard_key = shard_key
+        self.shards = [self._open_shard(i) for i in range(num_shards)]
+
+    def _shard_name(self, index):
+        return f"{self.collection_prefix}-{index}"
+
+    def _open_shard(self, index, suffix=""):
+        return Chroma(
+            collection_name=self._shard_name(index) + suffix,
+            embedding_function=self.embedding,
+            persist_directory=self.persist_directory,
+        )
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def shard_for(self, text, metadata):
+        """청크가 들어갈 샤드 번호를 정합니다. (프로세스가 달라도 같은 결과가 나오도록 md5 사용)"""
+        if self.shard_key == "source":
+            key = (metadata or {}).get("source", "")
+        else:
+            key = text
+        return int(hashlib.md5(key.encode("utf-8")).hexdigest(), 16) % self.num_shards
+
+    def count(self):
+        """전체 청크 수"""
+        return sum(shard._collection.count() for shard in self.shards)
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        groups = {}
+        for position, (text, metadata) in enumerate(zip(texts, metadatas)):
+            groups.setdefault(self.shard_for(text, metadata), []).append(position)
+
+        ids = [None] * len(texts)
+        for index, positions in groups.items():
+            shard_ids = self.shards[index].add_texts(
+                [texts[p] for p in positions], [metadatas[p] for p in positions], **kwargs
+            )
+            for p, shard_id in zip(positions, shard_ids):
+                ids[p] = shard_id
+        return ids
+
+    def similarity_search_with_relevance_scores(self, query, k=4, **kwargs):
+        query_embedding = self.embedding.embed_query(query)
+
+        def search(shard):
+            # Chroma는 거리를 반환하므로 샤드의 관련도 함수로 0~1 점수로 바꾼다
+            relevance = shard._select_relevance_score_fn()
+            results = shard.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k, **kwargs)
+            return [(doc, relevance(distance)) for doc, distance in results]
+
+        merged = [pair for results in _executor.map(search, self.shards) for pair in results]
+        return heapq.nlargest(k, merged, key=lambda pair: pair[1])
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k, **kwargs)]
+
+    def rebuild_shard(self, index, documents):
+        """
+        샤드 하나만 다시 만듭니다. 다른 샤드는 그대로 검색 가능합니다.
+
+        임시 컬렉션에 먼저 만든 뒤 교체하므로, 이 인스턴스에서는 다시 만드는 동안에도 이전 샤드로 검색합니다.
+        교체 후 이전 컬렉션을 지우고 임시 컬렉션 이름을 원래 이름으로 바꿉니다.
+        (그 사이 다른 프로세스가 이 샤드를 새로 열면 잠시 빈 샤드를 볼 수 있습니다.)
+
+        Args:
+            index (int): 샤드 번호
+            documents (list): 전체 청크 목록 (이 샤드에 속하는 청크만 추가됨)
+        """
+        docs = [d for d in documents if self.shard_for(d.page_content, d.metadata) == index]
+        # 이전에 실패한 재생성의 임시 컬렉션이 남아 있으면 지우고 새로 만든다
+        self._open_shard(index, "-rebuild").delete_collection()
+        shard = self._open_shard(index, "-rebuild")
+        if docs:
+            shard.add_documents(docs)
+        previous, self.shards[index] = self.shards[index], shard
+        previous.delete_collection()
+        shard._collection.modify(name=self._shard_name(index))
+        return len(docs)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, collection_prefix="sharded", num_shards=2,
+                   persist_directory=None, shard_key="source", **kwargs):
+        store = cls(collection_prefix, num_shards, embedding, persist_directory, shard_key)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
@@ -0,0 +1,188 @@
+"""
+인덱스 스냅샷: 청크, 메타데이터, 임베딩 행렬을 메모리 매핑 가능한 파일 하나에 저장합니다.
+
+파일 구조 (little-endian):
+    magic (8B) | 헤더 길이 (8B) | 헤더 JSON | 청크 오프셋 uint64[n+1] | 청크 JSON 블롭 | float32 행렬[n, dim]
+각 구간은 64바이트 경계에 정렬됩니다. 로드할 때는 헤더만 읽고 나머지는 memmap으로 열기 때문에
+파일 크기와 관계없이 밀리초 단위로 열리며, 청크 본문은 검색 결과로 필요할 때만 디코딩합니다.
+"""
+import json
+import math
+import os
+import struct
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+MAGIC = b"RAGSNAP1"
+_ALIGN = 64
+
+class SnapshotMismatchError(ValueError):
+    """스냅샷을 만든 임베딩 모델이 검색에 쓰려는 모델과 다를 때 발생합니다. 스냅샷을 다시 만들어야 합니다."""
+
+    def __init__(self, path, expected, actual):
+        super().__init__(
+            f"스냅샷 {path}은(는) '{actual}' 임베딩으로 만들어졌지만 '{expected}' 임베딩으로 열려고 했습니다. "
+            f"스냅샷을 다시 만드세요."
+        )
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+
+def embedding_name(embedding):
+    """임베딩 객체의 모델 이름. 차원을 줄였으면 "model:dims" (차원이 다르면 같은 모델이어도 호환되지 않음)"""
+    model = getattr(embedding, "model", None)
+    dimensions = getattr(embedding, "dimensions", None)
+    return f"{model}:{dimensions}" if model and dimensions else model
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % _ALIGN))
+
+def write_snapshot(path, documents, vectors, embedding_model=None):
+    """
+    스냅샷 파일을 씁니다. 임시 파일에 쓴 뒤 교체하므로 읽는 쪽은 항상 완전한 파일만 봅니다.
+
+    Args:
+        path (str): 저장 경로
+        documents (list): Document 목록
+        vectors: 임베딩 행렬 (문서 순서와 동일)
+        embedding_model (str): 임베딩 모델 이름, 차원을 줄였으면 "model:dims" (로드 시 확인용)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not documents:
+        # 빈 스냅샷: 행렬 없이 헤더만 쓴다 (검색 결과는 항상 빈 목록)
+        vectors = np.zeros((0, 0), dtype=np.float32)
+    elif vectors.ndim != 2 or len(vectors) != len(documents):
+        raise ValueError(f"임베딩 행렬 크기 {vectors.shape}가 문서 수 {len(documents)}와 맞지 않습니다.")
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    blobs = [json.dumps([d.page_content, d.metadata], ensure_ascii=False).encode("utf-8") for d in documents]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(b) for b in blobs])
+
+    # 헤더에 구간 오프셋을 넣어야 하므로 고정 길이로 미리 계산한다
+    header = {"version": 1, "count": len(documents), "dim": int(vectors.shape[1]) if len(documents) else 0,
+              "embedding_model": embedding_model, "offsets_at": 0, "chunks_at": 0, "matrix_at": 0}
+    header_size = 4096
+    position = 16 + header_size
+    header["offsets_at"] = position
+    position += offsets.nbytes
+    position += -position % _ALIGN
+    header["chunks_at"] = position
+    position += int(offsets[-1])
+    position += -position % _ALIGN
+    header["matrix_at"] = position
+    header_bytes = json.dumps(header).encode("utf-8").ljust(header_size, b" ")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", header_size))
+        f.write(header_bytes)
+        f.write(offsets.tobytes())
+        _pad(f)
+        for blob in blobs:
+            f.write(blob)
+        _pad(f)
+        f.write(vectors.tobytes())
+    os.replace(tmp_path, path)
+
+class Snapshot:
+    """memmap으로 연 스냅샷 파일"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(8) != MAGIC:
+                raise ValueError(f"스냅샷 파일이 아닙니다: {path}")
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            self.header = json.loads(f.read(header_size))
+        count, dim = self.header["count"], self.header["dim"]
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+        if count == 0:
+            self.offsets = np.zeros(1, dtype=np.uint64)
+            self.matrix = np.zeros((0, dim), dtype=np.float32)
+            return
+        self.offsets = np.frombuffer(self._data, dtype=np.uint64, count=count + 1, offset=self.header["offsets_at"])
+        self.matrix = np.frombuffer(self._data, dtype=np.float32, count=count * dim, offset=self.header["matrix_at"]).reshape(count, dim)
+
+    def __len__(self):
+        return self.header["count"]
+
+    def document(self, index):
+        """index번째 청크를 Document로 디코딩합니다."""
+        start = self.header["chunks_at"] + int(self.offsets[index])
+        end = self.header["chunks_at"] + int(self.offsets[index + 1])
+        page_content, metadata = json.loads(self._data[start:end].tobytes())
+        return Document(page_content=page_content, metadata=metadata)
+
+class SnapshotVectorStore(VectorStore):
+    """
+    스냅샷 파일을 그대로 검색하는 읽기 전용 벡터스토어 (전수 내적 검색)
+
+    관련도 점수는 Chroma(l2)와 같은 식으로 계산합니다.
+    """
+
+    def __init__(self, snapshot, embedding):
+        self.snapshot = snapshot
+        self.embedding = embedding
+
+    @classmethod
+    def load(cls, path, embedding, embedding_model=None):
+        """
+        스냅샷을 엽니다. 헤더의 임베딩 모델(차원 포함)이 embedding_model(없으면 embedding의 모델과 차원)과
+        다르면 SnapshotMismatchError를 발생시킵니다. 다른 모델의 질문 벡터로 검색하면 결과가 무의미하고,
+        차원이 다르면 첫 검색에서 행렬 크기 에러가 나기 때문입니다.
+        """
+        snapshot = Snapshot(path)
+        expected = embedding_model or embedding_name(embedding)
+        actual = snapshot.header.get("embedding_model")
+        if expected and actual and expected != actual:
+            raise SnapshotMismatchError(path, expected, actual)
+        return cls(snapshot, embedding)
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def embedded_chunks(self):
+        """(메타데이터, 정규화된 임베딩) 쌍을 순회합니다."""
+        for i in range(len(self.snapshot)):
+            yield self.snapshot.document(i).metadata, self.snapshot.matrix[i]
+
+    def similarity_search_with_relevance_scores(self, query, k=4, **kwargs):
+        if len(self.snapshot) == 0:
+            return []
+        query_vector = np.asarray(self.embedding.embed_query(query), dtype=np.float32)
+        query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+        scores = self.snapshot.matrix @ query_vector
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        # 정규화된 벡터의 제곱 L2 거리 = 2 - 2cos
+        return [(self.snapshot.document(int(i)), 1.0 - (2.0 - 2.0 * float(scores[i])) / math.sqrt(2)) for i in top]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k, **kwargs)]
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise TypeError("SnapshotVectorStore는 읽기 전용입니다. 스냅샷을 다시 만드세요.")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, path=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        write_snapshot(path, documents, embedding.embed_documents(texts) if texts else [], embedding_name(embedding))
+        return cls.load(path, embedding)
+
+def snapshot_from_chroma(vectorstore, path, embedding_model=None):
+    """Chroma(또는 샤딩된) 벡터스토어의 내용을 스냅샷 파일로 저장합니다."""
+    documents, vectors = [], []
+    for store in getattr(vectorstore, "shards", [vectorstore]):
+        data = store._collection.get(include=["embeddings", "metadatas", "documents"])
+        for text, metadata, vector in zip(data["documents"], data["metadatas"], data["embeddings"]):
+            documents.append(Document(page_content=text, metadata=metadata or {}))
+            vectors.append(vector)
+    write_snapshot(path, documents, vectors, embedding_model)
+    return len(documents)
@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_community.vectorstores import Chroma
+from chunk_store import chunk_id
+from config import WEB_COLLECTION_NAME, WEB_CACHE_TTL_SECONDS, WEB_CACHE_K, WEB_CACHE_MIN_SCORE
+
+class WebCache:
+    """
+    웹 검색 결과를 저장하는 TTL 컬렉션
+
+    평가를 통과한 웹 검색 결과를 청크로 나눠 임베딩하고 별도 Chroma 컬렉션에 upsert합니다.
+    각 청크에는 출처(source_type = "web_search"), 저장 시각(fetched_at)과 만료 시각(expires_at)을
+    기록하고, 검색할 때는 만료되지 않은 청크만 봅니다. 같은 청크를 다시 저장하면 만료 시각이 갱신됩니다.
+    """
+
+    def __init__(self, embedding, collection_name=WEB_COLLECTION_NAME, ttl_seconds=WEB_CACHE_TTL_SECONDS,
+                 persist_directory="./chroma_db"):
+        self.ttl_seconds = ttl_seconds
+        self.vectorstore = Chroma(
+            collection_name=collection_name,
+            embedding_function=embedding,
+            persist_directory=persist_directory,
+        )
+
+    def __len__(self):
+        return self.vectorstore._collection.count()
+
+    def add(self, documents):
+        """웹 검색 Document들을 청크로 나눠 저장하고 저장한 청크 수를 반환합니다."""
+        from document_loader import create_text_splitter
+
+        now = time.time()
+        chunks = create_text_splitter().split_documents(documents)
+        for chunk in chunks:
+            chunk.metadata.update({
+                "source_type": "web_search",
+                "fetched_at": now,
+                "expires_at": now + self.ttl_seconds,
+            })
+        if chunks:
+            # 같은 출처/본문이면 같은 id라 upsert로 만료 시각만 갱신된다
+            self.vectorstore.add_documents(chunks, ids=[chunk_id(chunk) for chunk in chunks])
+        return len(chunks)
+
+    def purge_expired(self):
+        """만료된 청크를 삭제하고 삭제한 수를 반환합니다."""
+        expired = self.vectorstore._collection.get(where={"expires_at": {"$lte": time.time()}}, include=[])
+        if expired["ids"]:
+            self.vectorstore._collection.delete(ids=expired["ids"])
+        return len(expired["ids"])
+
+    def search(self, query, k=WEB_CACHE_K, min_score=WEB_CACHE_MIN_SCORE):
+        """만료되지 않은 청크 중 관련도 점수가 min_score 이상인 (Document, score) 목록"""
+        if len(self) == 0:
+            return []
+        scored = self.vectorstore.similarity_search_with_relevance_scores(
+            query, k=k, filter={"expires_at": {"$gt": time.time()}}
+        )
+        return [(doc, score) for doc, score in scored if score >= min_score]
+
+_web_cache = None
+_web_cache_lock = threading.Lock()
+# 쓰기는 요청 경로 밖에서 순서대로 처리한다
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="web-cache-writer")
+
+def get_web_cache():
+    """프로세스에서 공유하는 WebCache를 반환합니다. 처음 열 때 만료된 청크를 정리합니다."""
+    global _web_cache
+    with _web_cache_lock:
+        if _web_cache is None:
+            from models import embeddings
+            _web_cache = WebCache(embeddings)
+            purged = _web_cache.purge_expired()
+            if purged:
+                print(f"웹 캐시: 만료된 청크 {purged}개 삭제")
+        return _web_cache
+
+def write_back(documents):
+    """
+    평가를 통과한 웹 검색 결과를 백그라운드에서 웹 캐시에 저장합니다.
+    이미 캐시에서 나온 문서(expires_at이 있음)는 건너뜁니다.
+
+    Returns:
+        Future: 저장한 청크 수 (저장할 문서가 없으면 None)
+    """
+    fresh = [
+        doc for doc in documents
+        if doc.metadata.get("source_type") == "web_search" and "expires_at" not in doc.metadata
+    ]
+    if not fresh:
+        return None
+
+    def write():
+        try:
+            count = get_web_cache().add(fresh)
+            print(f"웹 캐시: 웹 검색 결과 {len(fresh)}개 → 청크 {count}개 저장")
+            return count
+        except Exception as e:
+            print(f"웹 캐시 저장 실패: {e}")
+            raise
+
+    return _writer.submit(write)
@@ -1,10 +1,29 @@
+import asyncio
 from typing import List
-from langchain_core.documents import Document
 from typing_extensions import TypedDict
 from langgraph.graph import END, StateGraph
+from config import (
+    USE_QUESTION_ROUTER, REQUEST_COST_BUDGET,
+    SCHEDULER_ENABLED, SCHEDULER_MAX_CONCURRENCY, SCHEDULER_CLASSES, SCHEDULER_DEFAULT_CLASS
+)
 from nodes import (
     web_search, retrieve, grade_documents, generate,
-    route_question, decide_to_generate, decide_to_print, grade_generation_v_documents_and_question
+    route_question, decide_to_generate, decide_to_print, grade_generation_v_documents_and_question,
+    finalize_degraded,
+    aweb_search, aretrieve, agrade_documents, agenerate, aroute_question,
+    agrade_generation_v_documents_and_question
+)
+from deadline import timed, make_inputs, refresh_deadline, arefresh_deadline
+from memprofile import profiler
+from singleflight import question_flight, normalize_question
+from usage import track_usage
+from chunk_store import chunk_store
+from scheduler import ExecutionScheduler
+
+# 그래프 실행 스케줄러 (SCHEDULER_ENABLED가 꺼져 있으면 None, 바로 실행)
+scheduler = (
+    ExecutionScheduler(SCHEDULER_CLASSES, SCHEDULER_MAX_CONCURRENCY, SCHEDULER_DEFAULT_CLASS)
+    if SCHEDULER_ENABLED else None
 )
 
 class GraphState(TypedDict):
@@ -14,28 +33,69 @@ class GraphState(TypedDict):
     Attributes:
         question: question
         generation: LLM generation
-        documents: list of documents
+        documents: list of chunk references ({"id", "score"}), 본문은 chunk_store에서 hydrate
+        deadline: 요청 마감 시각 (epoch seconds)
+        degraded: 마감 때문에 재시도를 건너뛰고 반환한 답변인지 여부
+        verifiedSentences: 문장 검증을 통과한 답변 문장 (다시 검증하지 않음)
+        unsupportedSentences: 근거 없다고 판정돼 다음 generate에서 수정할 문장
     """
     question: str
     generation: str
-    documents: List[str]
+    documents: List[dict]
     relevanceCheckCount: int
     hallucinationCheckCount: int
     hasHallucination: bool
+    deadline: float
+    degraded: bool
+    verifiedSentences: List[str]
+    unsupportedSentences: List[str]
 
-def create_workflow():
-    """RAG 워크플로우를 생성합니다."""
+def create_workflow(checkpointer=None, async_mode=False):
+    """
+    RAG 워크플로우를 생성합니다.
+
+    Args:
+        checkpointer: 노드가 끝날 때마다 상태를 저장할 체크포인터 (checkpoint.create_checkpointer)
+                      지정하면 실행 시 config에 thread_id가 필요합니다.
+        async_mode: True이면 비동기 노드(ainvoke/abatch)로 그래프를 만듭니다. astream/ainvoke로 실행하세요.
+    """
     workflow = StateGraph(GraphState)
 
+    if async_mode:
+        nodes = (aretrieve, agrade_documents, aweb_search, agenerate, agrade_generation_v_documents_and_question)
+        router = aroute_question
+    else:
+        nodes = (retrieve, grade_documents, web_search, generate, grade_generation_v_documents_and_question)
+        router = route_question
+    retrieve_node, grade_documents_node, web_search_node, generate_node, grade_generation_node = nodes
+
+    # 메모리 프로파일 단계 (MEMORY_PROFILE이 꺼져 있으면 래퍼는 아무 일도 하지 않음)
+    retrieve_node = profiler.profiled("retrieve", retrieve_node)
+    grade_documents_node = profiler.profiled("grade", grade_documents_node)
+    web_search_node = profiler.profiled("websearch", web_search_node)
+    generate_node = profiler.profiled("generate", generate_node)
+    grade_generation_node = profiler.profiled("grade", grade_generation_node)
+
     # Define the nodes
-    workflow.add_node("retrieve", retrieve)  # retrieve
-    workflow.add_node("grade_documents", grade_documents)  # grade documents
-    workflow.add_node("websearch", web_search)  # web search
-    workflow.add_node("generate", generate)  # generate
-    workflow.add_node("grade_generation", grade_generation_v_documents_and_question)  # grade generation v documents and question
+    workflow.add_node("retrieve", timed("retrieve", retrieve_node))  # retrieve
+    workflow.add_node("grade_documents", timed("grade_documents", grade_documents_node))  # grade documents
+    workflow.add_node("websearch", timed("websearch", web_search_node))  # web search
+    workflow.add_node("generate", timed("generate", generate_node))  # generate
+    workflow.add_node("grade_generation", timed("grade_generation", grade_generation_node))  # grade generation v documents and question
+    workflow.add_node("degraded", finalize_degraded)  # return best answer so far when out of time
 
     # Build graph
-    workflow.set_entry_point("retrieve")
+    if USE_QUESTION_ROUTER:
+        # 도메인 밖 질문은 벡터 검색과 문서 평가를 건너뛰고 바로 웹 검색
+        workflow.set_conditional_entry_point(
+            router,
+            {
+                "websearch": "websearch",
+                "vectorstore": "retrieve",
+            },
+        )
+    else:
+        workflow.set_entry_point("retrieve")
     workflow.add_edge("retrieve", "grade_documents")
     workflow.add_conditional_edges(
         "grade_documents",
@@ -43,6 +103,7 @@ def create_workflow():
         {
             "yes": "generate",
             "no": "websearch",
+            "degraded": "degraded",
         },
     )
     workflow.add_edge("websearch", "grade_documents")
@@ -54,9 +115,124 @@ def create_workflow():
         {
             "yes": END,
             "no": "generate",
+            "degraded": "degraded",
         },
     )
+    workflow.add_edge("degraded", END)
 
 
     # Compile
-    return workflow.compile() 
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
+
+async def arun_workflow(app, inputs, config=None):
+    """비동기 그래프를 astream으로 실행하고 노드 출력을 합친 최종 상태를 반환합니다."""
+    final_state = dict(inputs)
+    with chunk_store.pinned():
+        async for output in app.astream(inputs, config):
+            for key, value in output.items():
+                final_state.update(value or {})
+    return final_state
+
+def _run_config(app, thread_id):
+    """체크포인터가 있는 그래프면 thread id를 가진 실행 설정을, 없으면 None을 반환합니다."""
+    if app.checkpointer is None:
+        return None
+    from checkpoint import thread_config
+    return thread_config(thread_id)
+
+# 끝난 스레드에 새 질문을 실행할 때 이전 실행에서 남은 값을 지우는 초기값
+_RUN_DEFAULTS = {
+    "generation": None,
+    "documents": [],
+    "relevanceCheckCount": 0,
+    "hallucinationCheckCount": 0,
+    "hasHallucination": False,
+    "degraded": False,
+    "verifiedSentences": [],
+    "unsupportedSentences": [],
+}
+
+def _thread_inputs(snapshot, question, thread_id, inputs):
+    """
+    기존 스레드에서 실행할 입력을 정합니다.
+    끝나지 않은 실행이면 None(재개)을 반환하며, 저장된 질문과 다른 질문이면 ValueError가 발생합니다.
+    끝난 스레드면 이전 실행의 카운터/답변/검증 문장을 초기화한 새 입력을 반환합니다.
+    """
+    if snapshot.next:
+        saved = snapshot.values.get("question")
+        if saved is not None and normalize_question(saved) != normalize_question(question):
+            raise ValueError(
+                f"thread {thread_id}의 끝나지 않은 실행은 다른 질문입니다: {saved!r}. "
+                f"같은 질문으로 재개하거나 새 thread_id를 쓰세요."
+            )
+        return None
+    if snapshot.values:
+        return {**_RUN_DEFAULTS, **inputs}
+    return inputs
+
+def _thread_id(config):
+    return config["configurable"]["thread_id"] if config else None
+
+def run_question(app, question, budget=REQUEST_COST_BUDGET, priority=None, thread_id=None):
+    """
+    질문 하나를 실행하고 최종 상태를 반환합니다.
+    같은 질문(정규화 기준)이 같은 priority와 budget으로 이미 실행 중이면 그 실행의 결과를 함께 받습니다.
+    (대화형 요청이 큐에서 기다리는 배치 실행에 합류하거나 다른 요청의 예산 티어를 받지 않도록)
+    최종 상태의 usage에는 이 실행의 토큰/비용 집계가 들어갑니다 (budget: 요청 예산 USD).
+    SCHEDULER_ENABLED이면 priority 클래스(예: "interactive", "batch")의 자리가 날 때까지 기다리고,
+    큐가 가득 차면 scheduler.QueueFullError가 발생합니다.
+    그래프에 체크포인터가 있으면 최종 상태의 thread_id로 실패한 실행을 재개할 수 있습니다.
+    끝나지 않은 실행의 thread_id를 넘기면 새로 시작하지 않고 마지막 완료 노드 다음부터 재개하며
+    (마감 시각은 새로 잡음), 질문이 저장된 질문과 다르면 ValueError가 발생합니다.
+    끝난 실행의 thread_id를 넘기면 이전 실행의 카운터와 답변을 초기화하고 새 질문을 실행합니다.
+    """
+    def invoke():
+        config = _run_config(app, thread_id)
+        inputs = make_inputs(question)
+        if thread_id and config:
+            inputs = _thread_inputs(app.get_state(config), question, thread_id, inputs)
+            if inputs is None:
+                refresh_deadline(app, config)
+        # 실행 중인 상태가 참조하는 청크는 실행이 끝날 때까지 저장소에서 밀려나지 않는다
+        with track_usage(budget) as ledger, chunk_store.pinned():
+            result = app.invoke(inputs, config)
+        return {**result, "usage": ledger.as_dict(), "thread_id": _thread_id(config)}
+
+    def execute():
+        if scheduler is None:
+            return invoke()
+        return scheduler.run(invoke, priority)
+
+    key = (id(app), normalize_question(question), thread_id, priority, budget)
+    return question_flight.do(key, execute)
+
+async def arun_question(app, question, budget=REQUEST_COST_BUDGET, priority=None, thread_id=None):
+    """run_question의 비동기 버전"""
+    async def invoke():
+        config = _run_config(app, thread_id)
+        inputs = make_inputs(question)
+        if thread_id and config:
+            inputs = _thread_inputs(await app.aget_state(config), question, thread_id, inputs)
+            if inputs is None:
+                await arefresh_deadline(app, config)
+        with track_usage(budget) as ledger, chunk_store.pinned():
+            result = await app.ainvoke(inputs, config)
+        return {**result, "usage": ledger.as_dict(), "thread_id": _thread_id(config)}
+
+    async def execute():
+        if scheduler is None:
+            return await invoke()
+        return await scheduler.arun(invoke, priority)
+
+    key = (id(app), normalize_question(question), thread_id, priority, budget)
+    return await question_flight.ado(key, execute)
+
+async def arun_many(app, questions, priority=None):
+    """
+    하나의 이벤트 루프에서 여러 질문을 동시에 실행합니다. 실패한 요청은 예외 객체로 반환됩니다.
+    배치 평가 작업은 priority="batch"로 실행해 대화형 요청보다 뒤에 서도록 합니다.
+    """
+    return await asyncio.gather(
+        *(arun_question(app, question, priority=priority) for question in questions),
+        return_exceptions=True,
+    )